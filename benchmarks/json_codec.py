@@ -0,0 +1,126 @@
+"""Micro-benchmark of JSON parsing cost per refresh cycle.
+
+Parses recorded API payloads (see API_PAYLOAD_RECORD_DIR in settings) or,
+without --payload-dir, payloads generated by the local stand-in servers, with
+the stdlib parser and with orjson when it is installed. Per-call costs are
+scaled by how often each payload is parsed in one refresh cycle.
+
+    python -m benchmarks.json_codec --users 1000
+    python -m benchmarks.json_codec --payload-dir recorded_payloads
+"""
+import argparse
+import json
+import os
+import timeit
+from collections import defaultdict
+
+from utils import json_codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# How many times each payload type is decoded per refresh cycle for a
+# community of `n` linked users
+CALLS_PER_CYCLE = {
+    "mmr": lambda n: n,
+    "matches": lambda n: 2 * n,
+    "benchmark": lambda n: 3 * n,
+    "plays_agg": lambda n: 1,
+    "benchmark_config": lambda n: 2 * n,
+    "dm_blob": lambda n: n,
+}
+
+
+def load_recorded_payloads(payload_dir: str) -> dict[str, list[bytes]]:
+    payloads = defaultdict(list)
+    for filename in sorted(os.listdir(payload_dir)):
+        if not filename.endswith(".json"):
+            continue
+        name = filename.rsplit("-", 1)[0]
+        with open(os.path.join(payload_dir, filename), "rb") as f:
+            payloads[name].append(f.read())
+    return payloads
+
+
+def generate_payloads(users: int) -> dict[str, list[bytes]]:
+    from services.stand_in import payloads
+    from services.stand_in.population import SyntheticPopulation
+    from settings import (DOJO_AIMLABS_PLAYLIST_BALANCED,
+                          DOJO_AIMLABS_PLAYLIST_ADVANCED,
+                          S5_VOLTAIC_BENCHMARKS_CONFIG)
+
+    population = SyntheticPopulation(users, dormant_ratio=0.3)
+    sample = population.users[:5]
+    task_ids = sorted({scenario["task_id"]
+                       for tier_key in payloads.TIER_KEYS
+                       for scenario in payloads.S1_CONFIG[tier_key]} |
+                      set(DOJO_AIMLABS_PLAYLIST_BALANCED) |
+                      set(DOJO_AIMLABS_PLAYLIST_ADVANCED))
+    where = {"user_id": {"_in": [user.aimlabs_id
+                                 for user in population.users]},
+             "task_id": {"_in": task_ids}}
+    dm_blob = [{"id": f"{i:08d}-0000-0000-0000-000000000000",
+                "date": "2025-01-01T00:00:00.000Z"} for i in range(60)]
+    with open(S5_VOLTAIC_BENCHMARKS_CONFIG, "rb") as f:
+        benchmark_config = f.read()
+
+    encode = lambda obj: json.dumps(obj).encode("utf-8")
+    return {
+        "mmr": [encode(payloads.valorant_mmr(population, user))
+                for user in sample],
+        "matches": [encode(payloads.valorant_matches(population, user,
+                                                     "deathmatch", 0, 5))
+                    for user in sample],
+        "benchmark": [encode(payloads.kovaaks_benchmark(population, user,
+                                                        427))
+                      for user in sample],
+        "plays_agg": [encode(payloads.aimlabs_plays_agg(population, where))],
+        "benchmark_config": [benchmark_config],
+        "dm_blob": [encode(dm_blob)],
+    }
+
+
+def time_parser(parser, bodies: list[bytes]) -> float:
+    """Returns the mean seconds per parse over the given bodies"""
+    timer = timeit.Timer(lambda: [parser(body) for body in bodies])
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number / len(bodies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payload-dir", default=None)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    payloads = (load_recorded_payloads(args.payload_dir) if args.payload_dir
+                else generate_payloads(args.users))
+    parsers = {"json": json.loads}
+    if orjson is not None:
+        parsers["orjson"] = orjson.loads
+
+    print(f"Codec backend in use: {json_codec.BACKEND}, "
+          f"{args.users} users per cycle\n")
+    header = f"{'payload':<18}{'size (KB)':>10}{'calls':>8}"
+    for name in parsers:
+        header += f"{name + ' us/call':>16}{name + ' ms/cycle':>16}"
+    print(header)
+    totals = defaultdict(float)
+    for name, bodies in sorted(payloads.items()):
+        calls = CALLS_PER_CYCLE.get(name, lambda n: 1)(args.users)
+        size = sum(len(body) for body in bodies) / len(bodies) / 1024
+        row = f"{name:<18}{size:>10.1f}{calls:>8}"
+        for parser_name, parse in parsers.items():
+            per_call = time_parser(parse, bodies)
+            totals[parser_name] += per_call * calls
+            row += f"{per_call * 1e6:>16.1f}{per_call * calls * 1e3:>16.1f}"
+        print(row)
+    print()
+    for parser_name, total in totals.items():
+        print(f"{parser_name}: {total * 1e3:.1f} ms of parsing per cycle")
+
+
+if __name__ == "__main__":
+    main()
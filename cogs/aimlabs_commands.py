@@ -1,14 +1,25 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from discord.ext import tasks
 from utils.log import logger
 from services.db.aimlabs_database import (add_aimlabs_username_todb,
                                           remove_aimlabs_username_fromdb,
-                                          update_aimlabs_username_indb)
+                                          update_aimlabs_username_indb,
+                                          revalidate_aimlabs_usernames,
+                                          get_aimlabs_task_bests,
+                                          refresh_global_leaderboards,
+                                          global_leaderboards)
+from services.db.leaderboard_database import get_aimlabs_tasks
 from services.api.aimlabs_api import check_aimlabs_username
-from utils.errors import (WeakError, CheckError)
+from utils.database_helper import get_aimlabs_profiles
+from utils.benchmark_config import s1_config
+from utils.errors import (WeakError, CheckError, UsernameDoesNotExist)
 import traceback
 from utils.checks import is_correct_channel
+from settings import (AIMLABS_PROFILE_REVALIDATE_HOURS,
+                      DOJO_AIMLABS_PLAYLIST_BALANCED,
+                      DOJO_AIMLABS_PLAYLIST_ADVANCED)
 
 
 class AimLabsCommands(commands.Cog):
@@ -150,6 +161,122 @@ class AimLabsCommands(commands.Cog):
                                             f"(oopsie teehee).\n\n{str(e)}")
 
 
+    @app_commands.command(name="aimlabs_global_standing",
+                          description="Shows where your best aimlabs scores "
+                                      "place you on the global leaderboards")
+    @app_commands.choices(playlist=[
+        app_commands.Choice(name="Balanced Dojo Playlist", value="balanced"),
+        app_commands.Choice(name="Advanced Dojo Playlist", value="advanced"),
+        app_commands.Choice(name="Voltaic VAL S1", value="s1")
+    ])
+    @is_correct_channel()
+    async def aimlabsglobalstanding(self, interaction: discord.Interaction,
+                                    playlist: app_commands.Choice[str]
+                                    ) -> None:
+        """Shows the member's best score and global standing on each task of
+        a playlist, from the stored task bests and the cached global
+        leaderboards
+
+        :param discord.Interaction interaction: Discord interaction
+        :param app_commands.Choice playlist: Playlist to show
+        :return: None
+        """
+        await interaction.response.defer(ephemeral=True)
+
+        user_nick = interaction.user.display_name
+        user_id = interaction.user.id
+        try:
+            profiles = await get_aimlabs_profiles([user_id])
+            if not profiles:
+                raise UsernameDoesNotExist(f"You do not have an aimlabs "
+                                           f"profile in the database. Add it "
+                                           f"using `/add_aimlabs_profile`")
+            aimlabs_id = profiles[0][2]
+            bests = (await get_aimlabs_task_bests([aimlabs_id])) \
+                .get(aimlabs_id, {})
+            match playlist.value:
+                case "balanced":
+                    task_ids = DOJO_AIMLABS_PLAYLIST_BALANCED
+                case "advanced":
+                    task_ids = DOJO_AIMLABS_PLAYLIST_ADVANCED
+                case _:
+                    config = s1_config.current()
+                    task_ids = [scenario['task_id']
+                                for category in ['novice_scenarios',
+                                                 'intermediate_scenarios',
+                                                 'advanced_scenarios']
+                                for scenario in config[category]]
+            lines = []
+            for task_id in task_ids:
+                task_name = task_id.split(".")[-2]
+                score = bests.get(task_id)
+                snapshot = global_leaderboards.get(task_id)
+                if score is None:
+                    lines.append(f"`{task_name}`: not played")
+                elif snapshot is None:
+                    lines.append(f"`{task_name}`: {score:g}")
+                else:
+                    lines.append(f"`{task_name}`: {score:g}, top "
+                                 f"{snapshot.top_percent(score):.3g}% of "
+                                 f"{snapshot.total:,} players")
+            logger.info(f"{user_nick} ({user_id}) ran "
+                        f"/aimlabs_global_standing with playlist "
+                        f"'{playlist.value}' successfully")
+            await interaction.followup.send(f"**{playlist.name}**\n" +
+                                            "\n".join(lines))
+        except WeakError as e:
+            logger.warning(f"{user_nick} ({user_id}) ran "
+                           f"/aimlabs_global_standing -> "
+                           f"{e.__class__.__name__}: {e.message}")
+            await interaction.followup.send(e.message)
+        except Exception as e:
+            logger.error(
+                f"{user_nick} ({user_id}) ran /aimlabs_global_standing -> "
+                f"Unexpected error: {str(e)}\n{traceback.format_exc()}"
+            )
+            await interaction.followup.send(f"Ran into an unexpected error "
+                                            f"(oopsie teehee).\n\n{str(e)}")
+
+
+    @tasks.loop(hours=AIMLABS_PROFILE_REVALIDATE_HOURS)
+    async def revalidate_profiles(self):
+        """Low priority background job keeping stored aimlabs usernames in
+        sync with aimlabs, a few batched requests per run"""
+        try:
+            await revalidate_aimlabs_usernames()
+        except Exception as e:
+            logger.error(f"Ran into an error while revalidating aimlabs "
+                         f"usernames -> Unexpected error: "
+                         f"{str(e)}\n{traceback.format_exc()}")
+
+
+    @revalidate_profiles.before_loop
+    async def before_revalidate_profiles(self):
+        await self.bot.wait_until_ready()
+
+
+    @tasks.loop(hours=24)
+    async def resample_global_leaderboards(self):
+        """Low priority background job resampling the global aimlabs
+        leaderboards of the tracked tasks once they're stale"""
+        try:
+            await refresh_global_leaderboards(await get_aimlabs_tasks())
+        except Exception as e:
+            logger.error(f"Ran into an error while refreshing global aimlabs "
+                         f"leaderboards -> Unexpected error: "
+                         f"{str(e)}\n{traceback.format_exc()}")
+
+
+    @resample_global_leaderboards.before_loop
+    async def before_resample_global_leaderboards(self):
+        await self.bot.wait_until_ready()
+
+
+    async def cog_unload(self):
+        self.revalidate_profiles.cancel()
+        self.resample_global_leaderboards.cancel()
+
+
     async def cog_app_command_error(self, interaction: discord.Interaction,
                                     e: app_commands.AppCommandError) -> None:
         if isinstance(e, CheckError):
@@ -162,4 +289,7 @@ class AimLabsCommands(commands.Cog):
 
 
 async def setup(bot):
-    await bot.add_cog(AimLabsCommands(bot))
+    cog = AimLabsCommands(bot)
+    await bot.add_cog(cog)
+    cog.revalidate_profiles.start()
+    cog.resample_global_leaderboards.start()
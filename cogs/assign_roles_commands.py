@@ -7,11 +7,14 @@ from services.db.leaderboard_database import (
     get_valorant_rank_leaderboard_data,
     get_valorant_dm_leaderboard_data,
     get_voltaic_s5_benchmarks_leaderboard_data,
-    get_voltaic_s1_val_benchmarks_leaderboard_data)
+    get_voltaic_s1_val_benchmarks_leaderboard_data,
+    archive_weekly_leaderboards,
+    get_weekly_winners)
 from settings import GUILD_ID, LEADERBOARD_TYPES, DOJO_RANK_ROLES
 from utils.database_helper import (execute_commit,
                                    execute_fetch)
 from utils.log import logger
+from utils.weekly_window import week_window
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
@@ -46,6 +49,14 @@ class RoleManager(commands.Cog):
 
     async def weekly_task(self):
         logger.info("Running weekly task every Sunday at 11:59 PM Eastern")
+        week_id, _, _ = week_window.current()
+        # Roles are assigned from the live leaderboards, a failed archive
+        # mustn't hold them up
+        try:
+            await archive_weekly_leaderboards(week_id)
+        except Exception as e:
+            logger.error(f"Failed to archive the leaderboards of week "
+                         f"{week_id}: {str(e)}\n{traceback.format_exc()}")
         await self.update_weekly_roles()
 
 
@@ -55,7 +66,8 @@ class RoleManager(commands.Cog):
             if (leaderboard_type == "dojo_aimlabs_playlist_balanced" or
                     leaderboard_type == "dojo_aimlabs_playlist_advanced" or
                     leaderboard_type == "voltaic_S5_benchmarks_leaderboard" or
-                    leaderboard_type == "voltaic_S1_valorant_benchmarks_leaderboard"):
+                    leaderboard_type == "voltaic_S1_valorant_benchmarks_leaderboard" or
+                    leaderboard_type == "valorant_dm_performance_leaderboard"):
                 continue
             # Get top scorer for that week
             raw_winner_id = await self.get_top_scorer_from_db(leaderboard_type)
@@ -165,6 +177,11 @@ class RoleManager(commands.Cog):
 
     @staticmethod
     async def get_last_winner(lb_type):
+        week_id, _, _ = week_window.current()
+        winners = await get_weekly_winners(lb_type, before_week_id=week_id)
+        if winners:
+            return winners[0][1]
+        # Weeks before the archive existed
         sql_statement = """
         SELECT discord_id FROM weekly_leaderboard_winners
         WHERE leaderboard_type = ?
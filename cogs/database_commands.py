@@ -16,6 +16,7 @@ from services.db.database import update_discord_profile
 from services.db.leaderboard_database import (
     update_valorant_rank_leaderboard,
     update_valorant_dm_leaderboard,
+    update_valorant_leaderboards,
     update_voltaic_s5_leaderboard,
     update_voltaic_val_s1_leaderboard,
     update_dojo_aimlabs_balanced_playlist_leaderboard,
@@ -25,10 +26,12 @@ from services.db.leaderboard_database import (
     get_voltaic_s5_benchmarks_leaderboard_data,
     get_voltaic_s1_val_benchmarks_leaderboard_data,
     get_dojo_aimlabs_playlist_balanced_leaderboard_data,
-    get_dojo_aimlabs_playlist_advanced_leaderboard_data
+    get_dojo_aimlabs_playlist_advanced_leaderboard_data,
+    get_valorant_dm_performance_leaderboard_data
 )
 from utils.database_helper import (get_profiles_from_db, get_discord_profiles,
-                                   set_profile_inactive)
+                                   set_profile_inactive, get_valorant_profiles,
+                                   get_kovaaks_profiles, get_aimlabs_profiles)
 from utils.errors import CheckError
 from utils.image_gen import LeaderboardRenderer, delete_files_indir
 import traceback
@@ -43,7 +46,9 @@ LEADERBOARD_UPDATE_METHODS = {
     leaderboard_types_list[2]: update_voltaic_s5_leaderboard,
     leaderboard_types_list[3]: update_voltaic_val_s1_leaderboard,
     leaderboard_types_list[4]: update_dojo_aimlabs_balanced_playlist_leaderboard,
-    leaderboard_types_list[5]: update_dojo_aimlabs_advanced_playlist_leaderboard
+    leaderboard_types_list[5]: update_dojo_aimlabs_advanced_playlist_leaderboard,
+    # Computed from the stats stored while ingesting DMs
+    leaderboard_types_list[6]: update_valorant_dm_leaderboard
 }
 
 LEADERBOARD_RENDERER = {
@@ -52,7 +57,21 @@ LEADERBOARD_RENDERER = {
     leaderboard_types_list[2]: LeaderboardRenderer(leaderboard_types_list[2]),
     leaderboard_types_list[3]: LeaderboardRenderer(leaderboard_types_list[3]),
     leaderboard_types_list[4]: LeaderboardRenderer(leaderboard_types_list[4]),
-    leaderboard_types_list[5]: LeaderboardRenderer(leaderboard_types_list[5])
+    leaderboard_types_list[5]: LeaderboardRenderer(leaderboard_types_list[5]),
+    leaderboard_types_list[6]: LeaderboardRenderer(leaderboard_types_list[6])
+}
+
+# Profile lookup used to refresh a single member's rows. Dojo scores are
+# normalised against every player, so those leaderboards (None) are left to
+# the regular cycle.
+LEADERBOARD_PROFILE_GETTERS = {
+    leaderboard_types_list[0]: get_valorant_profiles,
+    leaderboard_types_list[1]: get_valorant_profiles,
+    leaderboard_types_list[2]: get_kovaaks_profiles,
+    leaderboard_types_list[3]: get_aimlabs_profiles,
+    leaderboard_types_list[4]: None,
+    leaderboard_types_list[5]: None,
+    leaderboard_types_list[6]: get_valorant_profiles
 }
 
 DEFAULT_ROLE = 1333353367896068146
@@ -64,6 +83,8 @@ class DatabaseCommands(commands.Cog):
         self.bot = bot
         self.last_updated_time = None
         self.updating = False
+        # Serialises the refresh cycle and targeted per-member refreshes
+        self.update_lock = asyncio.Lock()
 
 
     @app_commands.command(name="start_leaderboard_updates",
@@ -148,14 +169,63 @@ class DatabaseCommands(commands.Cog):
                     f"{end_time - start_time:.2f} s.")
 
 
+    async def linked_leaderboard_types(self, discord_id: int,
+                                       leaderboard_types: set) -> set:
+        """Returns the leaderboard types a member can be refreshed on alone:
+        those with a profile getter and a linked profile of the member."""
+        linked = {}
+        for leaderboard_type in leaderboard_types:
+            get_profiles = LEADERBOARD_PROFILE_GETTERS[leaderboard_type]
+            if get_profiles is not None and get_profiles not in linked:
+                linked[get_profiles] = bool(await get_profiles([discord_id]))
+        return {leaderboard_type for leaderboard_type in leaderboard_types
+                if linked.get(LEADERBOARD_PROFILE_GETTERS[leaderboard_type])}
+
+
+    async def refresh_member_leaderboards(self, discord_id: int,
+                                          leaderboard_types: list):
+        """Refreshes one member's rows of the given leaderboards and
+        regenerates their images, without waiting for the next cycle.
+        Leaderboards without a profile getter are left to the cycle."""
+        leaderboard_types = [
+            leaderboard_type for leaderboard_type in leaderboard_types
+            if LEADERBOARD_PROFILE_GETTERS[leaderboard_type] is not None]
+        async with self.update_lock:
+            start_time = time.time()
+            updates = {}
+            for leaderboard_type in leaderboard_types:
+                # Some leaderboards share an update method
+                update_method = LEADERBOARD_UPDATE_METHODS[leaderboard_type]
+                if update_method in updates:
+                    continue
+                get_profiles = LEADERBOARD_PROFILE_GETTERS[leaderboard_type]
+                profiles = await get_profiles([discord_id])
+                if profiles:
+                    updates[update_method] = update_method(profiles)
+            if not updates:
+                return
+            await asyncio.gather(*updates.values())
+            await self.regenerate_discord_leaderboard_images(
+                leaderboard_types)
+            leaderboard_cog = self.bot.get_cog("LeaderboardCommands")
+            await leaderboard_cog.view.update_leaderboard_message()
+            end_time = time.time()
+            logger.info(f"Refreshed {', '.join(leaderboard_types)} for "
+                        f"{discord_id} in {end_time - start_time:.2f} s")
+
+
     @tasks.loop(minutes=10)
     async def refresh_leaderboards(self):
+        async with self.update_lock:
+            await self.refresh_all_leaderboards()
+
+
+    async def refresh_all_leaderboards(self):
         try:
             logger.info("Updating all leaderboards...")
             self.updating = True
             start_time = time.time()
-            await asyncio.gather(update_valorant_rank_leaderboard(),
-                                 update_valorant_dm_leaderboard(),
+            await asyncio.gather(update_valorant_leaderboards(),
                                  update_voltaic_s5_leaderboard(),
                                  update_voltaic_val_s1_leaderboard(),
                                  update_dojo_aimlabs_balanced_playlist_leaderboard(),
@@ -297,6 +367,8 @@ class DatabaseCommands(commands.Cog):
                 return await get_dojo_aimlabs_playlist_balanced_leaderboard_data()
             case "dojo_aimlabs_playlist_advanced":
                 return await get_dojo_aimlabs_playlist_advanced_leaderboard_data()
+            case "valorant_dm_performance_leaderboard":
+                return await get_valorant_dm_performance_leaderboard_data()
             case "discord_profiles":
                 return await get_discord_profiles()
 
@@ -386,6 +458,8 @@ class DatabaseCommands(commands.Cog):
             async with LEADERBOARD_CACHE_LOCK:
                 await delete_files_indir(LEADERBOARD_CACHE_DIR /
                                          leaderboard_type)
+                os.makedirs(LEADERBOARD_CACHE_DIR / leaderboard_type,
+                            exist_ok=True)
             for current_page in range(1, total_pages + 1):
                 start_idx = (current_page - 1) * leaderboard_page_size
                 end_idx = min(start_idx + leaderboard_page_size, len(data))
@@ -4,9 +4,11 @@ from discord import app_commands
 from utils.log import logger
 from services.db.kovaaks_database import (add_kovaaks_username_todb,
                                           remove_kovaaks_username_fromdb,
-                                          update_kovaaks_username_indb)
+                                          update_kovaaks_username_indb,
+                                          get_s5_breakdown)
 from services.api.kovaaks_api import check_kovaaks_username
-from utils.errors import (WeakError, CheckError)
+from utils.database_helper import get_kovaaks_profiles
+from utils.errors import (WeakError, CheckError, UsernameDoesNotExist)
 import traceback
 from utils.checks import is_correct_channel
 
@@ -152,6 +154,60 @@ class KovaaksCommands(commands.Cog):
                                             f"(oopsie teehee).\n\n{str(e)}")
 
 
+    @app_commands.command(name="kovaaks_breakdown",
+                          description="Shows your stored score and energy on "
+                                      "each scenario of a Voltaic S5 tier")
+    @app_commands.choices(tier=[
+        app_commands.Choice(name="Novice", value=0),
+        app_commands.Choice(name="Intermediate", value=1),
+        app_commands.Choice(name="Advanced", value=2)
+    ])
+    @is_correct_channel()
+    async def kovaaksbreakdown(self, interaction: discord.Interaction,
+                               tier: app_commands.Choice[int] | None = None
+                               ) -> None:
+        """Shows the member's per-scenario S5 scores and energies from the
+        stored scenario scores, without fetching them again
+
+        :param discord.Interaction interaction: Discord interaction
+        :param app_commands.Choice tier: Tier to show, defaults to the one
+            with the highest energy
+        :return: None
+        """
+        await interaction.response.defer(ephemeral=True)
+
+        user_nick = interaction.user.display_name
+        user_id = interaction.user.id
+        try:
+            profiles = await get_kovaaks_profiles([user_id])
+            if not profiles:
+                raise UsernameDoesNotExist(f"You do not have a kovaaks "
+                                           f"profile in the database. Add it "
+                                           f"using `/add_kovaaks_profile`")
+            tier_index, energy, scenarios = await get_s5_breakdown(
+                profiles[0][4], tier.value if tier else None)
+            tier_name = ["Novice", "Intermediate", "Advanced"][tier_index]
+            lines = [f"`{scenario_name}`: {score:g} ({scenario_energy:.0f} "
+                     f"energy)"
+                     for scenario_name, score, scenario_energy in scenarios]
+            logger.info(f"{user_nick} ({user_id}) ran /kovaaks_breakdown "
+                        f"with tier '{tier_name}' successfully")
+            await interaction.followup.send(
+                f"**{tier_name}**: {energy} energy\n" + "\n".join(lines))
+        except WeakError as e:
+            logger.warning(f"{user_nick} ({user_id}) ran "
+                           f"/kovaaks_breakdown -> "
+                           f"{e.__class__.__name__}: {e.message}")
+            await interaction.followup.send(e.message)
+        except Exception as e:
+            logger.error(
+                f"{user_nick} ({user_id}) ran /kovaaks_breakdown -> "
+                f"Unexpected error: {str(e)}\n{traceback.format_exc()}"
+            )
+            await interaction.followup.send(f"Ran into an unexpected error "
+                                            f"(oopsie teehee).\n\n{str(e)}")
+
+
     async def cog_app_command_error(self, interaction: discord.Interaction,
                                     e: app_commands.AppCommandError) -> None:
         if isinstance(e, CheckError):
@@ -0,0 +1,99 @@
+import asyncio
+import traceback
+
+import discord
+from discord.ext import commands
+
+from settings import GUILD_ID, PRESENCE_REFRESH_GAMES, PRESENCE_REFRESH_DELAY
+from utils.log import logger
+
+
+class PresenceListener(commands.Cog):
+    """Queues a refresh of a linked member's leaderboards a little after they
+    stop playing VALORANT, Aim Lab or KovaaK's, so boards update within
+    minutes of a session instead of waiting for their polling schedule."""
+    def __init__(self, bot):
+        self.bot = bot
+        # discord_id -> (delayed refresh task, leaderboard types to refresh)
+        self.pending: dict[int, tuple[asyncio.Task, set]] = {}
+
+
+    @staticmethod
+    def games_played(member: discord.Member) -> set:
+        games = set()
+        for activity in member.activities:
+            if activity.type != discord.ActivityType.playing or \
+                    not activity.name:
+                continue
+            name = activity.name.lower()
+            games.update(game for game in PRESENCE_REFRESH_GAMES
+                         if game in name)
+        return games
+
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before: discord.Member,
+                                 after: discord.Member):
+        if after.guild.id != GUILD_ID:
+            return
+        ended = self.games_played(before) - self.games_played(after)
+        if not ended:
+            return
+        leaderboard_types = {leaderboard_type for game in ended
+                             for leaderboard_type in
+                             PRESENCE_REFRESH_GAMES[game]}
+        database_cog = self.bot.get_cog("DatabaseCommands")
+        if database_cog is None:
+            return
+        # Members without a linked profile for the game have nothing to
+        # refresh
+        try:
+            leaderboard_types = await database_cog.linked_leaderboard_types(
+                after.id, leaderboard_types)
+        except Exception as e:
+            logger.error(f"Error looking up the linked profiles of "
+                         f"{after.id}: {str(e)}\n{traceback.format_exc()}")
+            return
+        if leaderboard_types:
+            self.queue_refresh(after.id, leaderboard_types)
+
+
+    def queue_refresh(self, discord_id: int, leaderboard_types: set):
+        """Debounces refreshes per member: a session ending while a refresh
+        is still waiting restarts the delay and merges the leaderboards."""
+        task, queued_types = self.pending.pop(discord_id, (None, set()))
+        if task:
+            task.cancel()
+        queued_types |= leaderboard_types
+        task = asyncio.create_task(
+            self.refresh_after_delay(discord_id, queued_types))
+        self.pending[discord_id] = (task, queued_types)
+
+
+    async def refresh_after_delay(self, discord_id: int,
+                                  leaderboard_types: set):
+        await asyncio.sleep(PRESENCE_REFRESH_DELAY)
+        # Past this point a new session end queues a separate refresh
+        self.pending.pop(discord_id, None)
+        database_cog = self.bot.get_cog("DatabaseCommands")
+        if database_cog is None or \
+                not database_cog.refresh_leaderboards.is_running():
+            return
+        try:
+            await database_cog.refresh_member_leaderboards(
+                discord_id, sorted(leaderboard_types))
+        except Exception as e:
+            logger.error(f"Error refreshing leaderboards of {discord_id} "
+                         f"after their session ended: "
+                         f"{str(e)}\n{traceback.format_exc()}")
+
+
+    async def cog_unload(self):
+        for task, _ in self.pending.values():
+            task.cancel()
+        self.pending.clear()
+
+
+async def setup(bot):
+    await bot.add_cog(PresenceListener(bot))
+async def teardown(bot): pass
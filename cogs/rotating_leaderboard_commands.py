@@ -1,18 +1,22 @@
 import discord
 from discord.ext import commands
 from discord import app_commands, ui, SelectOption
+from discord.ext import tasks
 from utils.log import logger
 
-from utils.errors import (WeakError, CheckError)
+from services.db.kovaaks_database import scenario_catalogue
+from utils.errors import (WeakError, CheckError, ScenarioDoesNotExist)
 import traceback
 from utils.checks import is_correct_channel, is_correct_author
 
 
 class ConfirmScenario(discord.ui.View):
-    def __init__(self, task_name, task_lifetime):
+    def __init__(self, task_name, task_lifetime, leaderboard_id=None):
         super().__init__()
         self.task_name = task_name
         self.task_lifetime = task_lifetime
+        # KovaaK's leaderboard id, when the scenario was resolved already
+        self.leaderboard_id = leaderboard_id
 
 
     @discord.ui.button(label="Confirm", style=discord.ButtonStyle.success)
@@ -93,6 +97,26 @@ class RotatingLeaderboardsCommands(commands.Cog):
         self.bot = bot
 
 
+    @tasks.loop(hours=1)
+    async def refresh_scenario_catalogue(self):
+        """Low priority background job downloading the KovaaK's scenario
+        catalogue behind scenario autocomplete once it's stale"""
+        try:
+            await scenario_catalogue.refresh()
+        except Exception as e:
+            logger.error(f"Failed to refresh KovaaK's scenario catalogue: "
+                         f"{str(e)}")
+
+
+    @refresh_scenario_catalogue.before_loop
+    async def before_refresh_scenario_catalogue(self):
+        await self.bot.wait_until_ready()
+
+
+    async def cog_unload(self):
+        self.refresh_scenario_catalogue.cancel()
+
+
     @is_correct_author()
     @is_correct_channel()
     @app_commands.command(name="create_leaderboard",
@@ -106,6 +130,73 @@ class RotatingLeaderboardsCommands(commands.Cog):
         logger.info(f"{user_nick} ({user_id}) ran /create_leaderboard")
 
 
+    async def scenario_autocomplete(self, interaction: discord.Interaction,
+                                    current: str
+                                    ) -> list[app_commands.Choice[str]]:
+        """Suggests KovaaK's scenarios from the local catalogue, no API
+        calls while the user types. The value is the leaderboard id, since
+        choice names are cut to 100 characters."""
+        return [app_commands.Choice(name=name[:100],
+                                    value=str(leaderboard_id))
+                for leaderboard_id, name
+                in scenario_catalogue.index.search(current)]
+
+
+    @is_correct_author()
+    @is_correct_channel()
+    @app_commands.command(name="create_kovaaks_leaderboard",
+                          description="Creates a new rotating kovaaks "
+                                      "leaderboard for a scenario")
+    @app_commands.autocomplete(scenario=scenario_autocomplete)
+    async def create_kovaaks_leaderboard(self,
+                                         interaction: discord.Interaction,
+                                         scenario: str,
+                                         lifetime: str) -> None:
+        """Same as the kovaaks modal of /create_leaderboard, with the
+        scenario name picked from autocomplete
+
+        :param discord.Interaction interaction: Discord interaction
+        :param str scenario: KovaaK's leaderboard id from autocomplete, or
+            a scenario name
+        :param str lifetime: When the leaderboard ends
+        :return: None
+        """
+        await interaction.response.defer(ephemeral=True)
+        user_nick = interaction.user.display_name
+        user_id = interaction.user.id
+        try:
+            resolved = scenario_catalogue.index.resolve(scenario)
+            if resolved is None:
+                raise ScenarioDoesNotExist(f"Scenario `{scenario}` isn't in "
+                                           f"the kovaaks scenario catalogue. "
+                                           f"Pick one of the suggestions.")
+            leaderboard_id, scenario_name = resolved
+            logger.info(f"{user_nick} ({user_id}) ran "
+                        f"/create_kovaaks_leaderboard with scenario "
+                        f"'{scenario_name}' ({leaderboard_id})")
+            await interaction.followup.send(
+                f"Confirm Task Details:\n"
+                f"Task Name: `{scenario_name}` & Ends At: `{lifetime}`",
+                view=ConfirmScenario(scenario_name, lifetime, leaderboard_id)
+            )
+        except WeakError as e:
+            logger.warning(f"{user_nick} ({user_id}) ran "
+                           f"/create_kovaaks_leaderboard -> "
+                           f"{e.__class__.__name__}: {e.message}")
+            await interaction.followup.send(e.message)
+        except Exception as e:
+            logger.error(
+                f"{user_nick} ({user_id}) ran /create_kovaaks_leaderboard -> "
+                f"Unexpected error: {str(e)}\n{traceback.format_exc()}"
+            )
+            await interaction.followup.send(f"Ran into an unexpected error "
+                                            f"(oopsie teehee).\n\n{str(e)}")
+
+
 async def setup(bot):
-    await bot.add_cog(RotatingLeaderboardsCommands(bot))
+    # The catalogue only backs this cog's autocomplete
+    await scenario_catalogue.load()
+    cog = RotatingLeaderboardsCommands(bot)
+    await bot.add_cog(cog)
+    cog.refresh_scenario_catalogue.start()
 async def teardown(bot): pass
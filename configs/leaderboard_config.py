@@ -47,6 +47,15 @@ def valorant_dm_parser(row):
     )
 
 
+def valorant_dm_performance_parser(row):
+    user_id, username, average_score, kills = row
+    return LeaderboardRenderRow(
+        user_id=user_id,
+        username=username,
+        score_display=f"{average_score} ({kills})"
+    )
+
+
 def voltaic_s5_benchmark_leaderboard_parser(row):
     user_id, username, current_rank, rank_id, energy, second_username = row
     score_display = f"{energy} - {current_rank}"
@@ -121,6 +130,13 @@ LEADERBOARD_RENDER_CONFIG = {
         score_position = 1710,
         draw_second_username = True,
         data_parser = dojo_aimlabs_playlist_renderer
+    ),
+    leaderboard_types_list[6]: LeaderboardRendererConfig(
+        title = "Valorant DM Performance",
+        headers = ["#", "User", "Avg (Kills)"],
+        header_positions = [40, 270, 1590],
+        score_position = 1640,
+        data_parser = valorant_dm_performance_parser
     )
 }
 
@@ -31,6 +31,15 @@ all_extensions = [
     'utils.api_helper',
     'utils.database_helper',
     'utils.image_gen',
+    'utils.worker_pool',
+    'utils.json_codec',
+    'utils.poll_scheduler',
+    'utils.weekly_window',
+    'utils.resolution_cache',
+    'utils.quantile_sketch',
+    'utils.benchmark_config',
+    'utils.scenario_index',
+    'utils.energy_batch',
 
     # Services API
     'services.api.val_api',
@@ -53,6 +62,7 @@ all_extensions = [
     'cogs.leaderboard_commands',
     'cogs.assign_roles_commands',
     'cogs.dojo_commands',
+    'cogs.presence_listener',
     # 'cogs.events_listener',
     # 'cogs.rotating_leaderboard_commands'
 ]
@@ -1,26 +1,208 @@
-import json
 import aiohttp, aiofiles, asyncio
-from functools import partial
-from typing import Any
+import hashlib
+import re
+from datetime import datetime
+from functools import lru_cache
 from collections import defaultdict
 
-from services.api.kovaaks_api import update_benchmark_scenario_list
-from settings import S1_VOLTAIC_VAL_BENCHMARKS_CONFIG
-from utils.errors import ErrorFetchingData, ProfileDoesntExist
-from utils.api_helper import AsyncRateLimiter, UpdatedAsyncRateLimiter
+from settings import (AIMLABS_API_BASE_URL, CONNECTION_KEEPALIVE,
+                      WORKER_CONCURRENCY, AIMLABS_PLAYS_CHUNK_SIZE,
+                      AIMLABS_PLAYS_CHUNK_RETRIES, AIMLABS_PERSISTED_QUERIES)
+from utils.errors import (ErrorFetchingData, ProfileDoesntExist,
+                          UnableToDecodeJson)
+from utils.api_helper import (AsyncRateLimiter, UpdatedAsyncRateLimiter,
+                              get_json, create_trace_config,
+                              prewarm_connections)
 from utils.log import logger, api_logger
+from utils.worker_pool import bounded_map
+from utils.resolution_cache import aimlabs_accounts
+from utils import json_codec
 
 # API Endpoint
-API_ENDPOINT = "https://api.aimlab.gg/graphql"
+API_ENDPOINT = f"{AIMLABS_API_BASE_URL}/graphql"
 # aimlabs_api_rate_limiter = AsyncRateLimiter("aimlabs")
 aimlabs_api_rate_limiter = UpdatedAsyncRateLimiter("aimlabs")
 
-SCENARIO_LIST_URL = \
-    "https://beta.voltaic.gg/api/v1/aimlabs/benchmarks/valorant_s1"
 aimlabs_api_session: aiohttp.ClientSession | None = None
-update_config: Any = None
+prewarm_task: asyncio.Task | None = None
 
-GET_LEADERBOARD_INPUT = """
+# Task mode of the custom levels our leaderboards track
+TASK_MODE = 42
+# Every this many calls an operation's latency summary is logged
+QUERY_STATS_LOG_EVERY = 100
+PERSISTED_QUERY_ERRORS = {
+    "PersistedQueryNotFound": "not_found",
+    "PERSISTED_QUERY_NOT_FOUND": "not_found",
+    "PersistedQueryNotSupported": "not_supported",
+    "PERSISTED_QUERY_NOT_SUPPORTED": "not_supported",
+}
+
+
+class GraphQLQuery:
+    """A registered GraphQL document: minified, checked and hashed once,
+    with the latency of every call made with it."""
+    def __init__(self, document: str):
+        # Strip the indentation and the whitespace around punctuation, none
+        # of our documents contain string literals
+        document = re.sub(r"\s+", " ", document).strip()
+        self.document = re.sub(r" ?([{}():,!$=]) ?", r"\1", document)
+        match = re.match(r"(query|mutation) (\w+)", self.document)
+        if match is None:
+            raise ValueError(f"GraphQL document must start with a named "
+                             f"operation: {self.document[:40]}")
+        self.name = match.group(2)
+        self.validate()
+        self.sha256 = hashlib.sha256(self.document.encode()).hexdigest()
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.persisted_hits = 0
+        self.persisted_misses = 0
+
+    def validate(self) -> None:
+        depth = 0
+        for char in self.document:
+            depth += {"{": 1, "(": 1, "}": -1, ")": -1}.get(char, 0)
+            if depth < 0:
+                break
+        if depth != 0:
+            raise ValueError(f"Unbalanced brackets in GraphQL operation "
+                             f"{self.name}")
+        header, _, selection = self.document.partition("{")
+        declared = set(re.findall(r"\$(\w+):", header))
+        used = set(re.findall(r"\$(\w+)", selection))
+        if declared != used:
+            raise ValueError(f"GraphQL operation {self.name} declares "
+                             f"{sorted(declared)} but uses {sorted(used)}")
+
+    def record(self, seconds: float, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+        if self.calls % QUERY_STATS_LOG_EVERY == 0:
+            api_logger.info(self.summary())
+
+    def summary(self) -> str:
+        mean = self.total_time / self.calls if self.calls else 0
+        return (f"aimlabs {self.name}: {self.calls} calls, "
+                f"{self.errors} errors, mean {mean * 1000:.0f} ms, "
+                f"max {self.max_time * 1000:.0f} ms, persisted "
+                f"{self.persisted_hits} hits/{self.persisted_misses} misses")
+
+
+class QueryRegistry:
+    """The GraphQL operations sent to aimlabs.
+
+    With persisted queries enabled a request first sends only the
+    document's sha256 (automatic persisted queries). If the server doesn't
+    know the hash yet the request is repeated with the full document, which
+    the server then stores. Any other response with errors and no data is
+    treated the same way, since a server may reject the hash with errors it
+    doesn't label. A server that doesn't support persisted queries, or
+    whose unlabelled rejection the full document gets past, disables them
+    for the rest of the session.
+    """
+    def __init__(self, persisted: bool = AIMLABS_PERSISTED_QUERIES):
+        self.persisted = persisted
+        self.queries: dict[str, GraphQLQuery] = {}
+
+    def register(self, document: str) -> GraphQLQuery:
+        query = GraphQLQuery(document)
+        if query.name in self.queries and \
+                self.queries[query.name].sha256 != query.sha256:
+            raise ValueError(f"GraphQL operation {query.name} registered "
+                             f"twice with different documents")
+        return self.queries.setdefault(query.name, query)
+
+    async def execute(self, query: GraphQLQuery, variables: dict,
+                      record_as: str = None):
+        """Runs a registered operation. Returns (data, headers) and raises
+        aiohttp.ClientResponseError on error statuses."""
+        start_time = asyncio.get_running_loop().time()
+        failed = True
+        try:
+            if not self.persisted:
+                result = await self.post(query, variables, record_as, True)
+                failed = False
+                return result
+            data, headers = await self.post(query, variables, record_as,
+                                            False)
+            error = get_persisted_query_error(data)
+            if error is None and not is_rejected(data):
+                query.persisted_hits += 1
+                failed = False
+                return data, headers
+            query.persisted_misses += 1
+            if error == "not_supported":
+                self.disable_persisted()
+            result = await self.post(query, variables, record_as, True)
+            if error is None and not is_rejected(result[0]):
+                self.disable_persisted()
+            failed = False
+            return result
+        finally:
+            query.record(asyncio.get_running_loop().time() - start_time,
+                         failed)
+
+    def disable_persisted(self) -> None:
+        if self.persisted:
+            self.persisted = False
+            api_logger.info("Aimlabs API doesn't support persisted "
+                            "queries, sending full documents")
+
+    async def post(self, query: GraphQLQuery, variables: dict,
+                   record_as: str | None, send_document: bool):
+        body = {"operationName": query.name, "variables": variables}
+        if send_document:
+            body["query"] = query.document
+        if self.persisted:
+            body["extensions"] = {"persistedQuery": {
+                "version": 1, "sha256Hash": query.sha256}}
+        async with aimlabs_api_session.post(
+                url=API_ENDPOINT,
+                headers={"Content-Type": "application/json"},
+                json=body
+        ) as response:
+            headers = response.headers
+            if response.status >= 400:
+                # Some servers answer an unknown hash with a 400
+                try:
+                    data = json_codec.loads(await response.read())
+                except Exception:
+                    data = None
+                if not send_document and (
+                        get_persisted_query_error(data) is not None or
+                        response.status == 400 and is_rejected(data)):
+                    return data, headers
+                response.raise_for_status()
+            return await get_json(response, record_as), headers
+
+
+def is_rejected(data) -> bool:
+    """True if a GraphQL response has errors and no data, i.e. the operation
+    didn't run"""
+    return isinstance(data, dict) and bool(data.get('errors')) and \
+        data.get('data') is None
+
+
+def get_persisted_query_error(data) -> str | None:
+    """Returns "not_found" or "not_supported" if the response rejected a
+    persisted query hash"""
+    if not isinstance(data, dict):
+        return None
+    for error in data.get('errors') or []:
+        code = (error.get('extensions') or {}).get('code')
+        for key in (code, error.get('message')):
+            if key in PERSISTED_QUERY_ERRORS:
+                return PERSISTED_QUERY_ERRORS[key]
+    return None
+
+
+queries = QueryRegistry()
+
+GET_LEADERBOARD_INPUT = queries.register("""
 query LeaderboardEntry($leaderboardInput: LeaderboardInput!) {
     aimlab {
         leaderboard(input: $leaderboardInput) {
@@ -33,10 +215,10 @@ query LeaderboardEntry($leaderboardInput: LeaderboardInput!) {
         }
     }
 }
-"""
+""")
 
 
-GET_USER_PLAYS_AGG = """
+GET_USER_PLAYS_AGG = queries.register("""
 query GetAimlabProfileAgg($where: AimlabPlayWhere!) {
     aimlab {
         plays_agg(where: $where) {
@@ -53,11 +235,11 @@ query GetAimlabProfileAgg($where: AimlabPlayWhere!) {
         }
     }
 }
-"""
+""")
 
 
 # GraphQL Queries
-GET_USER_INFO = """
+GET_USER_INFO = queries.register("""
 query GetProfile($username: String) {
     aimlabProfile(username: $username) {
         username
@@ -66,14 +248,29 @@ query GetProfile($username: String) {
             }
     }
 }
-"""
+""")
+
+
+@lru_cache(maxsize=8)
+def get_profiles_query(count: int) -> GraphQLQuery:
+    """GraphQL document looking up `count` usernames at once, one aliased
+    aimlabProfile field per username ($u0 -> p0, $u1 -> p1, ...)"""
+    params = ", ".join(f"$u{i}: String" for i in range(count))
+    fields = "\n".join(f"    p{i}: aimlabProfile(username: $u{i}) "
+                       f"{{ username user {{ id }} }}" for i in range(count))
+    return queries.register(f"query GetProfiles{count}({params}) "
+                            f"{{\n{fields}\n}}")
 
 
 async def get_session():
     global aimlabs_api_session
     if aimlabs_api_session is None or aimlabs_api_session.closed:
         aimlabs_api_session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            connector=aiohttp.TCPConnector(
+                limit=100, ttl_dns_cache=300,
+                keepalive_timeout=CONNECTION_KEEPALIVE),
+            json_serialize=json_codec.dumps,
+            trace_configs=[create_trace_config()]
         )
         api_logger.info("Connection established to aimlabs API")
         logger.info(f"Connection established to aimlabs API")
@@ -90,103 +287,202 @@ async def close_session():
 
 
 @aimlabs_api_rate_limiter
-async def fetch_user_plays(user_ids: list[str], all_task_ids: list[str],
-                           max_min=False):
+async def fetch_user_plays_chunk(user_ids: list[str], all_task_ids: list[str],
+                                 since: datetime | None = None):
+    """Returns the plays_agg entries (best score per user and task) of one
+    chunk of users, over their plays created after `since` if given"""
     # Prepare variables for the API query
     variables = {
         "where": {
             "is_practice": {"_eq": False},
             "task_id": {"_in": all_task_ids},
             "user_id": {"_in": user_ids},
-            "task_mode": {"_eq": 42},
+            "task_mode": {"_eq": TASK_MODE},
         }
     }
+    if since is not None:
+        variables["where"]["created_at"] = {"_gt": since.isoformat()}
     try:
-        async with aimlabs_api_session.post(
-                url=API_ENDPOINT,
-                headers={"Content-Type": "application/json"},
-                json={"query": GET_USER_PLAYS_AGG, "variables": variables}
-        ) as response:
-            headers = response.headers
-            response.raise_for_status()
-            data = await response.json()
-            # Process the response
-            if not data.get('data', {}).get('aimlab', {}).get('plays_agg'):
-                return {}, headers
-
-            # Create a dictionary to store scores: {user_id: {task_id: score}}
-            user_scores = {}
-            task_scores = defaultdict(list)
-            for entry in data['data']['aimlab']['plays_agg']:
-                user_id = entry['group_by']['user_id']
-                task_id = entry['group_by']['task_id']
-                score = entry['aggregate']['max']['score']
-
-                if user_id not in user_scores:
-                    user_scores[user_id] = {}
-                if score >= 0:
-                    task_scores[task_id].append(score)
-                user_scores[user_id][task_id] = score
-            task_min_max = None
-            if max_min:
-                task_min_max = {
-                    task_id: {
-                        'min': min(scores),
-                        'max': max(scores),
-                        'scores': scores  # Optional: Keep all scores if needed
-                    }
-                    for task_id, scores in task_scores.items() if scores
-                }
-            _data = {"user_scores": user_scores, "task_min_max": task_min_max}
-            with open(r'C:\Users\partt\PycharmProjects\aimlabs_api_data\temp\data.json', 'w', encoding='utf-8') as f:
-                json.dump(_data, f, ensure_ascii=False, indent=4)
-            return (user_scores, task_min_max), headers
+        data, headers = await queries.execute(GET_USER_PLAYS_AGG, variables,
+                                              "plays_agg")
+        entries = (data.get('data') or {}).get('aimlab', {}) \
+            .get('plays_agg')
+        return entries or [], headers
     except Exception as e:
         raise ErrorFetchingData(f"API returned status "
-                                f"`{response.status}` Reason: {str(e)}",
-                                headers=headers)
+                                f"`{getattr(e, 'status', None)}` "
+                                f"Reason: {str(e)}",
+                                headers=getattr(e, 'headers', None))
+
+
+async def fetch_user_plays(user_ids: list[str], all_task_ids: list[str],
+                           since: dict | None = None):
+    """Returns the best score of every user on every task they played as
+    {user_id: {task_id: score}}, the valid (non-negative) scores of each
+    task as {task_id: [score, ...]} for normalizing against the population,
+    and the set of user ids whose scores couldn't be fetched.
+
+    Users are queried in chunks of AIMLABS_PLAYS_CHUNK_SIZE, several at a
+    time under the rate limiter, and merged as each chunk completes. A
+    failing chunk is retried on its own and given up on after
+    AIMLABS_PLAYS_CHUNK_RETRIES, leaving the other chunks' scores intact.
+
+    With `since` ({user_id: datetime}) only plays created after a user's
+    datetime are aggregated, users missing from it get their full history.
+    Users are chunked in order of that datetime and each chunk queries from
+    its earliest one, so a chunk may return a few already seen plays.
+    """
+    since = since or {}
+    user_ids = sorted(user_ids, key=lambda user_id: (
+        user_id in since, since.get(user_id) or datetime.min))
+    chunks = [user_ids[i:i + AIMLABS_PLAYS_CHUNK_SIZE]
+              for i in range(0, len(user_ids), AIMLABS_PLAYS_CHUNK_SIZE)]
+
+    async def fetch_chunk(chunk: list[str]):
+        chunk_since = since.get(chunk[0])
+        for attempt in range(AIMLABS_PLAYS_CHUNK_RETRIES + 1):
+            try:
+                return chunk, await fetch_user_plays_chunk(chunk,
+                                                           all_task_ids,
+                                                           chunk_since)
+            except ErrorFetchingData as e:
+                if attempt == AIMLABS_PLAYS_CHUNK_RETRIES:
+                    logger.error(f"Giving up on aimlabs scores of "
+                                 f"{len(chunk)} users after "
+                                 f"{attempt + 1} attempts: {e.message}")
+                    return chunk, None
+                await asyncio.sleep(2 ** attempt)
+
+    user_scores = {}
+    task_scores = defaultdict(list)
+    missing_user_ids = set()
+    async for chunk, entries in bounded_map(fetch_chunk, chunks,
+                                            WORKER_CONCURRENCY["aimlabs"]):
+        if entries is None:
+            missing_user_ids.update(chunk)
+            continue
+        for entry in entries:
+            user_id = entry['group_by']['user_id']
+            task_id = entry['group_by']['task_id']
+            score = entry['aggregate']['max']['score']
+
+            if user_id not in user_scores:
+                user_scores[user_id] = {}
+            if score >= 0:
+                task_scores[task_id].append(score)
+            user_scores[user_id][task_id] = score
+    if chunks and len(missing_user_ids) == len(user_ids):
+        raise ErrorFetchingData(f"Unable to fetch aimlabs scores of any of "
+                                f"the {len(user_ids)} users")
+    return user_scores, dict(task_scores), missing_user_ids
+
+
+@aimlabs_api_rate_limiter
+async def fetch_task_leaderboard_scores(task_id: str, offset: int, limit: int,
+                                        weapon_id: str | None = None):
+    """Returns the scores on one page of a task's global aimlabs
+    leaderboard, best first. Empty past the last ranked player."""
+    leaderboard_input = {"clientId": "aimlab", "taskId": task_id,
+                         "taskMode": TASK_MODE, "offset": offset,
+                         "limit": limit}
+    if weapon_id:
+        leaderboard_input["weaponId"] = weapon_id
+    try:
+        data, headers = await queries.execute(
+            GET_LEADERBOARD_INPUT, {"leaderboardInput": leaderboard_input},
+            "leaderboard")
+        leaderboard = ((data.get('data') or {}).get('aimlab') or {}) \
+            .get('leaderboard') or {}
+        scores = []
+        for entry in leaderboard.get('leaderboardEntries') or []:
+            # data is a JSON scalar, some responses encode it as a string
+            entry_data = entry['data']
+            if isinstance(entry_data, str):
+                entry_data = json_codec.loads(entry_data)
+            scores.append(entry_data['score'])
+        return scores, headers
+    except Exception as e:
+        raise ErrorFetchingData(f"Error while fetching the global aimlabs "
+                                f"leaderboard of `{task_id}`. Status code: "
+                                f"{getattr(e, 'status', None)}. {str(e)}",
+                                headers=getattr(e, 'headers', None))
 
 
+@aimlabs_accounts
 @aimlabs_api_rate_limiter
 async def check_aimlabs_username(username:str):
     """Queries aimlabs api and checks if username exists."""
     try:
-        async with aimlabs_api_session.post(
-                url=API_ENDPOINT,
-                headers={"Content-Type": "application/json"},
-                json={"query": GET_USER_INFO, "variables":
-                    {"username": username}}
-        ) as response:
-            headers = response.headers
-            response.raise_for_status()
-            data = await response.json()
+        data, headers = await queries.execute(
+            GET_USER_INFO, {"username": username}, "aimlab_profile")
 
-            if 'data' not in data or data['data']['aimlabProfile'] is None:
-                raise ProfileDoesntExist(f"Profile with username "
-                                         f"`{username}` doesn't exist",
-                                         headers=headers,
-                                         username=username)
-            return data['data']['aimlabProfile']['user']['id'], headers
+        if 'data' not in data or data['data']['aimlabProfile'] is None:
+            raise ProfileDoesntExist(f"Profile with username "
+                                     f"`{username}` doesn't exist",
+                                     headers=headers,
+                                     username=username)
+        return data['data']['aimlabProfile']['user']['id'], headers
 
     except aiohttp.ClientResponseError as e:
         raise ErrorFetchingData(f"API returned status "
-                                f"`{response.status}` Reason: {str(e)}",
-                                headers=headers,
+                                f"`{e.status}` Reason: {str(e)}",
+                                headers=e.headers,
                                 username=username)
     except aiohttp.ClientError as e:
         raise ErrorFetchingData(f"AIOHTTP error occurred: {str(e)}",
-                                headers=headers, username=username)
+                                username=username)
+    except UnableToDecodeJson as e:
+        raise ErrorFetchingData(f"Unable to decode aimlabs API response",
+                                username=username)
     except Exception as error:
         raise error
 
 
+@aimlabs_api_rate_limiter
+async def resolve_aimlabs_usernames(usernames: list[str]):
+    """Looks up many aimlabs usernames in a single request. Returns
+    {username: (current_username, user_id)}, or None as the value for
+    usernames that don't exist. Usernames whose lookup errored upstream are
+    left out."""
+    variables = {f"u{i}": username for i, username in enumerate(usernames)}
+    try:
+        data, headers = await queries.execute(
+            get_profiles_query(len(usernames)), variables, "aimlab_profiles")
+        if not data.get('data'):
+            raise ErrorFetchingData(f"No data in aimlabs response: "
+                                    f"{data.get('errors')}",
+                                    headers=headers)
+        errored = {error['path'][0] for error in data.get('errors') or []
+                   if error.get('path')}
+        resolved = {}
+        for i, username in enumerate(usernames):
+            alias = f"p{i}"
+            if alias in errored:
+                continue
+            profile = data['data'].get(alias)
+            resolved[username] = None if profile is None else \
+                (profile['username'], profile['user']['id'])
+        return resolved, headers
+    except ErrorFetchingData:
+        raise
+    except Exception as e:
+        raise ErrorFetchingData(f"API returned status "
+                                f"`{getattr(e, 'status', None)}` "
+                                f"Reason: {str(e)}",
+                                headers=getattr(e, 'headers', None))
+
+
 async def setup(bot):
     global aimlabs_api_session
-    global update_config
+    global prewarm_task
     aimlabs_api_session = await get_session()
-    update_config = partial(update_benchmark_scenario_list,
-                            url=SCENARIO_LIST_URL,
-                            path=S1_VOLTAIC_VAL_BENCHMARKS_CONFIG,
-                            session=aimlabs_api_session)
+    prewarm_task = asyncio.create_task(
+        prewarm_connections(aimlabs_api_session, [AIMLABS_API_BASE_URL],
+                            "aimlabs"))
 async def teardown(bot):
+    if prewarm_task:
+        prewarm_task.cancel()
+    for query in queries.queries.values():
+        if query.calls:
+            api_logger.info(query.summary())
     await close_session()
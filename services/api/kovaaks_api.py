@@ -1,27 +1,34 @@
-from functools import partial
 import aiohttp
-from typing import Any
+import asyncio
 
-from utils.api_helper import update_benchmark_scenario_list
+from utils.api_helper import get_json
 from utils.errors import (ErrorFetchingData, ProfileDoesntExist)
-from utils.api_helper import AsyncRateLimiter, UpdatedAsyncRateLimiter
+from utils.api_helper import (AsyncRateLimiter, UpdatedAsyncRateLimiter,
+                              create_trace_config, prewarm_connections)
 from utils.log import logger, api_logger
-from settings import S5_VOLTAIC_BENCHMARKS_CONFIG
+from utils.resolution_cache import kovaaks_accounts
+from utils import json_codec
+from settings import KOVAAKS_API_BASE_URL, CONNECTION_KEEPALIVE
 
-SCENARIO_LIST_URL = \
-    "https://beta.voltaic.gg/api/v1/kovaaks/benchmarks/kovaaks_s5"
+API_ENDPOINT = f"{KOVAAKS_API_BASE_URL}/webapp-backend"
+# KovaaK's benchmark ids of the S5 tiers, novice to advanced
+S5_BENCHMARK_IDS = (432, 431, 427)
 
 # kovaaks_api_rate_limiter = AsyncRateLimiter("kovaaks")
 kovaaks_api_rate_limiter = UpdatedAsyncRateLimiter("kovaaks")
 kovaaks_api_session: aiohttp.ClientSession | None = None
-update_config: Any = None
+prewarm_task: asyncio.Task | None = None
 
 
 async def get_session():
     global kovaaks_api_session
     if kovaaks_api_session is None or kovaaks_api_session.closed:
         kovaaks_api_session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            connector=aiohttp.TCPConnector(
+                limit=100, ttl_dns_cache=300,
+                keepalive_timeout=CONNECTION_KEEPALIVE),
+            json_serialize=json_codec.dumps,
+            trace_configs=[create_trace_config()]
         )
     api_logger.info("Connection established to kovaaks API")
     logger.info(f"Connection established to kovaaks API")
@@ -38,73 +45,23 @@ async def close_session():
 
 
 @kovaaks_api_rate_limiter
-async def get_s5_novice_benchmark_scores(steam_id: str):
-    """Gets S5 benchmark scores """
-    await update_config()
+async def get_s5_benchmark_scores(steam_id: str, benchmark_id: int):
+    """Gets a player's scores on an S5 benchmark as (scenario name, score)
+    pairs, in benchmark order"""
     try:
         async with kovaaks_api_session.get(
-            f"https://kovaaks.com/webapp-backend/benchmarks/"
+            f"{API_ENDPOINT}/benchmarks/"
             f"player-progress-rank-benchmark?"
-            f"benchmarkId=432&steamId={steam_id}"
+            f"benchmarkId={benchmark_id}&steamId={steam_id}"
         ) as response:
             response.raise_for_status()
             headers = response.headers
-            data = await response.json()
+            data = await get_json(response, "benchmark")
             scores = []
             for category in data["categories"]:
                 for scenario in data["categories"][category]["scenarios"]:
                     score = data["categories"][category]["scenarios"][scenario]["score"]
-                    scores.append(score//100)
-            return scores, headers
-    except Exception as e:
-        raise ErrorFetchingData(f"Error while fetching leaderboard data for "
-                                f"steam ID `{steam_id}`. "
-                                f"\n\nStatus code: {response.status}. {str(e)}")
-
-
-@kovaaks_api_rate_limiter
-async def get_s5_intermediate_benchmark_scores(steam_id: str):
-    """Gets S5 benchmark scores """
-    await update_config()
-    try:
-        async with kovaaks_api_session.get(
-                f"https://kovaaks.com/webapp-backend/benchmarks/"
-                f"player-progress-rank-benchmark?"
-                f"benchmarkId=431&steamId={steam_id}"
-        ) as response:
-            response.raise_for_status()
-            headers = response.headers
-            data = await response.json()
-            scores = []
-            for category in data["categories"]:
-                for scenario in data["categories"][category]["scenarios"]:
-                    score = data["categories"][category]["scenarios"][scenario]["score"]
-                    scores.append(score//100)
-            return scores, headers
-    except Exception as e:
-        raise ErrorFetchingData(f"Error while fetching leaderboard data for "
-                                f"steam ID `{steam_id}`. "
-                                f"\n\nStatus code: {response.status}. {str(e)}")
-
-
-@kovaaks_api_rate_limiter
-async def get_s5_advance_benchmark_scores(steam_id: str):
-    """Gets S5 benchmark scores """
-    await update_config()
-    try:
-        async with kovaaks_api_session.get(
-                f"https://kovaaks.com/webapp-backend/benchmarks/"
-                f"player-progress-rank-benchmark?"
-                f"benchmarkId=427&steamId={steam_id}"
-        ) as response:
-            response.raise_for_status()
-            headers = response.headers
-            data = await response.json()
-            scores = []
-            for category in data["categories"]:
-                for scenario in data["categories"][category]["scenarios"]:
-                    score = data["categories"][category]["scenarios"][scenario]["score"]
-                    scores.append(score//100)
+                    scores.append((scenario, score//100))
             return scores, headers
     except Exception as e:
         raise ErrorFetchingData(f"Error while fetching leaderboard data for "
@@ -112,17 +69,18 @@ async def get_s5_advance_benchmark_scores(steam_id: str):
                                 f"\n\nStatus code: {response.status}. {str(e)}")
 
 
+@kovaaks_accounts
 @kovaaks_api_rate_limiter
 async def check_kovaaks_username(username: str):
     """Checks if kovaaks username is valid, returns playerId and steamId"""
     try:
         async with kovaaks_api_session.get(
-            f"https://kovaaks.com/webapp-backend/user/profile/"
+            f"{API_ENDPOINT}/user/profile/"
             f"by-username?username={username}"
         ) as response:
             response.raise_for_status()
             headers = response.headers
-            data = await response.json()
+            data = await get_json(response, "profile")
             return ((data['playerId'], data['steamId'],
                      data['steamAccountName']), headers)
     except Exception as e:
@@ -142,12 +100,12 @@ async def get_scenario_id(scenario_name: str):
     """Queries for scenario details"""
     try:
         async with kovaaks_api_session.get(
-            f"https://kovaaks.com/webapp-backend/scenario/popular?"
+            f"{API_ENDPOINT}/scenario/popular?"
             f"page=0&max=1&scenarioNameSearch={scenario_name}"
         ) as response:
             response.raise_for_status()
             headers = response.headers
-            data = await response.json()
+            data = await get_json(response, "scenarios")
 
             return data['scenarioId'], headers
     except Exception as e:
@@ -156,18 +114,39 @@ async def get_scenario_id(scenario_name: str):
                                 f"\n\nStatus code: {response.status}. {str(e)}")
 
 
+@kovaaks_api_rate_limiter
+async def get_scenario_page(page: int, max_results: int):
+    """Gets a page of scenarios by popularity. Returns (total, [(leaderboard
+    id, scenario name), ...])"""
+    try:
+        async with kovaaks_api_session.get(
+            f"{API_ENDPOINT}/scenario/popular?"
+            f"page={page}&max={max_results}"
+        ) as response:
+            response.raise_for_status()
+            headers = response.headers
+            data = await get_json(response, "scenarios")
+            scenarios = [(scenario['leaderboardId'], scenario['scenarioName'])
+                         for scenario in data['data']]
+            return (data['total'], scenarios), headers
+    except Exception as e:
+        raise ErrorFetchingData(f"Error while fetching scenario page "
+                                f"{page}. "
+                                f"\n\nStatus code: {response.status}. {str(e)}")
+
+
 async def setup(bot):
     global kovaaks_api_session
-    global update_config
+    global prewarm_task
     kovaaks_api_session = await get_session()
-    update_config = partial(update_benchmark_scenario_list,
-                            url=SCENARIO_LIST_URL,
-                            path=S5_VOLTAIC_BENCHMARKS_CONFIG,
-                            session=kovaaks_api_session)
-    await update_config()
+    prewarm_task = asyncio.create_task(
+        prewarm_connections(kovaaks_api_session, [KOVAAKS_API_BASE_URL],
+                            "kovaaks"))
 
 
 async def teardown(bot):
+    if prewarm_task:
+        prewarm_task.cancel()
     await close_session()
 
 
@@ -175,4 +154,4 @@ async def teardown(bot):
 #     import asyncio
 #     new_loop = asyncio.new_event_loop()
 #     new_loop.run_until_complete(setup(None))
-#     new_loop.run_until_complete(get_s5_advance_benchmark_scores("76561198839916720"))
+#     new_loop.run_until_complete(get_s5_benchmark_scores("76561198839916720", 427))
@@ -1,24 +1,39 @@
 import aiohttp
+import asyncio
 import traceback
 
 from utils.errors import (ErrorFetchingData, ProfileDoesntExist,
                           UnableToDecodeJson)
-from settings import VALO_API_KEY
-from utils.api_helper import AsyncRateLimiter, get_json, UpdatedAsyncRateLimiter
+from settings import (VALO_API_KEYS, HENRIK_API_BASE_URL,
+                      CONNECTION_KEEPALIVE)
+from utils.api_helper import (AsyncRateLimiter, get_json,
+                              UpdatedAsyncRateLimiter, ApiKeyPool,
+                              create_trace_config, prewarm_connections)
 from utils.log import logger, api_logger
+from utils.resolution_cache import valorant_accounts
+from utils import json_codec
 
 # val_api_rate_limiter = AsyncRateLimiter("val")
-val_api_rate_limiter = UpdatedAsyncRateLimiter("val")
+# val_api_rate_limiter = UpdatedAsyncRateLimiter("val")
+val_api_rate_limiter = ApiKeyPool("val", VALO_API_KEYS)
 val_api_session: aiohttp.ClientSession | None = None
+prewarm_task: asyncio.Task | None = None
 
 PLATFORM = "pc"
+# Largest page the v4 matches endpoint serves
+MATCH_PAGE_SIZE = 10
+API_ENDPOINT = f"{HENRIK_API_BASE_URL}/valorant"
 
 
 async def get_session():
     global val_api_session
     if val_api_session is None or val_api_session.closed:
         val_api_session = aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            connector=aiohttp.TCPConnector(
+                limit=100, ttl_dns_cache=300,
+                keepalive_timeout=CONNECTION_KEEPALIVE),
+            json_serialize=json_codec.dumps,
+            trace_configs=[create_trace_config()]
         )
     api_logger.info("Connection established to val API")
     logger.info(f"Connection established to val API")
@@ -35,25 +50,33 @@ async def close_session():
 
 
 @val_api_rate_limiter
-async def fetch_dms(puuid: str, region: str, dm_type: str):
+async def fetch_matches(puuid: str, region: str, api_key: str, start: int = 0,
+                        size: int = MATCH_PAGE_SIZE, mode: str | None = None):
+    """Returns one page of the player's matches, newest first. Without mode
+    every queue is returned, so one pass covers all the modes we track."""
+    headers = None
     data = None
+    params = {"start": start, "size": size}
+    if mode:
+        params["mode"] = mode
     try:
         async with val_api_session.get(
-                f"https://api.henrikdev.xyz/valorant/v4/by-puuid/matches"
-                f"/{region}/{PLATFORM}/{puuid}?mode={dm_type}&size=5",
-                headers={"Authorization": f"{VALO_API_KEY}"}
+                f"{API_ENDPOINT}/v4/by-puuid/matches"
+                f"/{region}/{PLATFORM}/{puuid}",
+                params=params,
+                headers={"Authorization": api_key}
         ) as response:
             headers = response.headers
-            data = await get_json(response)
+            data = await get_json(response, "matches")
             response.raise_for_status()
-            return data, headers
+            return data['data'], headers
     except UnableToDecodeJson as e:
         raise ErrorFetchingData(f"Unable to decode Valorant API "
                                 f"response.\n"
                                 f"{str(e)}\n{traceback.format_exc()}",
                                 headers=headers)
     except Exception as e:
-        if data:
+        if data and 'errors' in data:
             raise ErrorFetchingData(f"Status code: "
                                     f"{data['errors'][0]['status']}. "
                                     f"Error code: {data['errors'][0]['code']}. "
@@ -62,24 +85,24 @@ async def fetch_dms(puuid: str, region: str, dm_type: str):
                                     puuid=puuid,
                                     region=region,
                                     )
-        ErrorFetchingData(f"Error when querying valorant API. "
-                          f"{str(e)}\n{traceback.format_exc()}",
-                          headers=headers,
-                          puuid=puuid,
-                          region=region,
-                          )
+        raise ErrorFetchingData(f"Error when querying valorant API. "
+                                f"{str(e)}\n{traceback.format_exc()}",
+                                headers=headers,
+                                puuid=puuid,
+                                region=region,
+                                )
 
 
 @val_api_rate_limiter
-async def fetch_rating(puuid: str, region: str):
+async def fetch_rating(puuid: str, region: str, api_key: str):
     try:
         async with val_api_session.get(
-                f"https://api.henrikdev.xyz/valorant/v3/by-puuid/mmr/"
+                f"{API_ENDPOINT}/v3/by-puuid/mmr/"
                 f"{region}/{PLATFORM}/{puuid}",
-                headers={"Authorization": f"{VALO_API_KEY}"},
+                headers={"Authorization": api_key},
         ) as response:
             headers = response.headers
-            data = await get_json(response)
+            data = await get_json(response, "mmr")
             response.raise_for_status()
             current_rank = data['data']['current']['tier']['name']
             current_rank_id = data['data']['current']['tier']['id']
@@ -109,20 +132,30 @@ async def fetch_rating(puuid: str, region: str):
                                 f"{str(e)}\n{traceback.format_exc()}",)
 
 
+@valorant_accounts
 @val_api_rate_limiter
-async def check_valorant_username(username: str, tag: str):
+async def check_valorant_username(username: str, tag: str, api_key: str):
     """Checks if valorant username and tag is valid, returns PUUID and region"""
+    headers = None
     try:
         async with val_api_session.get(
-                f"https://api.henrikdev.xyz/valorant/v1/account/{username}/"
+                f"{API_ENDPOINT}/v1/account/{username}/"
                 f"{tag}",
-                headers={"Authorization": f"{VALO_API_KEY}"},
+                headers={"Authorization": api_key},
         ) as response:
             headers = response.headers
+            if response.status == 404:
+                raise ProfileDoesntExist(f"Valorant profile "
+                                         f"`{username}#{tag}` doesn't exist.",
+                                         headers=headers,
+                                         username=username,
+                                         tag=tag)
             response.raise_for_status()
-            data = await response.json()
+            data = await get_json(response, "account")
             return (data['data']['puuid'],
                     data['data']['region']), headers
+    except ProfileDoesntExist:
+        raise
     except Exception as e:
         raise ErrorFetchingData(f"Error while checking "
                                 f"valorant username `{username}#{tag}`. "
@@ -136,6 +169,11 @@ async def check_valorant_username(username: str, tag: str):
 
 async def setup(bot):
     global val_api_session
+    global prewarm_task
     val_api_session = await get_session()
+    prewarm_task = asyncio.create_task(
+        prewarm_connections(val_api_session, [HENRIK_API_BASE_URL], "val"))
 async def teardown(bot):
+    if prewarm_task:
+        prewarm_task.cancel()
     await close_session()
@@ -1,7 +1,19 @@
-from datetime import datetime, timezone
-from utils.errors import UsernameAlreadyExists, UsernameDoesNotExist
-from utils.database_helper import (get_profiles_from_db, execute_commit)
+from datetime import datetime, timezone, timedelta
+from bisect import bisect_left
+import time
+from utils.errors import (UsernameAlreadyExists, UsernameDoesNotExist,
+                          ErrorFetchingData)
+from utils.database_helper import (get_profiles_from_db, execute_commit,
+                                   executemany_commit, execute_fetch,
+                                   get_datetime, get_aimlabs_profiles)
+from utils.log import logger
+from utils.resolution_cache import aimlabs_accounts
 from services.db.database import update_discord_profile
+from services.api.aimlabs_api import (resolve_aimlabs_usernames,
+                                      fetch_task_leaderboard_scores)
+from settings import (AIMLABS_PROFILE_BATCH_SIZE, AIMLABS_GLOBAL_MAX_RANK,
+                      AIMLABS_GLOBAL_REFRESH_HOURS)
+from utils import json_codec
 
 
 async def add_aimlabs_username_todb(
@@ -105,5 +117,311 @@ async def update_aimlabs_username_indb(aimlabs_username: str, aimlabs_id: str,
                          "UPDATE")
 
 
-async def setup(bot): pass
+async def update_aimlabs_usernames(values: list[tuple]) -> None:
+    """Renames linked aimlabs profiles. Leaderboard rows pick the new name
+    up on their next update.
+
+    :param list[tuple] values: (aimlabs_username, discord_id) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    UPDATE aimlabs_profiles SET aimlabs_username = ? WHERE discord_id = ?
+    """
+    await executemany_commit(sql_statement, values, "aimlabs_profiles",
+                             "UPDATE")
+
+
+async def revalidate_aimlabs_usernames() -> None:
+    """Checks the stored username of every linked aimlabs profile, looking
+    up AIMLABS_PROFILE_BATCH_SIZE usernames per request. Stored names whose
+    spelling changed are updated. Names that no longer resolve to the linked
+    account are logged, since aimlabs can only be queried by username the
+    member has to relink with /update_aimlabs_profile."""
+    start_time = time.time()
+    aimlabs_profiles = await get_aimlabs_profiles()
+    renamed = []
+    unresolved = []
+    for i in range(0, len(aimlabs_profiles), AIMLABS_PROFILE_BATCH_SIZE):
+        batch = aimlabs_profiles[i:i + AIMLABS_PROFILE_BATCH_SIZE]
+        try:
+            resolved = await resolve_aimlabs_usernames(
+                [profile[3] for profile in batch])
+        except ErrorFetchingData as e:
+            logger.warning(f"Unable to revalidate {len(batch)} aimlabs "
+                           f"usernames: {e.message}")
+            continue
+        for discord_id, _, aimlabs_id, aimlabs_username in batch:
+            if aimlabs_username not in resolved:
+                continue
+            account = resolved[aimlabs_username]
+            if account is None or account[1] != aimlabs_id:
+                unresolved.append(f"{aimlabs_username} ({discord_id})")
+                continue
+            aimlabs_accounts.put((account[0],), aimlabs_id)
+            if account[0] != aimlabs_username:
+                renamed.append((account[0], discord_id))
+    await update_aimlabs_usernames(renamed)
+    if unresolved:
+        logger.warning(f"Aimlabs usernames no longer linked to their "
+                       f"account: {', '.join(unresolved)}")
+    end_time = time.time()
+    logger.info(f"Revalidated {len(aimlabs_profiles)} aimlabs usernames in "
+                f"{end_time - start_time:.2f}s: {len(renamed)} renamed, "
+                f"{len(unresolved)} unresolved")
+
+
+class GlobalLeaderboardSnapshot:
+    """Sampled global leaderboard of one aimlabs task: the scores at
+    geometrically spaced ranks (1, 2, 4, 8, ...) and the number of ranked
+    players. A score is placed between the two anchors around it by
+    bisection, interpolating the rank geometrically like the anchors."""
+    def __init__(self, total: int, anchors: list):
+        self.total = total
+        self.anchors = sorted(anchors)
+        self.ranks = [rank for rank, _ in self.anchors]
+        # Scores fall as ranks rise, negated so they can be bisected
+        self.negated_scores = [-score for _, score in self.anchors]
+
+    def rank_of(self, score: float) -> float:
+        """Estimated global rank a score would hold"""
+        i = bisect_left(self.negated_scores, -score)
+        if i == 0:
+            return 1.0
+        if i == len(self.anchors):
+            return float(self.total)
+        better_rank, better_score = self.anchors[i - 1]
+        worse_rank, worse_score = self.anchors[i]
+        if better_score == worse_score:
+            return float(better_rank)
+        fraction = (better_score - score) / (better_score - worse_score)
+        return better_rank * (worse_rank / better_rank) ** fraction
+
+    def top_percent(self, score: float) -> float:
+        """Share of ranked players at or above the score, in percent"""
+        return 100 * self.rank_of(score) / self.total
+
+
+# task_id -> GlobalLeaderboardSnapshot, loaded from the db in setup
+global_leaderboards: dict[str, GlobalLeaderboardSnapshot] = {}
+
+
+async def sample_global_leaderboard(task_id: str, weapon_id: str | None
+                                    ) -> GlobalLeaderboardSnapshot | None:
+    """Reads single scores of a task's global leaderboard at ranks 1, 2, 4,
+    8, ... until running past the last player, then bisects the last gap to
+    find the player count within 1%. Costs about log2(players) + 7
+    requests. Returns None if nobody is ranked on the task."""
+    anchors = []
+
+    async def probe(offset: int) -> bool:
+        scores = await fetch_task_leaderboard_scores(task_id, offset, 1,
+                                                     weapon_id)
+        if scores:
+            anchors.append((offset + 1, scores[0]))
+        return bool(scores)
+
+    if not await probe(0):
+        return None
+    last_ranked = 0
+    past_end = None
+    offset = 1
+    while offset < AIMLABS_GLOBAL_MAX_RANK:
+        if not await probe(offset):
+            past_end = offset
+            break
+        last_ranked = offset
+        offset = offset * 2 + 1
+    while past_end is not None and \
+            past_end - last_ranked > max(1, last_ranked // 100):
+        middle = (last_ranked + past_end) // 2
+        if await probe(middle):
+            last_ranked = middle
+        else:
+            past_end = middle
+    return GlobalLeaderboardSnapshot(last_ranked + 1, anchors)
+
+
+async def create_aimlabs_global_leaderboards_table() -> None:
+    """Creates the table caching the sampled global leaderboard of each
+    tracked aimlabs task."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS aimlabs_global_leaderboards (
+        task_id TEXT PRIMARY KEY,
+        total INTEGER NOT NULL,
+        anchors TEXT NOT NULL,
+        date_updated TEXT NOT NULL
+    )
+    """
+    await execute_commit(sql_statement, (), "aimlabs_global_leaderboards",
+                         "CREATE")
+
+
+async def load_global_leaderboards() -> dict:
+    """Fills global_leaderboards from the db. Returns {task_id:
+    date_updated}.
+
+    :return: dict
+    """
+    sql_statement = """
+    SELECT task_id, total, anchors, date_updated
+    FROM aimlabs_global_leaderboards
+    """
+    data = await execute_fetch(sql_statement, (),
+                               "aimlabs_global_leaderboards")
+    for task_id, total, anchors, _ in data:
+        global_leaderboards[task_id] = GlobalLeaderboardSnapshot(
+            total, [tuple(anchor) for anchor in json_codec.loads(anchors)])
+    return {row[0]: get_datetime(row[3]) for row in data}
+
+
+async def refresh_global_leaderboards(tasks: dict) -> None:
+    """Resamples the global leaderboards older than
+    AIMLABS_GLOBAL_REFRESH_HOURS, one task at a time.
+
+    :param dict tasks: {task_id: weapon_id} of the tasks to cover
+    """
+    start_time = time.time()
+    dates_updated = await load_global_leaderboards()
+    stale_before = datetime.now(timezone.utc) - \
+        timedelta(hours=AIMLABS_GLOBAL_REFRESH_HOURS)
+    sql_statement = """
+    INSERT INTO aimlabs_global_leaderboards (task_id, total, anchors,
+                                             date_updated)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (task_id) DO UPDATE SET
+        total = excluded.total,
+        anchors = excluded.anchors,
+        date_updated = excluded.date_updated
+    """
+    refreshed = 0
+    for task_id, weapon_id in tasks.items():
+        if task_id in dates_updated and \
+                dates_updated[task_id] >= stale_before:
+            continue
+        try:
+            snapshot = await sample_global_leaderboard(task_id, weapon_id)
+        except ErrorFetchingData as e:
+            logger.warning(f"Unable to sample the global aimlabs "
+                           f"leaderboard of {task_id}: {e.message}")
+            continue
+        if snapshot is None:
+            continue
+        global_leaderboards[task_id] = snapshot
+        await execute_commit(sql_statement, (
+            task_id, snapshot.total, json_codec.dumps(snapshot.anchors),
+            datetime.now(timezone.utc).isoformat()),
+            "aimlabs_global_leaderboards", "UPSERT")
+        refreshed += 1
+    end_time = time.time()
+    logger.info(f"Refreshed {refreshed}/{len(tasks)} global aimlabs "
+                f"leaderboards in {end_time - start_time:.2f}s")
+
+
+async def create_aimlabs_task_bests_table() -> None:
+    """Creates the table holding the best score of each aimlabs user on each
+    tracked task, merged from the plays ingested every cycle."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS aimlabs_task_bests (
+        aimlabs_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        score REAL NOT NULL,
+        date_updated TEXT NOT NULL,
+        PRIMARY KEY (aimlabs_id, task_id)
+    )
+    """
+    await execute_commit(sql_statement, (), "aimlabs_task_bests", "CREATE")
+
+
+async def get_aimlabs_task_bests(aimlabs_ids: list[str] | None = None
+                                 ) -> dict:
+    """Returns {aimlabs_id: {task_id: score}}.
+
+    :param list[str] aimlabs_ids: Only return the bests of these users
+    :return: dict
+    """
+    sql_statement = """
+    SELECT aimlabs_id, task_id, score FROM aimlabs_task_bests
+    """
+    values = tuple()
+    if aimlabs_ids is not None:
+        sql_statement += (f"WHERE aimlabs_id IN "
+                          f"({', '.join('?' for _ in aimlabs_ids)})")
+        values = tuple(aimlabs_ids)
+    data = await execute_fetch(sql_statement, values, "aimlabs_task_bests")
+    bests = {}
+    for aimlabs_id, task_id, score in data:
+        bests.setdefault(aimlabs_id, {})[task_id] = score
+    return bests
+
+
+async def update_aimlabs_task_bests(values: list[tuple]) -> None:
+    """Stores new task bests. A stored score is never lowered.
+
+    :param list[tuple] values: (aimlabs_id, task_id, score, date_updated) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT INTO aimlabs_task_bests (aimlabs_id, task_id, score, date_updated)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (aimlabs_id, task_id) DO UPDATE SET
+        score = MAX(score, excluded.score),
+        date_updated = excluded.date_updated
+    """
+    await executemany_commit(sql_statement, values, "aimlabs_task_bests",
+                             "UPSERT")
+
+
+async def create_aimlabs_ingest_marks_table() -> None:
+    """Creates the table holding, per aimlabs user, when their plays were
+    last ingested successfully and for which set of tasks."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS aimlabs_ingest_marks (
+        aimlabs_id TEXT PRIMARY KEY,
+        last_ingested TEXT NOT NULL,
+        task_set TEXT NOT NULL
+    )
+    """
+    await execute_commit(sql_statement, (), "aimlabs_ingest_marks", "CREATE")
+
+
+async def get_aimlabs_ingest_marks() -> dict:
+    """Returns {aimlabs_id: (last_ingested, task_set)}.
+
+    :return: dict
+    """
+    sql_statement = """
+    SELECT aimlabs_id, last_ingested, task_set FROM aimlabs_ingest_marks
+    """
+    data = await execute_fetch(sql_statement, (), "aimlabs_ingest_marks")
+    return {row[0]: (get_datetime(row[1]), row[2]) for row in data}
+
+
+async def update_aimlabs_ingest_marks(values: list[tuple]) -> None:
+    """Moves the ingestion marks of users whose plays were fetched.
+
+    :param list[tuple] values: (aimlabs_id, last_ingested, task_set) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT INTO aimlabs_ingest_marks (aimlabs_id, last_ingested, task_set)
+    VALUES (?, ?, ?)
+    ON CONFLICT (aimlabs_id) DO UPDATE SET
+        last_ingested = excluded.last_ingested,
+        task_set = excluded.task_set
+    """
+    await executemany_commit(sql_statement, values, "aimlabs_ingest_marks",
+                             "UPSERT")
+
+
+async def setup(bot):
+    await create_aimlabs_task_bests_table()
+    await create_aimlabs_ingest_marks_table()
+    await create_aimlabs_global_leaderboards_table()
+    await load_global_leaderboards()
 async def teardown(bot): pass
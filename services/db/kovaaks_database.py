@@ -1,8 +1,19 @@
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+import time
 
-from utils.errors import UsernameAlreadyExists, UsernameDoesNotExist
-from utils.database_helper import (get_profiles_from_db, execute_commit)
+from utils.errors import (UsernameAlreadyExists, UsernameDoesNotExist,
+                          ErrorFetchingData)
+from utils.database_helper import (get_profiles_from_db, execute_commit,
+                                   executemany_commit, execute_fetch,
+                                   get_datetime)
+from utils.benchmark_config import s5_config
 from services.db.database import update_discord_profile
+from services.api.kovaaks_api import S5_BENCHMARK_IDS, get_scenario_page
+from utils.scenario_index import ScenarioIndex
+from utils.log import logger
+from settings import (SCENARIO_CATALOGUE_PAGE_SIZE,
+                      SCENARIO_CATALOGUE_MAX_PAGES,
+                      SCENARIO_CATALOGUE_REFRESH_HOURS)
 
 
 async def add_kovaaks_username_todb(
@@ -115,7 +126,219 @@ async def update_kovaaks_username_indb(kovaaks_username: str, kovaaks_id: str,
                          "UPDATE")
 
 
-async def setup(bot): pass
+async def create_kovaaks_scenario_scores_table() -> None:
+    """Creates the table holding each player's score on each scenario of the
+    S5 benchmarks, as of the last fetch of that benchmark. Scenarios are
+    keyed by their position in the benchmark, which is also their position
+    in the benchmark config."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS kovaaks_scenario_scores (
+        steam_id TEXT NOT NULL,
+        benchmark_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        scenario_name TEXT NOT NULL,
+        score REAL NOT NULL,
+        config_digest TEXT NOT NULL,
+        date_updated TEXT NOT NULL,
+        PRIMARY KEY (steam_id, benchmark_id, position)
+    )
+    """
+    await execute_commit(sql_statement, (), "kovaaks_scenario_scores",
+                         "CREATE")
+
+
+async def get_kovaaks_scenario_scores(steam_ids: list[str] | None = None
+                                      ) -> dict:
+    """Returns {steam_id: {benchmark_id: (config_digest, [(scenario_name,
+    score), ...])}} with the scenarios in benchmark order.
+
+    :param list[str] steam_ids: Only return the scores of these players
+    :return: dict
+    """
+    sql_statement = """
+    SELECT steam_id, benchmark_id, scenario_name, score, config_digest
+    FROM kovaaks_scenario_scores
+    """
+    values = tuple()
+    if steam_ids is not None:
+        sql_statement += (f"WHERE steam_id IN "
+                          f"({', '.join('?' for _ in steam_ids)}) ")
+        values = tuple(steam_ids)
+    sql_statement += "ORDER BY steam_id, benchmark_id, position"
+    data = await execute_fetch(sql_statement, values,
+                               "kovaaks_scenario_scores")
+    scores = {}
+    for steam_id, benchmark_id, scenario_name, score, digest in data:
+        benchmarks = scores.setdefault(steam_id, {})
+        benchmarks.setdefault(benchmark_id, (digest, []))[1].append(
+            (scenario_name, score))
+    return scores
+
+
+async def update_kovaaks_scenario_scores(values: list[tuple]) -> None:
+    """Stores scenario scores, replacing the previous ones.
+
+    :param list[tuple] values: (steam_id, benchmark_id, position,
+        scenario_name, score, config_digest, date_updated) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT INTO kovaaks_scenario_scores (steam_id, benchmark_id, position,
+    scenario_name, score, config_digest, date_updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (steam_id, benchmark_id, position) DO UPDATE SET
+        scenario_name = excluded.scenario_name,
+        score = excluded.score,
+        config_digest = excluded.config_digest,
+        date_updated = excluded.date_updated
+    """
+    await executemany_commit(sql_statement, values,
+                             "kovaaks_scenario_scores", "UPSERT")
+
+
+async def get_s5_breakdown(steam_id: str, tier: int | None = None) -> tuple:
+    """Returns (tier, tier energy, [(scenario_name, score, energy), ...]) of
+    a player's stored S5 scores, scored with the current config. Defaults to
+    the stored tier with the highest energy.
+
+    :param str steam_id: Steam ID
+    :param int tier: Tier index, 0 for novice
+    :return: tuple
+    """
+    stored = (await get_kovaaks_scenario_scores([steam_id])).get(steam_id, {})
+    model = s5_config.current().model
+    breakdowns = []
+    for tier_index, compiled_tier in enumerate(model.tiers):
+        if tier is not None and tier_index != tier:
+            continue
+        if S5_BENCHMARK_IDS[tier_index] not in stored:
+            continue
+        _, scenario_scores = stored[S5_BENCHMARK_IDS[tier_index]]
+        scenario_scores = scenario_scores[:len(compiled_tier.thresholds)]
+        energy, _ = compiled_tier.energy([score for _, score
+                                          in scenario_scores])
+        breakdowns.append((tier_index, energy, [
+            (scenario_name, score,
+             compiled_tier.scenario_energy(position, score))
+            for position, (scenario_name, score)
+            in enumerate(scenario_scores)]))
+    if not breakdowns:
+        raise ErrorFetchingData("No benchmark scores stored for this tier "
+                                "yet. They're saved on the next leaderboard "
+                                "update.")
+    return max(breakdowns, key=lambda breakdown: breakdown[1])
+
+
+async def create_kovaaks_scenarios_table() -> None:
+    """Creates the table caching the KovaaK's scenario catalogue, ranked by
+    popularity, so the search index is available right after a restart."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS kovaaks_scenarios (
+        popularity INTEGER PRIMARY KEY,
+        leaderboard_id INTEGER NOT NULL,
+        scenario_name TEXT NOT NULL,
+        date_updated TEXT NOT NULL
+    )
+    """
+    await execute_commit(sql_statement, (), "kovaaks_scenarios", "CREATE")
+
+
+async def get_kovaaks_scenarios() -> list[tuple]:
+    """Returns the cached catalogue as (leaderboard_id, scenario_name,
+    date_updated) rows, most popular first.
+
+    :return: list[tuple]
+    """
+    sql_statement = """
+    SELECT leaderboard_id, scenario_name, date_updated FROM kovaaks_scenarios
+    ORDER BY popularity
+    """
+    data = await execute_fetch(sql_statement, (), "kovaaks_scenarios")
+    return [tuple(row) for row in data]
+
+
+async def update_kovaaks_scenarios(scenarios: list[tuple[int, str]]) -> None:
+    """Replaces the cached catalogue.
+
+    :param list[tuple[int, str]] scenarios: (leaderboard_id, scenario_name)
+        pairs, most popular first
+    :return: None
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    sql_statement = """
+    INSERT INTO kovaaks_scenarios (popularity, leaderboard_id, scenario_name,
+    date_updated)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (popularity) DO UPDATE SET
+        leaderboard_id = excluded.leaderboard_id,
+        scenario_name = excluded.scenario_name,
+        date_updated = excluded.date_updated
+    """
+    await executemany_commit(sql_statement,
+                             [(i, leaderboard_id, name, now)
+                              for i, (leaderboard_id, name)
+                              in enumerate(scenarios)],
+                             "kovaaks_scenarios", "UPSERT")
+    await execute_commit("DELETE FROM kovaaks_scenarios "
+                         "WHERE popularity >= ?", (len(scenarios),),
+                         "kovaaks_scenarios", "DELETE")
+
+
+class ScenarioCatalogue:
+    """The current ScenarioIndex over the KovaaK's scenario catalogue.
+    Lookups only read self.index, which a refresh replaces in one assignment
+    once the whole catalogue has been downloaded."""
+    def __init__(self):
+        self.index = ScenarioIndex([])
+        self.refreshed_at: datetime | None = None
+
+    async def load(self) -> None:
+        rows = await get_kovaaks_scenarios()
+        self.index = ScenarioIndex([(row[0], row[1]) for row in rows])
+        if rows:
+            self.refreshed_at = max(get_datetime(row[2]) for row in rows)
+
+    async def refresh(self) -> None:
+        """Downloads the catalogue page by page, most popular first, unless
+        the cached one is younger than SCENARIO_CATALOGUE_REFRESH_HOURS"""
+        now = datetime.now(timezone.utc)
+        if self.refreshed_at is not None and now - self.refreshed_at < \
+                timedelta(hours=SCENARIO_CATALOGUE_REFRESH_HOURS):
+            return
+        start_time = time.time()
+        scenarios = []
+        seen = set()
+        for page in range(SCENARIO_CATALOGUE_MAX_PAGES):
+            total, page_scenarios = await get_scenario_page(
+                page, SCENARIO_CATALOGUE_PAGE_SIZE)
+            for leaderboard_id, name in page_scenarios:
+                # Popularity can shift between pages, keep the first sighting
+                if leaderboard_id not in seen:
+                    seen.add(leaderboard_id)
+                    scenarios.append((leaderboard_id, name))
+            if len(page_scenarios) < SCENARIO_CATALOGUE_PAGE_SIZE or \
+                    (page + 1) * SCENARIO_CATALOGUE_PAGE_SIZE >= total:
+                break
+        if not scenarios:
+            logger.warning("KovaaK's scenario catalogue came back empty, "
+                           "keeping the cached one")
+            return
+        self.index = ScenarioIndex(scenarios)
+        self.refreshed_at = now
+        await update_kovaaks_scenarios(scenarios)
+        logger.info(f"Refreshed KovaaK's scenario catalogue with "
+                    f"{len(scenarios)} scenarios in "
+                    f"{time.time() - start_time:.2f}s")
+
+
+scenario_catalogue = ScenarioCatalogue()
+
+
+async def setup(bot):
+    await create_kovaaks_scenario_scores_table()
+    await create_kovaaks_scenarios_table()
 async def teardown(bot): pass
 
 #
@@ -1,25 +1,99 @@
-from datetime import datetime, timezone
-import asyncio, json, aiofiles
-from utils.database_helper import (get_valorant_profiles, executemany_commit,
+from datetime import datetime, timezone, timedelta
+import asyncio
+from utils.database_helper import (get_valorant_profiles, execute_commit,
+                                   executemany_commit,
                                    get_date_updated, get_datetime,
                                    execute_fetch, get_kovaaks_profiles,
-                                   calculate_energy, get_aimlabs_profiles,
-                                   get_last_monday_12am_est,
+                                   calculate_energy, calculate_energies,
+                                   get_aimlabs_profiles,
                                    calculate_dojo_playlist_score)
-from services.api.val_api import fetch_rating, fetch_dms
-from services.api.kovaaks_api import (get_s5_novice_benchmark_scores,
-                                      get_s5_intermediate_benchmark_scores,
-                                      get_s5_advance_benchmark_scores)
+from services.api.val_api import (fetch_rating, fetch_matches,
+                                  MATCH_PAGE_SIZE)
+from services.api.kovaaks_api import (get_s5_benchmark_scores,
+                                      S5_BENCHMARK_IDS)
 from services.api.aimlabs_api import fetch_user_plays
-from settings import (S1_VOLTAIC_VAL_BENCHMARKS_CONFIG,
-                      DOJO_AIMLABS_PLAYLIST_ADVANCED,
-                      DOJO_AIMLABS_PLAYLIST_BALANCED)
+from services.db.val_database import (get_valorant_mmr_fingerprints,
+                                      update_valorant_mmr_fingerprints,
+                                      get_valorant_match_cursors,
+                                      update_valorant_match_cursors,
+                                      get_valorant_last_competitive,
+                                      update_valorant_last_competitive,
+                                      get_valorant_dm_matches,
+                                      get_valorant_dm_counts,
+                                      add_valorant_dm_matches,
+                                      add_valorant_dm_match_stats,
+                                      get_valorant_dm_performance,
+                                      DM_STATS_FIELDS)
+from services.db.kovaaks_database import (get_kovaaks_scenario_scores,
+                                          update_kovaaks_scenario_scores)
+from services.db.aimlabs_database import (get_aimlabs_task_bests,
+                                          update_aimlabs_task_bests,
+                                          get_aimlabs_ingest_marks,
+                                          update_aimlabs_ingest_marks)
+from settings import (DOJO_AIMLABS_PLAYLIST_ADVANCED,
+                      DOJO_AIMLABS_PLAYLIST_BALANCED,
+                      WORKER_CONCURRENCY,
+                      LEADERBOARD_WRITE_BATCH_SIZE,
+                      MMR_FORCED_REFRESH_HOURS,
+                      VALORANT_DM_QUEUES,
+                      VALORANT_COMPETITIVE_QUEUE,
+                      VALORANT_MATCH_MAX_PAGES,
+                      VALORANT_DM_PERFORMANCE_QUEUE,
+                      VALORANT_DM_PERFORMANCE_MIN_MATCHES,
+                      AIMLABS_SCORES_MAX_AGE,
+                      AIMLABS_INGEST_OVERLAP_MINUTES,
+                      DOJO_NORMALIZATION_QUANTILES,
+                      QUANTILE_SKETCH_K)
 from collections import defaultdict
 from utils.log import logger
+from utils.worker_pool import bounded_map
+from utils.poll_scheduler import PollScheduler
+from utils.weekly_window import week_window
+from utils.quantile_sketch import KLLSketch
+from utils import energy_batch
+from utils.energy_calculation import tier_energy_ceiling
+from utils.benchmark_config import s1_config, s5_config, TIER_KEYS
+from utils import json_codec
+import hashlib
 import time
 
 
-async def update_valorant_rank_leaderboard():
+async def write_streamed_values(results, sql_statement: str,
+                                table_name: str) -> int:
+    """Commits rows from an async iterator in batches of
+    LEADERBOARD_WRITE_BATCH_SIZE as they arrive. None rows are skipped.
+    Returns the number of rows written."""
+    batch = []
+    written = 0
+    async for values in results:
+        if values is None:
+            continue
+        batch.append(values)
+        if len(batch) >= LEADERBOARD_WRITE_BATCH_SIZE:
+            await executemany_commit(sql_statement, batch, table_name,
+                                     "UPSERT")
+            written += len(batch)
+            batch = []
+    if batch:
+        await executemany_commit(sql_statement, batch, table_name, "UPSERT")
+        written += len(batch)
+    return written
+
+
+async def update_valorant_rank_leaderboard(profiles: list | None = None):
+    """Refreshes the valorant rank leaderboard rows of profiles whose rank may
+    have moved, or of every given profile.
+
+    A rank only moves after a competitive match, so the MMR of a profile is
+    only fetched if the DM pass saw a newer competitive match than at the
+    last fetch (see update_valorant_leaderboards()), the account was
+    relinked, or the last fetch is older than MMR_FORCED_REFRESH_HOURS.
+    The check costs no API call, so every profile is checked each cycle and
+    a new match is picked up by the next refresh. Given profiles are always
+    fetched.
+
+    :param list profiles: Rows of get_valorant_profiles() to refresh now
+    """
     start_time = time.time()
     sql_statement = """
         INSERT INTO valorant_rank_leaderboard (
@@ -36,12 +110,35 @@ async def update_valorant_rank_leaderboard():
             peak_rank_id = excluded.peak_rank_id,
             date_updated = excluded.date_updated
     """
-    valorant_profiles = await get_valorant_profiles()
+    valorant_profiles = profiles or await get_valorant_profiles()
+    fingerprints = await get_valorant_mmr_fingerprints()
+    last_competitive = await get_valorant_last_competitive()
+    new_fingerprints = []
+    skipped = 0
+    forced_refresh_dt = (datetime.now(timezone.utc) -
+                         timedelta(hours=MMR_FORCED_REFRESH_HOURS))
+
     async def process_profile(profile):
+        nonlocal skipped
         (discord_id, discord_username, valorant_id, valorant_username,
          valorant_tag, region) = profile
+        last_match_id, last_match_date = None, None
+        seen = last_competitive.get(discord_id)
+        if seen and seen[0] == valorant_id:
+            last_match_id, last_match_date = seen[1:]
+        fingerprint = fingerprints.get(discord_id)
+        if (not profiles and fingerprint and
+                fingerprint[0] == valorant_id and
+                fingerprint[1] == last_match_id and
+                get_datetime(fingerprint[2]) >= forced_refresh_dt):
+            skipped += 1
+            return None
+
         try:
             ratings = await fetch_rating(valorant_id, region)
+            new_fingerprints.append((
+                discord_id, valorant_id, last_match_id, last_match_date,
+                datetime.now(timezone.utc).isoformat()))
         except Exception as e:
             logger.error(f"Error fetching val ratings for: {discord_username} "
                          f"({discord_id}) - {valorant_username}#{valorant_tag} "
@@ -54,17 +151,88 @@ async def update_valorant_rank_leaderboard():
                 valorant_tag, current_rank, current_rank_id, current_rr,
                 peak_rank, peak_rank_id, datetime.now(timezone.utc).isoformat())
 
-    all_values = await asyncio.gather(*[process_profile(profile) for profile in valorant_profiles])
-
-    await executemany_commit(sql_statement, all_values,
-                             "valorant_rank_leaderboard",
-                             "UPSERT")
+    await write_streamed_values(
+        bounded_map(process_profile, valorant_profiles,
+                    WORKER_CONCURRENCY["val"]),
+        sql_statement, "valorant_rank_leaderboard")
+    await update_valorant_mmr_fingerprints(new_fingerprints)
     end_time = time.time()
     runtime = end_time - start_time
-    logger.info(f"Done updating valorant ranked leaderboard in {runtime:.2f}s")
+    logger.info(f"Done updating valorant ranked leaderboard in {runtime:.2f}s "
+                f"({skipped}/{len(valorant_profiles)} unchanged)")
 
 
-async def update_valorant_dm_leaderboard():
+def extract_dm_stats(match: dict, valorant_id: str) -> dict | None:
+    """Returns the player's compact stats record from a v4 match object, or
+    None if they aren't listed in it"""
+    for player in match['players']:
+        if player['puuid'] != valorant_id:
+            continue
+        stats = player['stats']
+        return {
+            "mode": match['metadata']['queue']['id'],
+            "kills": stats['kills'],
+            "deaths": stats['deaths'],
+            "assists": stats['assists'],
+            "score": stats['score'],
+            "headshots": stats['headshots'],
+            "bodyshots": stats['bodyshots'],
+            "legshots": stats['legshots'],
+            "damage_dealt": stats['damage']['dealt'],
+        }
+    return None
+
+
+async def fetch_new_dm_matches(valorant_id: str, region: str,
+                               known_ids: set, lower_bound_dt: datetime):
+    """Pages through the player's matches of every queue, newest first, until
+    reaching a known match id or one older than lower_bound_dt, so the number
+    of requests grows with the number of new matches. Returns the new DMs and
+    TDMs as [{"id", "date", "stats"}], the newest (match_id, started_at)
+    seen, or None if the player has no matches, and the newest new
+    competitive (match_id, started_at), or None if there is none.
+
+    :param str valorant_id: Valorant PUUID
+    :param str region: Region
+    :param set known_ids: Match ids already stored, including the cursor
+    :param datetime lower_bound_dt: Oldest match start worth reading
+    """
+    new_matches = []
+    newest = None
+    newest_competitive = None
+    for page in range(VALORANT_MATCH_MAX_PAGES):
+        matches = await fetch_matches(valorant_id, region,
+                                      start=page * MATCH_PAGE_SIZE)
+        for match in matches:
+            match_id = match['metadata']['match_id']
+            started_at = match['metadata']['started_at']
+            if newest is None:
+                newest = (match_id, started_at)
+            if (match_id in known_ids or
+                    get_datetime(started_at) < lower_bound_dt):
+                return new_matches, newest, newest_competitive
+            queue = match['metadata']['queue']['id']
+            if newest_competitive is None and \
+                    queue == VALORANT_COMPETITIVE_QUEUE:
+                newest_competitive = (match_id, started_at)
+            if queue in VALORANT_DM_QUEUES:
+                new_matches.append({
+                    "id": match_id, "date": started_at,
+                    "stats": extract_dm_stats(match, valorant_id)})
+        if len(matches) < MATCH_PAGE_SIZE:
+            break
+    return new_matches, newest, newest_competitive
+
+
+async def update_valorant_dm_leaderboard(profiles: list | None = None):
+    """Refreshes the valorant DM leaderboard rows of profiles that are due
+    per their polling schedule, or of every given profile. The pass reads
+    matches of every queue, so it also records each profile's newest
+    competitive match for the rank pass, and any new match counts as a
+    change for the polling schedule.
+
+    :param list profiles: Rows of get_valorant_profiles() to refresh now
+    """
     start_time = time.time()
     sql_statement = """
         INSERT INTO valorant_dm_leaderboard (
@@ -77,54 +245,92 @@ async def update_valorant_dm_leaderboard():
             dm_count = excluded.dm_count,
             date_updated = excluded.date_updated
     """
-    valorant_profiles = await get_valorant_profiles()
+    valorant_profiles = profiles or await get_valorant_profiles()
+    valorant_dm_schedule = PollScheduler("valorant_dm_leaderboard")
+    await valorant_dm_schedule.load()
+    # Rows polled before the weekly reset still hold last week's count
+    week_id, week_start, _ = week_window.current()
+    due_profiles = [profile for profile in valorant_profiles
+                    if profiles or
+                    valorant_dm_schedule.is_due(profile[0], week_start)]
+    cursors = await get_valorant_match_cursors()
+    new_cursors = []
+    new_competitive = []
 
     async def process_profile(profile):
         (discord_id, discord_username, valorant_id, valorant_username,
          valorant_tag, region) = profile
-        dm_json = await execute_fetch(f"SELECT dm from "
-                                      f"valorant_dm_leaderboard "
-                                      f"WHERE discord_id = ?",
-                                      (discord_id,),
-                                      "valorant_dm_leaderboard")
-        dms = []
-        if dm_json:
-            if dm_json[0][0] != '':
-                dms = json.loads(dm_json[0][0])
-        lower_bound_dt = get_last_monday_12am_est()
-        dms = [match for match in dms if get_datetime(match['date']) >= lower_bound_dt]
-        data_dm, data_tdm = \
-            await asyncio.gather(
-                fetch_dms(valorant_id, region,"deathmatch"),
-                fetch_dms(valorant_id,region,"teamdeathmatch")
-            )
-
-        new_matches = [{"id": match['metadata']['match_id'],
-                        "date": match['metadata']['started_at']}
-                       for match in (data_dm['data'] + data_tdm['data'])
-                       if get_datetime(match['metadata']['started_at']) >= lower_bound_dt]
+        dms = [{"id": match_id, "date": started_at} for match_id, started_at
+               in await get_valorant_dm_matches(discord_id, week_id)]
 
         existing_ids = {match["id"] for match in dms}
+        known_ids = set(existing_ids)
+        cursor = cursors.get(discord_id)
+        if cursor and cursor[0] == valorant_id:
+            known_ids.add(cursor[1])
+        try:
+            new_matches, newest, newest_competitive = \
+                await fetch_new_dm_matches(valorant_id, region, known_ids,
+                                           week_start)
+        except Exception as e:
+            logger.error(f"Error fetching val dms for: {discord_username} "
+                         f"({discord_id}) - {valorant_username}#"
+                         f"{valorant_tag} \n{str(e)}")
+            return None
+        moved = bool(newest) and (not cursor or cursor[1] != newest[0])
+        if moved:
+            new_cursors.append((discord_id, valorant_id) + newest)
+        if newest_competitive:
+            new_competitive.append(
+                (discord_id, valorant_id) + newest_competitive)
+
+        new_matches = [match for match in new_matches
+                       if match["id"] not in existing_ids]
         for match in new_matches:
-            if match["id"] not in existing_ids:
-                dms.append(match)
-
-        dm_json_str = json.dumps(dms)
+            match["week_id"] = week_window.week_of(get_datetime(match["date"]))
+        await add_valorant_dm_matches([
+            (discord_id, match["id"], match["week_id"], match["date"])
+            for match in new_matches])
+        await add_valorant_dm_match_stats([
+            (discord_id, match["id"], match["week_id"], match["date"],
+             *(match["stats"][field] for field in DM_STATS_FIELDS))
+            for match in new_matches if match["stats"]])
+        dms.extend({"id": match["id"], "date": match["date"]}
+                   for match in new_matches if match["week_id"] == week_id)
+        valorant_dm_schedule.record(discord_id, changed=moved)
+
+        dm_json_str = json_codec.dumps(dms)
         dm_count = len(dms)
         return (discord_id, discord_username, valorant_id, valorant_username,
                 valorant_tag, datetime.now(timezone.utc).isoformat(),
                 dm_json_str, dm_count)
 
-    all_values = await asyncio.gather(*[process_profile(profile) for profile in valorant_profiles])
-    await executemany_commit(sql_statement, all_values,
-                             "valorant_dm_leaderboard",
-                             "UPSERT")
+    await write_streamed_values(
+        bounded_map(process_profile, due_profiles,
+                    WORKER_CONCURRENCY["val"]),
+        sql_statement, "valorant_dm_leaderboard")
+    await update_valorant_match_cursors(new_cursors)
+    await update_valorant_last_competitive(new_competitive)
+    await valorant_dm_schedule.save()
     end_time = time.time()
     runtime = end_time - start_time
-    logger.info(f"Done updating valorant dm leaderboard in {runtime:.2f}s")
+    logger.info(f"Done updating valorant dm leaderboard in {runtime:.2f}s "
+                f"({len(due_profiles)}/{len(valorant_profiles)} due)")
+
+
+async def update_valorant_leaderboards():
+    """Refreshes the valorant DM then rank leaderboards. The rank pass reads
+    the competitive matches recorded by the DM pass, so it runs second."""
+    await update_valorant_dm_leaderboard()
+    await update_valorant_rank_leaderboard()
+
 
+async def update_voltaic_s5_leaderboard(profiles: list | None = None):
+    """Refreshes the Voltaic S5 leaderboard rows of profiles that are due
+    per their polling schedule, or of every given profile.
 
-async def update_voltaic_s5_leaderboard():
+    :param list profiles: Rows of get_kovaaks_profiles() to refresh now
+    """
     start_time = time.time()
     sql_statement = """
         INSERT INTO voltaic_S5_benchmarks_leaderboard (
@@ -139,48 +345,288 @@ async def update_voltaic_s5_leaderboard():
             current_rank_rating = excluded.current_rank_rating,
             date_updated = excluded.date_updated
     """
-    kovaaks_profiles = await get_kovaaks_profiles()
+    kovaaks_profiles = profiles or await get_kovaaks_profiles()
+    config = s5_config.current()
+    tiers = config['tier_energies']
+    benchmark_requests = 0
+    recomputed = 0
+    voltaic_s5_schedule = PollScheduler("voltaic_S5_benchmarks_leaderboard")
+    await voltaic_s5_schedule.load()
+    due_profiles = [profile for profile in kovaaks_profiles
+                    if profiles or voltaic_s5_schedule.is_due(profile[0])]
+    previous_ranks = {row[0]: tuple(row[1:]) for row in await execute_fetch(
+        "SELECT discord_id, current_rank, current_rank_id, "
+        "current_rank_rating FROM voltaic_S5_benchmarks_leaderboard", (),
+        "voltaic_S5_benchmarks_leaderboard")}
+    stored_scores = await get_kovaaks_scenario_scores(
+        [profile[4] for profile in due_profiles])
+    score_rows = []
 
     async def process_profile(profile):
+        nonlocal benchmark_requests, recomputed
         now = datetime.now(timezone.utc).isoformat()
         (discord_id, discord_username, kovaaks_id, kovaaks_username,
          steam_id, steam_username) = profile
+        previous_rank = previous_ranks.get(discord_id)
+        stored = stored_scores.get(steam_id, {})
+
+        def unchanged(tier: int, scenario_scores: list) -> bool:
+            digest, stored_tier = stored.get(S5_BENCHMARK_IDS[tier],
+                                             (None, []))
+            return digest == config.digest and \
+                stored_tier[:len(scenario_scores)] == scenario_scores
+
+        async def energy_of(scores: list) -> tuple:
+            return await calculate_energy(
+                *([score for _, score in scenario_scores]
+                  if scenario_scores is not None else None
+                  for scenario_scores in scores), "voltaic")
+
+        # Only the tier with the highest energy counts. Higher tiers are
+        # always fetched, starting from the one the previous energy came
+        # from, and a lower tier only while its energy ceiling could still
+        # beat the best energy so far.
+        likely_tier = 0
+        if previous_rank is not None:
+            likely_tier = max(i for i in range(len(tiers))
+                              if i == 0 or previous_rank[2] >
+                              tier_energy_ceiling(tiers, i - 1))
+        scores = [None] * len(tiers)
         try:
-            novice_scores, intermediate_scores, advance_scores = \
-                await asyncio.gather(
-                    get_s5_novice_benchmark_scores(steam_id),
-                    get_s5_intermediate_benchmark_scores(steam_id),
-                    get_s5_advance_benchmark_scores(steam_id)
-                )
+            fetched = await asyncio.gather(*(
+                get_s5_benchmark_scores(steam_id, S5_BENCHMARK_IDS[i])
+                for i in range(likely_tier, len(tiers))))
+            benchmark_requests += len(fetched)
+            scores[likely_tier:] = fetched
+            # The previous energy came from one of these tiers and every
+            # lower tier is capped below it, so with the same scores and
+            # config it still holds
+            if previous_rank is not None and all(
+                    unchanged(i, scores[i])
+                    for i in range(likely_tier, len(tiers))):
+                current_rank, current_rank_id, current_rank_rating = \
+                    previous_rank
+            else:
+                recomputed += 1
+                current_rank, current_rank_id, current_rank_rating = \
+                    await energy_of(scores)
+                for i in reversed(range(likely_tier)):
+                    if current_rank_rating > tier_energy_ceiling(tiers, i):
+                        break
+                    scores[i] = await get_s5_benchmark_scores(
+                        steam_id, S5_BENCHMARK_IDS[i])
+                    benchmark_requests += 1
+                    current_rank, current_rank_id, current_rank_rating = \
+                        await energy_of(scores)
         except Exception as e:
             logger.error(f"Failed to fetch kovaaks scores for user "
                          f"{discord_username} ({discord_id}): "
                          f"\n{str(e)}")
             return None
-        current_rank, current_rank_id, current_rank_rating = \
-            await calculate_energy(novice_scores,
-                                   intermediate_scores,
-                                   advance_scores,
-                                   "voltaic")
+        for tier, scenario_scores in enumerate(scores):
+            if scenario_scores is None or unchanged(tier, scenario_scores):
+                continue
+            score_rows.extend(
+                (steam_id, S5_BENCHMARK_IDS[tier], position, scenario_name,
+                 score, config.digest, now)
+                for position, (scenario_name, score)
+                in enumerate(scenario_scores))
+        voltaic_s5_schedule.record(
+            discord_id, changed=previous_rank !=
+            (current_rank, current_rank_id, current_rank_rating))
         return (discord_id, discord_username, kovaaks_id, kovaaks_username,
                 steam_id, steam_username, current_rank, current_rank_id,
                 current_rank_rating, now)
 
-    all_values = await asyncio.gather(*[process_profile(profile)
-                                        for profile in kovaaks_profiles])
-    all_values = [value for value in all_values if value is not None]
-    if all_values:
-        await executemany_commit(sql_statement, all_values,
-                                 "voltaic_S5_benchmarks_leaderboard",
-                                 "UPSERT")
-    else:
+    written = await write_streamed_values(
+        bounded_map(process_profile, due_profiles,
+                    WORKER_CONCURRENCY["kovaaks"]),
+        sql_statement, "voltaic_S5_benchmarks_leaderboard")
+    await update_kovaaks_scenario_scores(score_rows)
+    await voltaic_s5_schedule.save()
+    if due_profiles and not written:
         logger.warning(f"No valid values to update voltaic leaderboard")
     end_time = time.time()
     runtime = end_time - start_time
-    logger.info(f"Done updating voltaic S5 leaderboard in {runtime:.2f}s")
-
-
-async def update_voltaic_val_s1_leaderboard():
+    logger.info(f"Done updating voltaic S5 leaderboard in {runtime:.2f}s "
+                f"({len(due_profiles)}/{len(kovaaks_profiles)} due, "
+                f"{benchmark_requests} benchmark requests, "
+                f"{recomputed} energies recomputed)")
+
+
+async def get_aimlabs_tasks() -> dict:
+    """Returns {task_id: weapon_id} of every task tracked by a task-based
+    leaderboard. The weapon is None for the dojo playlist tasks."""
+    config = s1_config.current()
+    tasks = {task_id: None for task_id in DOJO_AIMLABS_PLAYLIST_BALANCED +
+             DOJO_AIMLABS_PLAYLIST_ADVANCED}
+    for category in ['novice_scenarios', 'intermediate_scenarios',
+                     'advanced_scenarios']:
+        for scenario in config[category]:
+            tasks[scenario['task_id']] = scenario.get('weapon_id')
+    return tasks
+
+
+def get_task_set_id(task_ids) -> str:
+    """Short stable id of a set of task ids, stored with the ingestion marks
+    so a change to the tracked tasks triggers a full refetch"""
+    return hashlib.sha1("\n".join(sorted(task_ids)).encode()).hexdigest()[:16]
+
+
+class AimlabsScoreStage:
+    """Best aimlabs scores of every profile on the union of the task ids of
+    all task-based leaderboards (Voltaic VAL S1 and the dojo playlists),
+    shared by their updaters.
+
+    Ingestion is incremental: each user's plays are only queried from their
+    last successful ingestion (minus AIMLABS_INGEST_OVERLAP_MINUTES for
+    plays the upstream records late) and new maxima are merged into the task
+    bests stored in aimlabs_task_bests. Users without a mark, or whose mark
+    was taken for other tasks, get their full history.
+
+    Concurrent callers wait on the same fetch and a snapshot younger than
+    max_age seconds is reused, so a refresh cycle queries aimlabs once no
+    matter how many task-based leaderboards it updates. get_users() ingests
+    a few users only, for member refreshes.
+    """
+    def __init__(self, max_age: float = AIMLABS_SCORES_MAX_AGE):
+        self.max_age = max_age
+        # ({user_id: {task_id: score}}, {task_id: KLLSketch of the scores},
+        #  {user_id whose scores couldn't be fetched})
+        self.snapshot: tuple[dict, dict, set] | None = None
+        self.fetched_at = 0.0
+        self.inflight: asyncio.Task | None = None
+        # {user_id: {task_id: score}}, loaded from the db on the first fetch
+        self.bests: dict | None = None
+
+    async def get(self) -> tuple[dict, dict, set]:
+        """Returns (user_scores, task_sketches, missing_user_ids).
+        task_sketches summarize the valid (non-negative) scores of each task
+        over every profile."""
+        if self.snapshot is not None and \
+                time.monotonic() - self.fetched_at < self.max_age:
+            return self.snapshot
+        if self.inflight is None:
+            self.inflight = asyncio.create_task(self.fetch())
+            self.inflight.add_done_callback(self.clear_inflight)
+        # A cancelled caller mustn't cancel the fetch the others wait on
+        return await asyncio.shield(self.inflight)
+
+    def clear_inflight(self, task: asyncio.Task) -> None:
+        self.inflight = None
+
+    def invalidate(self, config=None) -> None:
+        """Makes the next get() fetch again, e.g. once the tracked tasks
+        changed"""
+        self.snapshot = None
+
+    async def get_users(self, user_ids: list[str]) -> tuple[dict, set]:
+        """Ingests the plays of the given users only, e.g. for a member
+        refresh, and returns ({user_id: {task_id: score}}, user ids whose
+        scores couldn't be fetched) for them. The shared snapshot is left
+        to the next get()."""
+        task_ids = set(await get_aimlabs_tasks())
+        failed_user_ids, _, _ = await self.ingest(user_ids, task_ids)
+        user_scores = {}
+        for user_id in user_ids:
+            scores = {task_id: score
+                      for task_id, score in self.bests.get(user_id, {}).items()
+                      if task_id in task_ids}
+            if scores:
+                user_scores[user_id] = scores
+        return user_scores, failed_user_ids
+
+    async def ingest(self, user_ids: list[str], task_ids: set) -> tuple:
+        """Merges the users' new plays into the stored task bests. Returns
+        (failed user ids, number of incremental users, number of new
+        bests)."""
+        started = datetime.now(timezone.utc)
+        task_set = get_task_set_id(task_ids)
+        if self.bests is None:
+            self.bests = await get_aimlabs_task_bests()
+        marks = await get_aimlabs_ingest_marks()
+        overlap = timedelta(minutes=AIMLABS_INGEST_OVERLAP_MINUTES)
+        since = {user_id: marks[user_id][0] - overlap for user_id in user_ids
+                 if user_id in marks and marks[user_id][1] == task_set}
+
+        new_scores, _, failed_user_ids = await fetch_user_plays(
+            user_ids, sorted(task_ids), since)
+
+        now = started.isoformat()
+        new_bests = []
+        for user_id, scores in new_scores.items():
+            bests = self.bests.setdefault(user_id, {})
+            for task_id, score in scores.items():
+                if task_id not in bests or score > bests[task_id]:
+                    bests[task_id] = score
+                    new_bests.append((user_id, task_id, score, now))
+        # Bests first: a mark must never get ahead of the stored scores
+        await update_aimlabs_task_bests(new_bests)
+        await update_aimlabs_ingest_marks([
+            (user_id, now, task_set) for user_id in user_ids
+            if user_id not in failed_user_ids])
+        return failed_user_ids, len(since), len(new_bests)
+
+    async def fetch(self) -> tuple[dict, dict, set]:
+        start_time = time.time()
+        aimlabs_profiles = await get_aimlabs_profiles()
+        user_ids = [profile[2] for profile in aimlabs_profiles]
+        task_ids = set(await get_aimlabs_tasks())
+        failed_user_ids, incremental, new_bests = await self.ingest(user_ids,
+                                                                    task_ids)
+
+        # The sketches summarize this cycle's bests and aren't kept between
+        # cycles: an improved best replaces the old one and sketches can't
+        # delete, so merging new scores into a stored sketch would count
+        # improving users twice. The bests are held in memory anyway for the
+        # per-user scores, the sketches only bound what normalization reads.
+        user_scores = {}
+        task_sketches = defaultdict(lambda: KLLSketch(QUANTILE_SKETCH_K))
+        for user_id in user_ids:
+            scores = {task_id: score
+                      for task_id, score in self.bests.get(user_id, {}).items()
+                      if task_id in task_ids}
+            if not scores:
+                continue
+            user_scores[user_id] = scores
+            for task_id, score in scores.items():
+                if score >= 0:
+                    task_sketches[task_id].update(score)
+        # Users whose fetch failed still count if scores are stored for them
+        missing_user_ids = {user_id for user_id in failed_user_ids
+                            if user_id not in user_scores}
+        self.snapshot = (user_scores, dict(task_sketches), missing_user_ids)
+        self.fetched_at = time.monotonic()
+        end_time = time.time()
+        logger.info(f"Ingested aimlabs plays of {len(user_ids)} profiles "
+                    f"({incremental} incremental) on {len(task_ids)} tasks in "
+                    f"{end_time - start_time:.2f}s: {new_bests} new "
+                    f"bests, {len(failed_user_ids)} failed")
+        return self.snapshot
+
+
+aimlabs_scores = AimlabsScoreStage()
+
+
+def get_task_min_max(task_sketches: dict, task_ids: list) -> dict:
+    """Returns {task_id: {'min', 'max'}} of the given tasks, the bounds
+    dojo playlist scores are normalized with: the DOJO_NORMALIZATION_QUANTILES
+    of every profile's scores, so a single outlier doesn't stretch the scale
+    for everyone"""
+    low, high = DOJO_NORMALIZATION_QUANTILES
+    return {
+        task_id: {'min': task_sketches[task_id].quantile(low),
+                  'max': task_sketches[task_id].quantile(high)}
+        for task_id in task_ids if task_id in task_sketches
+    }
+
+
+async def update_voltaic_val_s1_leaderboard(profiles: list | None = None):
+    """Refreshes the Voltaic VAL S1 leaderboard rows of every profile, or of
+    the given ones only.
+
+    :param list profiles: Rows of get_aimlabs_profiles() to refresh
+    """
     start_time = time.time()
     sql_statement = """
         INSERT INTO voltaic_S1_valorant_benchmarks_leaderboard (
@@ -189,64 +635,53 @@ async def update_voltaic_val_s1_leaderboard():
         )
         VALUES(?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT (discord_id) DO UPDATE SET
+            aimlabs_username = excluded.aimlabs_username,
             current_rank = excluded.current_rank,
             current_rank_id = excluded.current_rank_id,
             current_rank_rating = excluded.current_rank_rating,
             date_updated = excluded.date_updated
     """
-    aimlabs_profiles = await get_aimlabs_profiles()
-    user_ids = [profile[2] for profile in aimlabs_profiles]
+    aimlabs_profiles = profiles or await get_aimlabs_profiles()
 
     # Load task configuration
-    async with aiofiles.open(S1_VOLTAIC_VAL_BENCHMARKS_CONFIG) as f:
-        content = await f.read()
-        config = json.loads(content)
+    config = s1_config.current()
 
-    # Extract all task IDs from the configuration
-    all_task_ids = []
-    for category in ['novice_scenarios', 'intermediate_scenarios', 'advanced_scenarios']:
-        all_task_ids.extend([scenario['task_id'] for scenario in config[category]])
-
-    # Fetch scores for all users and tasks in a single batch
-    all_user_scores, _ = await fetch_user_plays(user_ids, all_task_ids)
+    if profiles:
+        # A member refresh only ingests the plays of its profiles
+        all_user_scores, _ = await aimlabs_scores.get_users(
+            [profile[2] for profile in profiles])
+    else:
+        # Scores of every profile, shared with the dojo playlist leaderboards
+        all_user_scores, _, _ = await aimlabs_scores.get()
 
-    all_values = []
     now = datetime.now(timezone.utc).isoformat()
-    # Process each user's scores
+    # Score vectors of every user with scores, in config order, so every
+    # energy is computed in one batch
+    scored_profiles = []
+    tier_scores = [[] for _ in TIER_KEYS]
     for profile in aimlabs_profiles:
-        discord_id, discord_username, aimlabs_id, aimlabs_username = profile
+        aimlabs_id = profile[2]
 
         # Skip if no scores found for this user
         if aimlabs_id not in all_user_scores:
             continue
 
         user_scores = all_user_scores[aimlabs_id]
-
-        # Extract scores for each category in the correct order
-        novice_scores = []
-        for scenario in config['novice_scenarios']:
-            task_id = scenario['task_id']
-            novice_scores.append(user_scores.get(task_id, 0))  # Adding None as a placeholder for headers
-
-        intermediate_scores = []
-        for scenario in config['intermediate_scenarios']:
-            task_id = scenario['task_id']
-            intermediate_scores.append(user_scores.get(task_id, 0))
-
-        advance_scores = []
-        for scenario in config['advanced_scenarios']:
-            task_id = scenario['task_id']
-            advance_scores.append(user_scores.get(task_id, 0))
-        # Calculate rankings
-        current_rank, current_rank_id, current_rank_rating = await calculate_energy(
-            novice_scores, intermediate_scores, advance_scores, "val"
-        )
-
-        # Add to values for batch update
-        all_values.append((
-            discord_id, discord_username, aimlabs_id, aimlabs_username,
-            current_rank, current_rank_id, current_rank_rating, now
-        ))
+        scored_profiles.append(profile)
+        for tier_index, tier_key in enumerate(TIER_KEYS):
+            tier_scores[tier_index].append(
+                [user_scores.get(scenario['task_id'], 0)
+                 for scenario in config[tier_key]])
+
+    # Calculate rankings
+    ranks = await calculate_energies(*tier_scores, "val")
+    all_values = [
+        (discord_id, discord_username, aimlabs_id, aimlabs_username,
+         current_rank, current_rank_id, current_rank_rating, now)
+        for (discord_id, discord_username, aimlabs_id, aimlabs_username),
+            (current_rank, current_rank_id, current_rank_rating)
+        in zip(scored_profiles, ranks)
+    ]
     await executemany_commit(
         sql_statement,
         all_values,
@@ -255,35 +690,47 @@ async def update_voltaic_val_s1_leaderboard():
     )
     end_time = time.time()
     runtime = end_time - start_time
-    logger.info(f"Done updating voltaic val S1 leaderboard in {runtime:.2f}s")
+    logger.info(f"Done updating voltaic val S1 leaderboard in {runtime:.2f}s "
+                f"({len(all_values)} energies, {energy_batch.BACKEND})")
 
 
-async def update_dojo_aimlabs_balanced_playlist_leaderboard():
+async def update_dojo_aimlabs_playlist_leaderboard(table_name: str,
+                                                   all_task_ids: list):
+    """Scores every aimlabs profile on a dojo playlist from the shared
+    aimlabs score snapshot.
+
+    :param str table_name: Leaderboard table of the playlist
+    :param list all_task_ids: Task ids of the playlist
+    """
     start_time = time.time()
-    sql_statement = """
-        INSERT INTO dojo_aimlabs_playlist_balanced (
+    sql_statement = f"""
+        INSERT INTO {table_name} (
             discord_id, discord_username, aimlabs_id, aimlabs_username,
             date_updated, score
         )
         VALUES(?, ?, ?, ?, ?, ?)
         ON CONFLICT (discord_id) DO UPDATE SET
+            aimlabs_username = excluded.aimlabs_username,
             score = excluded.score,
             date_updated = excluded.date_updated
     """
     aimlabs_profiles = await get_aimlabs_profiles()
-    user_ids = [profile[2] for profile in aimlabs_profiles]
-    all_task_ids = DOJO_AIMLABS_PLAYLIST_BALANCED
-    all_user_scores, max_min_scores = \
-        await fetch_user_plays(user_ids, all_task_ids, max_min=True)
+    all_user_scores, task_sketches, missing_user_ids = \
+        await aimlabs_scores.get()
+    max_min_scores = get_task_min_max(task_sketches, all_task_ids)
     all_values = []
     now = datetime.now(timezone.utc).isoformat()
     for profile in aimlabs_profiles:
         discord_id, discord_username, aimlabs_id, aimlabs_username = profile
+        # Keep the previous score rather than zeroing users whose scores
+        # failed to fetch
+        if aimlabs_id in missing_user_ids:
+            continue
         try:
             user_scores = all_user_scores[aimlabs_id]
             scores = [user_scores.get(task_id, 0) for task_id in all_task_ids]
         except KeyError:
-            scores = [0]*7
+            scores = [0]*len(all_task_ids)
         energy = calculate_dojo_playlist_score(
             scores, all_task_ids, max_min_scores
         )
@@ -294,49 +741,22 @@ async def update_dojo_aimlabs_balanced_playlist_leaderboard():
     await executemany_commit(
         sql_statement,
         all_values,
-        "dojo_aimlabs_playlist_balanced",
+        table_name,
         "UPSERT"
     )
     end_time = time.time()
     runtime = end_time - start_time
-    logger.info(f"Done updating dojo_aimlabs_playlist_balanced leaderboard in {runtime:.2f}s")
+    logger.info(f"Done updating {table_name} leaderboard in {runtime:.2f}s")
+
+
+async def update_dojo_aimlabs_balanced_playlist_leaderboard():
+    await update_dojo_aimlabs_playlist_leaderboard(
+        "dojo_aimlabs_playlist_balanced", DOJO_AIMLABS_PLAYLIST_BALANCED)
 
 
 async def update_dojo_aimlabs_advanced_playlist_leaderboard():
-    start_time = time.time()
-    sql_statement = """
-        INSERT INTO dojo_aimlabs_playlist_advanced (
-            discord_id, discord_username, aimlabs_id, aimlabs_username,
-            date_updated, score
-        )
-        VALUES(?, ?, ?, ?, ?, ?)
-        ON CONFLICT (discord_id) DO UPDATE SET
-            score = excluded.score,
-            date_updated = excluded.date_updated
-    """
-    aimlabs_profiles = await get_aimlabs_profiles()
-    user_ids = [profile[2] for profile in aimlabs_profiles]
-    all_task_ids = DOJO_AIMLABS_PLAYLIST_ADVANCED
-    all_user_scores, max_min_scores = \
-        await fetch_user_plays(user_ids, all_task_ids, max_min=True)
-    all_values = []
-    now = datetime.now(timezone.utc).isoformat()
-    for profile in aimlabs_profiles:
-        discord_id, discord_username, aimlabs_id, aimlabs_username = profile
-        try:
-            user_scores = all_user_scores[aimlabs_id]
-            scores = [user_scores.get(task_id, 0) for task_id in all_task_ids]
-        except KeyError:
-            scores = [0]*7
-        energy = calculate_dojo_playlist_score(
-            scores, all_task_ids, max_min_scores)
-        all_values.append((
-            discord_id, discord_username, aimlabs_id, aimlabs_username,
-            now, round(energy)
-        ))
-    end_time = time.time()
-    runtime = end_time - start_time
-    logger.info(f"Done updating dojo_aimlabs_playlist_advanced leaderboard in {runtime:.2f}s")
+    await update_dojo_aimlabs_playlist_leaderboard(
+        "dojo_aimlabs_playlist_advanced", DOJO_AIMLABS_PLAYLIST_ADVANCED)
 
 
 async def get_dm_matches_fromdb():
@@ -366,21 +786,46 @@ async def get_valorant_rank_leaderboard_data():
     return sorted_data
 
 
-async def get_valorant_dm_leaderboard_data():
+async def get_valorant_dm_leaderboard_data(week_id: int | None = None):
+    """Returns (discord_id, discord_username, dm_count) rows of a week, the
+    current one by default, sorted by DM count"""
     valorant_profiles = await get_valorant_profiles()
     profile_ids = [profile[0] for profile in valorant_profiles]
     sql_statement = f"""
-        SELECT discord_id, discord_username, dm_count
+        SELECT discord_id, discord_username
         FROM valorant_dm_leaderboard WHERE discord_id in 
         ({', '.join('?' for _ in profile_ids)})
     """
     data = await execute_fetch(sql_statement, tuple(profile_ids),
                                "valorant_dm_leaderboard")
+    if week_id is None:
+        week_id, _, _ = week_window.current()
+    dm_counts = await get_valorant_dm_counts(week_id)
+    data = [(discord_id, discord_username, dm_counts.get(discord_id, 0))
+            for discord_id, discord_username in data]
 
     sorted_data = sorted(data, key=lambda x: int(x[2]), reverse=True)
     return sorted_data
 
 
+async def get_valorant_dm_performance_leaderboard_data(
+        week_id: int | None = None):
+    """Returns (discord_id, discord_username, average_score, kills) rows of
+    a week, the current one by default, sorted by average deathmatch score.
+    Built from the stats of ingested DMs, so it needs no API calls of its own."""
+    valorant_profiles = await get_valorant_profiles()
+    if week_id is None:
+        week_id, _, _ = week_window.current()
+    performance = await get_valorant_dm_performance(
+        week_id, VALORANT_DM_PERFORMANCE_QUEUE,
+        VALORANT_DM_PERFORMANCE_MIN_MATCHES)
+    data = [(discord_id, discord_username) + performance[discord_id]
+            for discord_id, discord_username, *_ in valorant_profiles
+            if discord_id in performance]
+    sorted_data = sorted(data, key=lambda x: (x[2], x[3]), reverse=True)
+    return sorted_data
+
+
 async def get_voltaic_s5_benchmarks_leaderboard_data():
     kovaaks_profiles = await get_kovaaks_profiles()
     profile_ids = [profile[0] for profile in kovaaks_profiles]
@@ -447,6 +892,94 @@ async def get_dojo_aimlabs_playlist_advanced_leaderboard_data():
     return sorted_data
 
 
+async def create_weekly_leaderboard_archive_table() -> None:
+    """Creates the table holding the frozen final standings of every week
+    of the weekly leaderboards"""
+    await execute_commit("""
+    CREATE TABLE IF NOT EXISTS weekly_leaderboard_archive (
+        week_id INTEGER NOT NULL,
+        leaderboard_type TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        discord_id INTEGER NOT NULL,
+        discord_username TEXT,
+        score INTEGER NOT NULL,
+        details TEXT,
+        PRIMARY KEY (leaderboard_type, week_id, position)
+    )
+    """, (), "weekly_leaderboard_archive", "CREATE")
+
+
+async def archive_weekly_leaderboards(week_id: int) -> None:
+    """Freezes the standings of the weekly leaderboards for a week. Running
+    it again for the same week replaces that week's standings.
+
+    :param int week_id: Week id from utils.weekly_window
+    """
+    rank_data = await get_valorant_rank_leaderboard_data()
+    dm_data = await get_valorant_dm_leaderboard_data(week_id)
+    performance_data = \
+        await get_valorant_dm_performance_leaderboard_data(week_id)
+    standings = {
+        "valorant_rank_leaderboard": [
+            (discord_id, discord_username,
+             int(current_rank_id) * 100 + int(current_rr), current_rank)
+            for (discord_id, discord_username, current_rank,
+                 current_rank_id, current_rr) in rank_data],
+        "valorant_dm_leaderboard": [
+            (discord_id, discord_username, dm_count, None)
+            for discord_id, discord_username, dm_count in dm_data],
+        "valorant_dm_performance_leaderboard": [
+            (discord_id, discord_username, average_score, f"{kills} kills")
+            for discord_id, discord_username, average_score, kills
+            in performance_data],
+    }
+    sql_statement = """
+        INSERT INTO weekly_leaderboard_archive (
+            week_id, leaderboard_type, position, discord_id,
+            discord_username, score, details
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (leaderboard_type, week_id, position) DO UPDATE SET
+            discord_id = excluded.discord_id,
+            discord_username = excluded.discord_username,
+            score = excluded.score,
+            details = excluded.details
+    """
+    for leaderboard_type, rows in standings.items():
+        await execute_commit("DELETE FROM weekly_leaderboard_archive "
+                             "WHERE leaderboard_type = ? AND week_id = ?",
+                             (leaderboard_type, week_id),
+                             "weekly_leaderboard_archive", "DELETE")
+        await executemany_commit(
+            sql_statement,
+            [(week_id, leaderboard_type, position) + row
+             for position, row in enumerate(rows, start=1)],
+            "weekly_leaderboard_archive", "UPSERT")
+    logger.info(f"Archived weekly leaderboards of week {week_id}")
+
+
+async def get_weekly_winners(leaderboard_type: str,
+                             before_week_id: int | None = None,
+                             limit: int = 1) -> list:
+    """Returns (week_id, discord_id, discord_username, score) of the most
+    recent archived winners of a weekly leaderboard, newest first.
+
+    :param str leaderboard_type: Leaderboard type
+    :param int before_week_id: Only weeks before this one
+    :param int limit: Number of weeks
+    """
+    sql_statement = """
+        SELECT week_id, discord_id, discord_username, score
+        FROM weekly_leaderboard_archive
+        WHERE leaderboard_type = ? AND position = 1 AND week_id < ?
+        ORDER BY week_id DESC LIMIT ?
+    """
+    return await execute_fetch(
+        sql_statement,
+        (leaderboard_type, before_week_id or 99999999, limit),
+        "weekly_leaderboard_archive")
+
+
 if __name__ == "__main__":
     import asyncio
     import pprint
@@ -457,5 +990,7 @@ if __name__ == "__main__":
     new_loop.run_until_complete(teardown(None))
     print(data)
 
-async def setup(bot): pass
+async def setup(bot):
+    await create_weekly_leaderboard_archive_table()
+    s1_config.subscribe(aimlabs_scores.invalidate)
 async def teardown(bot): pass
@@ -1,7 +1,11 @@
 from datetime import datetime, timezone
 from utils.errors import UsernameAlreadyExists, UsernameDoesNotExist
-from utils.database_helper import (get_profiles_from_db, execute_commit)
+from utils.database_helper import (get_profiles_from_db, execute_commit,
+                                   executemany_commit, execute_fetch,
+                                   get_datetime)
 from services.db.database import update_discord_profile
+from utils.weekly_window import week_window
+from utils import json_codec
 
 
 async def add_valorant_username_todb(valorant_username: str, valorant_tag: str,
@@ -112,5 +116,323 @@ async def update_valorant_username_indb(valorant_username: str,
                          "UPDATE")
 
 
-async def setup(bot): pass
+async def create_valorant_mmr_fingerprints_table() -> None:
+    """Creates the table holding, for each valorant profile, the newest
+    competitive match seen when its MMR was last fetched, used to skip MMR
+    requests for players with no new games."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS valorant_mmr_fingerprints (
+        discord_id INTEGER PRIMARY KEY,
+        valorant_id TEXT NOT NULL,
+        last_match_id TEXT,
+        last_match_date TEXT,
+        date_full_refresh TEXT NOT NULL
+    )
+    """
+    await execute_commit(sql_statement, (), "valorant_mmr_fingerprints",
+                         "CREATE")
+
+
+async def get_valorant_mmr_fingerprints() -> dict:
+    """Returns {discord_id: (valorant_id, last_match_id, date_full_refresh)}
+    for every fingerprinted profile.
+
+    :return: dict
+    """
+    sql_statement = """
+    SELECT discord_id, valorant_id, last_match_id, date_full_refresh
+    FROM valorant_mmr_fingerprints
+    """
+    data = await execute_fetch(sql_statement, (), "valorant_mmr_fingerprints")
+    return {row[0]: row[1:] for row in data}
+
+
+async def update_valorant_mmr_fingerprints(values: list[tuple]) -> None:
+    """Stores the newest competitive match of profiles whose MMR was
+    fetched.
+
+    :param list[tuple] values: (discord_id, valorant_id, last_match_id,
+        last_match_date, date_full_refresh) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT INTO valorant_mmr_fingerprints (discord_id, valorant_id,
+                                           last_match_id, last_match_date,
+                                           date_full_refresh)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (discord_id) DO UPDATE SET
+        valorant_id = excluded.valorant_id,
+        last_match_id = excluded.last_match_id,
+        last_match_date = excluded.last_match_date,
+        date_full_refresh = excluded.date_full_refresh
+    """
+    await executemany_commit(sql_statement, values,
+                             "valorant_mmr_fingerprints", "UPSERT")
+
+
+async def create_valorant_match_cursors_table() -> None:
+    """Creates the table holding the newest match (any queue) seen for each
+    valorant profile, where the next DM pass stops paging."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS valorant_match_cursors (
+        discord_id INTEGER PRIMARY KEY,
+        valorant_id TEXT NOT NULL,
+        last_match_id TEXT NOT NULL,
+        last_match_date TEXT NOT NULL
+    )
+    """
+    await execute_commit(sql_statement, (), "valorant_match_cursors",
+                         "CREATE")
+
+
+async def get_valorant_match_cursors() -> dict:
+    """Returns {discord_id: (valorant_id, last_match_id, last_match_date)}.
+
+    :return: dict
+    """
+    sql_statement = """
+    SELECT discord_id, valorant_id, last_match_id, last_match_date
+    FROM valorant_match_cursors
+    """
+    data = await execute_fetch(sql_statement, (), "valorant_match_cursors")
+    return {row[0]: row[1:] for row in data}
+
+
+async def update_valorant_match_cursors(values: list[tuple]) -> None:
+    """Moves the match cursors of refreshed profiles.
+
+    :param list[tuple] values: (discord_id, valorant_id, last_match_id,
+        last_match_date) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT INTO valorant_match_cursors (discord_id, valorant_id,
+                                        last_match_id, last_match_date)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (discord_id) DO UPDATE SET
+        valorant_id = excluded.valorant_id,
+        last_match_id = excluded.last_match_id,
+        last_match_date = excluded.last_match_date
+    """
+    await executemany_commit(sql_statement, values,
+                             "valorant_match_cursors", "UPSERT")
+
+
+async def create_valorant_last_competitive_table() -> None:
+    """Creates the table holding the newest competitive match the DM pass
+    saw for each valorant profile, read by the rank pass to skip MMR
+    requests for players with no new competitive games."""
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS valorant_last_competitive (
+        discord_id INTEGER PRIMARY KEY,
+        valorant_id TEXT NOT NULL,
+        last_match_id TEXT NOT NULL,
+        last_match_date TEXT NOT NULL
+    )
+    """
+    await execute_commit(sql_statement, (), "valorant_last_competitive",
+                         "CREATE")
+
+
+async def get_valorant_last_competitive() -> dict:
+    """Returns {discord_id: (valorant_id, last_match_id, last_match_date)}.
+
+    :return: dict
+    """
+    sql_statement = """
+    SELECT discord_id, valorant_id, last_match_id, last_match_date
+    FROM valorant_last_competitive
+    """
+    data = await execute_fetch(sql_statement, (),
+                               "valorant_last_competitive")
+    return {row[0]: row[1:] for row in data}
+
+
+async def update_valorant_last_competitive(values: list[tuple]) -> None:
+    """Stores the newest competitive match seen for profiles.
+
+    :param list[tuple] values: (discord_id, valorant_id, last_match_id,
+        last_match_date) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT INTO valorant_last_competitive (discord_id, valorant_id,
+                                           last_match_id, last_match_date)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (discord_id) DO UPDATE SET
+        valorant_id = excluded.valorant_id,
+        last_match_id = excluded.last_match_id,
+        last_match_date = excluded.last_match_date
+    """
+    await executemany_commit(sql_statement, values,
+                             "valorant_last_competitive", "UPSERT")
+
+
+async def create_valorant_dm_matches_table() -> None:
+    """Creates the table of ingested DM/TDM matches, each tagged with the id
+    of the week it was played in (see utils.weekly_window)."""
+    await execute_commit("""
+    CREATE TABLE IF NOT EXISTS valorant_dm_matches (
+        discord_id INTEGER NOT NULL,
+        match_id TEXT NOT NULL,
+        week_id INTEGER NOT NULL,
+        started_at TEXT NOT NULL,
+        PRIMARY KEY (discord_id, match_id)
+    )
+    """, (), "valorant_dm_matches", "CREATE")
+    await execute_commit("""
+    CREATE INDEX IF NOT EXISTS valorant_dm_matches_week
+    ON valorant_dm_matches (week_id, discord_id)
+    """, (), "valorant_dm_matches", "CREATE")
+
+
+async def backfill_valorant_dm_matches() -> None:
+    """Copies the matches stored as JSON in valorant_dm_leaderboard.dm into
+    valorant_dm_matches the first time the table is used."""
+    if await execute_fetch("SELECT 1 FROM valorant_dm_matches LIMIT 1", (),
+                           "valorant_dm_matches"):
+        return
+    data = await execute_fetch("SELECT discord_id, dm FROM "
+                               "valorant_dm_leaderboard", (),
+                               "valorant_dm_leaderboard")
+    values = [(discord_id, match["id"],
+               week_window.week_of(get_datetime(match["date"])),
+               match["date"])
+              for discord_id, dm_json in data if dm_json
+              for match in json_codec.loads(dm_json)]
+    await add_valorant_dm_matches(values)
+
+
+async def get_valorant_dm_matches(discord_id: int, week_id: int) -> list:
+    """Returns [(match_id, started_at)] of a profile's DMs in a week.
+
+    :param int discord_id: Discord ID
+    :param int week_id: Week id from utils.weekly_window
+    :return: list
+    """
+    sql_statement = """
+    SELECT match_id, started_at FROM valorant_dm_matches
+    WHERE week_id = ? AND discord_id = ?
+    """
+    return await execute_fetch(sql_statement, (week_id, discord_id),
+                               "valorant_dm_matches")
+
+
+async def get_valorant_dm_counts(week_id: int) -> dict:
+    """Returns {discord_id: number of DMs} for a week.
+
+    :param int week_id: Week id from utils.weekly_window
+    :return: dict
+    """
+    sql_statement = """
+    SELECT discord_id, COUNT(*) FROM valorant_dm_matches
+    WHERE week_id = ? GROUP BY discord_id
+    """
+    data = await execute_fetch(sql_statement, (week_id,),
+                               "valorant_dm_matches")
+    return dict(data)
+
+
+async def add_valorant_dm_matches(values: list[tuple]) -> None:
+    """Stores newly ingested DMs, ignoring ones already stored.
+
+    :param list[tuple] values: (discord_id, match_id, week_id, started_at)
+        rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = """
+    INSERT OR IGNORE INTO valorant_dm_matches (discord_id, match_id, week_id,
+                                               started_at)
+    VALUES (?, ?, ?, ?)
+    """
+    await executemany_commit(sql_statement, values, "valorant_dm_matches",
+                             "INSERT")
+
+
+# Columns of the per-match stats kept from ingested DMs, in table order
+DM_STATS_FIELDS = ["mode", "kills", "deaths", "assists", "score", "headshots",
+                   "bodyshots", "legshots", "damage_dealt"]
+
+
+async def create_valorant_dm_match_stats_table() -> None:
+    """Creates the table of the player's own stats in each ingested DM"""
+    await execute_commit("""
+    CREATE TABLE IF NOT EXISTS valorant_dm_match_stats (
+        discord_id INTEGER NOT NULL,
+        match_id TEXT NOT NULL,
+        week_id INTEGER NOT NULL,
+        started_at TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        kills INTEGER NOT NULL,
+        deaths INTEGER NOT NULL,
+        assists INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        headshots INTEGER NOT NULL,
+        bodyshots INTEGER NOT NULL,
+        legshots INTEGER NOT NULL,
+        damage_dealt INTEGER NOT NULL,
+        PRIMARY KEY (discord_id, match_id)
+    )
+    """, (), "valorant_dm_match_stats", "CREATE")
+    await execute_commit("""
+    CREATE INDEX IF NOT EXISTS valorant_dm_match_stats_week
+    ON valorant_dm_match_stats (week_id, discord_id)
+    """, (), "valorant_dm_match_stats", "CREATE")
+
+
+async def add_valorant_dm_match_stats(values: list[tuple]) -> None:
+    """Stores the stats of newly ingested DMs, ignoring ones already stored.
+
+    :param list[tuple] values: (discord_id, match_id, week_id, started_at,
+        *DM_STATS_FIELDS) rows
+    :return: None
+    """
+    if not values:
+        return
+    sql_statement = f"""
+    INSERT OR IGNORE INTO valorant_dm_match_stats (
+        discord_id, match_id, week_id, started_at, {', '.join(DM_STATS_FIELDS)}
+    )
+    VALUES ({', '.join('?' for _ in range(4 + len(DM_STATS_FIELDS)))})
+    """
+    await executemany_commit(sql_statement, values,
+                             "valorant_dm_match_stats", "INSERT")
+
+
+async def get_valorant_dm_performance(week_id: int, mode: str,
+                                      min_matches: int) -> dict:
+    """Returns {discord_id: (average_score, kills)} over a week's matches of
+    one queue for players with at least min_matches of them. Scores of
+    different queues aren't comparable, so they're never averaged together.
+
+    :param int week_id: Week id from utils.weekly_window
+    :param str mode: Queue id, e.g. "deathmatch"
+    :param int min_matches: Fewest matches needed to be ranked
+    :return: dict
+    """
+    sql_statement = """
+    SELECT discord_id, CAST(ROUND(AVG(score)) AS INTEGER), SUM(kills)
+    FROM valorant_dm_match_stats WHERE week_id = ? AND mode = ?
+    GROUP BY discord_id HAVING COUNT(*) >= ?
+    """
+    data = await execute_fetch(sql_statement, (week_id, mode, min_matches),
+                               "valorant_dm_match_stats")
+    return {row[0]: tuple(row[1:]) for row in data}
+
+
+async def setup(bot):
+    await create_valorant_mmr_fingerprints_table()
+    await create_valorant_match_cursors_table()
+    await create_valorant_last_competitive_table()
+    await create_valorant_dm_matches_table()
+    await create_valorant_dm_match_stats_table()
+    await backfill_valorant_dm_matches()
 async def teardown(bot): pass
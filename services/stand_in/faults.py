@@ -0,0 +1,103 @@
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+
+from aiohttp import web
+
+from settings import API_HEADER_FIELDS
+
+
+@dataclass
+class FaultProfile:
+    """Misbehaviour injected into one stand-in upstream.
+
+    latency_ms: (min, max) added to every response
+    rate_limit: requests allowed per client key per window, 0 disables it
+    throttle_rate: probability of a spurious 429 below the limit
+    error_rate: probability of a 5xx response
+    """
+    api_type: str
+    latency_ms: tuple[int, int] = (20, 120)
+    rate_limit: int = 0
+    window: int = 60
+    throttle_rate: float = 0.0
+    error_rate: float = 0.0
+
+
+class FaultInjector:
+    """aiohttp middleware applying a FaultProfile per path prefix.
+
+    Rate limiting is a per-client sliding window keyed by the Authorization
+    header (Henrik keys) or the remote address, and reports the same headers
+    as the real upstream so the bot's limiters can be exercised."""
+    def __init__(self, profiles: dict[str, FaultProfile], seed: int = 0):
+        self.profiles = profiles
+        self.rng = random.Random(seed)
+        self.windows: dict[tuple, deque] = defaultdict(deque)
+        self.stats = defaultdict(lambda: defaultdict(int))
+
+    def profile_for(self, path: str) -> FaultProfile | None:
+        for prefix, profile in self.profiles.items():
+            if path.startswith(prefix):
+                return profile
+        return None
+
+    def rate_limit_headers(self, profile: FaultProfile, remaining: int,
+                           reset: float) -> dict:
+        fields = API_HEADER_FIELDS.get(profile.api_type, {})
+        if not fields.get("rate_limit_field"):
+            return {}
+        return {fields["rate_limit_field"]: str(max(0, remaining)),
+                fields["reset_time_field"]: str(max(0, round(reset)))}
+
+    def error_response(self, profile: FaultProfile, status: int,
+                       message: str, headers: dict):
+        body = {"errors": [{"status": status, "code": status,
+                            "message": message, "details": None}]} \
+            if profile.api_type == "val" else {"message": message}
+        return web.json_response(body, status=status, headers=headers)
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        profile = self.profile_for(request.path)
+        if profile is None:
+            return await handler(request)
+        stats = self.stats[profile.api_type]
+        stats["requests"] += 1
+
+        await asyncio.sleep(self.rng.uniform(*profile.latency_ms) / 1000)
+
+        headers = {}
+        if profile.rate_limit:
+            key = (profile.api_type,
+                   request.headers.get("Authorization") or request.remote)
+            window = self.windows[key]
+            now = time.time()
+            while window and now - window[0] > profile.window:
+                window.popleft()
+            reset = (window[0] + profile.window - now) if window \
+                else profile.window
+            if len(window) >= profile.rate_limit:
+                stats["429"] += 1
+                return self.error_response(
+                    profile, 429, "Rate limit exceeded",
+                    self.rate_limit_headers(profile, 0, reset))
+            window.append(now)
+            headers = self.rate_limit_headers(
+                profile, profile.rate_limit - len(window), reset)
+
+        if self.rng.random() < profile.throttle_rate:
+            stats["429"] += 1
+            return self.error_response(profile, 429, "Rate limit exceeded",
+                                       headers)
+        if self.rng.random() < profile.error_rate:
+            stats["5xx"] += 1
+            status = self.rng.choice([500, 502, 503])
+            return self.error_response(profile, status,
+                                       "Injected upstream error", headers)
+
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
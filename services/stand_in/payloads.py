@@ -0,0 +1,307 @@
+import json
+import random
+from datetime import datetime, timezone
+
+from services.stand_in.population import (SyntheticPopulation, SyntheticUser,
+                                          VALORANT_TIERS)
+from settings import (S5_VOLTAIC_BENCHMARKS_CONFIG,
+                      S1_VOLTAIC_VAL_BENCHMARKS_CONFIG)
+
+# KovaaK's benchmark id -> tier key in the stored S5 config
+KOVAAKS_BENCHMARK_TIERS = {
+    432: "novice_scenarios",
+    431: "intermediate_scenarios",
+    427: "advanced_scenarios",
+}
+TIER_KEYS = ["novice_scenarios", "intermediate_scenarios",
+             "advanced_scenarios"]
+
+
+def load_benchmark_config(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.read())
+
+
+S5_CONFIG = load_benchmark_config(S5_VOLTAIC_BENCHMARKS_CONFIG)
+S1_CONFIG = load_benchmark_config(S1_VOLTAIC_VAL_BENCHMARKS_CONFIG)
+
+
+def isoformat(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def henrik_error(status: int, message: str) -> dict:
+    return {"errors": [{"status": status, "code": status,
+                        "message": message, "details": None}]}
+
+
+def valorant_account(user: SyntheticUser) -> dict:
+    return {
+        "status": 200,
+        "data": {
+            "puuid": user.puuid,
+            "region": user.region,
+            "account_level": 100 + user.index % 300,
+            "name": user.valorant_username,
+            "tag": user.valorant_tag,
+            "card": "9fb348bc-41a0-91ad-8a3e-818035c4e561",
+            "title": None,
+            "last_update": "now",
+            "last_update_raw": 0,
+        }
+    }
+
+
+def valorant_mmr(population: SyntheticPopulation, user: SyntheticUser) -> dict:
+    tier, rr, peak, last_change = population.rank(user)
+    return {
+        "status": 200,
+        "data": {
+            "account": {"name": user.valorant_username,
+                        "tag": user.valorant_tag, "puuid": user.puuid},
+            "peak": {
+                "season": {"id": "e9a3", "short": "e9a3"},
+                "ruleset": "v2",
+                "tier": {"id": peak, "name": VALORANT_TIERS[peak]},
+            },
+            "current": {
+                "tier": {"id": tier, "name": VALORANT_TIERS[tier]},
+                "rr": rr,
+                "last_change": last_change,
+                "elo": tier * 100 + rr,
+                "games_needed_for_rating": 0,
+                "leaderboard_placement": None,
+            },
+            "seasonal": [],
+        }
+    }
+
+
+def valorant_player(rng: random.Random, puuid: str, name: str, tag: str,
+                    team_id: str) -> dict:
+    kills = rng.randint(5, 40)
+    return {
+        "puuid": puuid,
+        "name": name,
+        "tag": tag,
+        "team_id": team_id,
+        "platform": "pc",
+        "party_id": str(rng.getrandbits(64)),
+        "agent": {"id": "add6443a-41bd-e414-f6ad-e58d267f4e95",
+                  "name": "Jett"},
+        "stats": {
+            "score": kills * 100 + rng.randint(0, 99),
+            "kills": kills,
+            "deaths": rng.randint(5, 40),
+            "assists": rng.randint(0, 10),
+            "headshots": rng.randint(0, kills),
+            "bodyshots": rng.randint(0, 3 * kills),
+            "legshots": rng.randint(0, kills),
+            "damage": {"dealt": kills * 140 + rng.randint(0, 300),
+                       "received": rng.randint(1000, 6000)},
+        },
+        "ability_casts": {"grenade": 0, "ability1": 0, "ability2": 0,
+                          "ultimate": 0},
+        "tier": {"id": 0, "name": "Unrated"},
+        "account_level": rng.randint(20, 400),
+        "session_playtime_in_ms": rng.randint(300000, 3000000),
+        "behavior": {"afk_rounds": 0,
+                     "friendly_fire": {"incoming": 0, "outgoing": 0},
+                     "rounds_in_spawn": 0},
+        "economy": {"spent": {"overall": 0, "average": 0},
+                    "loadout_value": {"overall": 0, "average": 0}},
+    }
+
+
+def valorant_match(user: SyntheticUser, match: dict) -> dict:
+    """Builds a v4 match object. Deathmatches carry 14 players, team modes
+    10, mirroring the size of real upstream payloads."""
+    rng = random.Random(match["match_id"])
+    player_count = 14 if match["mode"] == "deathmatch" else 10
+    players = [valorant_player(rng, user.puuid, user.valorant_username,
+                               user.valorant_tag, "Red")]
+    for i in range(player_count - 1):
+        team_id = ("Red" if i % 2 else "Blue") \
+            if match["mode"] != "deathmatch" else str(i)
+        players.append(valorant_player(rng, f"{match['match_id']}-{i}",
+                                       f"Other{i}", "0000", team_id))
+    return {
+        "metadata": {
+            "match_id": match["match_id"],
+            "map": {"id": "7eaecc1b-4337-bbf6-6ab9-04b8f06b3319",
+                    "name": match["map"]},
+            "game_version": "release-09.07-shipping-8-2886117",
+            "game_length_in_ms": rng.randint(400000, 2400000),
+            "started_at": isoformat(match["started_at"]),
+            "is_completed": True,
+            "queue": {"id": match["mode"], "name": match["mode"].title(),
+                      "mode_type": "Standard"},
+            "season": {"id": "e9a3", "short": "e9a3"},
+            "platform": "pc",
+            "premier": None,
+            "party_rr_penaltys": [],
+            "cluster": "Virginia",
+            "region": user.region,
+        },
+        "players": players,
+        "observers": [],
+        "coaches": [],
+        "teams": [],
+        "rounds": [],
+        "kills": [],
+    }
+
+
+def valorant_matches(population: SyntheticPopulation, user: SyntheticUser,
+                     mode: str | None, start: int, size: int) -> dict:
+    """Newest first, optionally filtered by queue, paginated like v4."""
+    slots = population.match_slots(user)
+    matches = []
+    skipped = 0
+    for slot in range(slots - 1, -1, -1):
+        if mode and population.match_mode(user, slot) != mode:
+            continue
+        if skipped < start:
+            skipped += 1
+            continue
+        matches.append(valorant_match(user, population.match_at(user, slot)))
+        if len(matches) >= size:
+            break
+    return {"status": 200, "data": matches}
+
+
+def kovaaks_benchmark(population: SyntheticPopulation, user: SyntheticUser,
+                      benchmark_id: int) -> dict:
+    tier_key = KOVAAKS_BENCHMARK_TIERS[benchmark_id]
+    subcategory_to_category = {
+        subcategory["id"]: category["id"]
+        for category in S5_CONFIG["categories"]
+        for subcategory in category["subcategories"]
+    }
+    slots = population.play_slots(user)
+    categories = {}
+    for i, scenario in enumerate(S5_CONFIG[tier_key]):
+        category_id = subcategory_to_category[scenario["subcategoryId"]]
+        category = categories.setdefault(
+            f"Category {category_id}",
+            {"benchmark_progress": 0, "category_progress": 0,
+             "scenarios": {}})
+        top = scenario["thresholds"][-1]
+        score = population.play_score(user, f"{benchmark_id}-{i}", slots, top)
+        category["scenarios"][f"Scenario {benchmark_id}-{i}"] = {
+            "score": int(score * 100),
+            "leaderboard_rank": user.index + 1,
+            "scenario_rank": 0,
+            "rank_maxes": scenario["thresholds"],
+        }
+    return {"benchmark_progress": 0, "overall_rank": 0,
+            "categories": categories, "ranks": []}
+
+
+def kovaaks_profile(user: SyntheticUser) -> dict:
+    return {
+        "playerId": user.kovaaks_id,
+        "steamId": user.steam_id,
+        "steamAccountName": user.steam_username,
+        "username": user.kovaaks_username,
+        "country": "US",
+        "kovaaksPlusActive": False,
+    }
+
+
+def kovaaks_scenarios(page: int, max_results: int, search: str) -> dict:
+    names = [f"Scenario {benchmark_id}-{i}"
+             for benchmark_id, tier_key in KOVAAKS_BENCHMARK_TIERS.items()
+             for i in range(len(S5_CONFIG[tier_key]))]
+    if search:
+        names = [name for name in names if search.lower() in name.lower()]
+    start = page * max_results
+    data = [{"rank": start + i + 1, "leaderboardId": 1000 + start + i,
+             "scenarioName": name, "counts": {"plays": 1000, "entries": 100}}
+            for i, name in enumerate(names[start:start + max_results])]
+    return {"page": page, "max": max_results, "total": len(names),
+            "data": data}
+
+
+def aimlabs_task_base(task_id: str) -> float:
+    """Top score used to scale plays of an aimlabs task"""
+    for tier_key in TIER_KEYS:
+        for scenario in S1_CONFIG[tier_key]:
+            if scenario["task_id"] == task_id:
+                return scenario["thresholds"][-1]
+    return 100000 + random.Random(task_id).randint(0, 50000)
+
+
+def aimlabs_plays_agg(population: SyntheticPopulation, where: dict) -> dict:
+    user_ids = where.get("user_id", {}).get("_in", [])
+    task_ids = where.get("task_id", {}).get("_in", [])
+    created_after = where.get("created_at", {}).get("_gt")
+    if created_after:
+        created_after = datetime.fromisoformat(created_after)
+    entries = []
+    for user_id in user_ids:
+        user = population.by_aimlabs_id.get(user_id)
+        if user is None:
+            continue
+        slots = population.play_slots(user)
+        # Keep the cost bounded for grinders: only the latest plays can
+        # hold the max since scores trend upwards
+        first_slot = max(0, slots - 50)
+        if created_after:
+            elapsed = (created_after - population.epoch).total_seconds()
+            first_slot = max(first_slot, int(elapsed // user.play_period) + 1)
+        if first_slot >= slots:
+            continue
+        for task_id in task_ids:
+            base = aimlabs_task_base(task_id)
+            best = max(population.play_score(user, task_id, slot, base)
+                       for slot in range(first_slot, slots))
+            entries.append({
+                "group_by": {"task_id": task_id,
+                             "task_name": task_id.split(".")[-2]
+                             if "." in task_id else task_id,
+                             "user_id": user_id},
+                "aggregate": {"max": {"score": best}},
+            })
+    return {"data": {"aimlab": {"plays_agg": entries}}}
+
+
+def aimlabs_leaderboard(leaderboard_input: dict) -> dict:
+    """Page of a task's global leaderboard. Every task has its own player
+    count and scores fall off smoothly with rank."""
+    task_id = leaderboard_input.get("taskId", "")
+    offset = leaderboard_input.get("offset", 0)
+    limit = leaderboard_input.get("limit", 10)
+    total = 20000 + random.Random(f"{task_id}-players").randint(0, 400000)
+    base = aimlabs_task_base(task_id)
+    entries = []
+    for rank in range(offset + 1, min(total, offset + limit) + 1):
+        score = round(base * (1.4 - 1.1 * (rank / total) ** 0.5), 2)
+        entries.append({"data": {"rank": rank, "score": score},
+                        "play": {"gridshieldStatus": "verified"}})
+    return {"data": {"aimlab": {"leaderboard": {
+        "leaderboardEntries": entries}}}}
+
+
+def aimlabs_profile(user: SyntheticUser | None) -> dict:
+    if user is None:
+        return {"data": {"aimlabProfile": None}}
+    return {"data": {"aimlabProfile": {"username": user.aimlabs_username,
+                                       "user": {"id": user.aimlabs_id}}}}
+
+
+def voltaic_benchmark(config: dict) -> dict:
+    """Expands a stored benchmark config back into the upstream layout that
+    fetch_benchmark_config consumes."""
+    ranks = [{"tier_id": tier_id, "energy_threshold": energy}
+             for tier_id, energies in zip([2, 3, 4], config["tier_energies"])
+             for energy in energies]
+    scenarios = [{"subcategory_id": scenario["subcategoryId"],
+                  "task_id": scenario.get("task_id"),
+                  "weapon_id": scenario.get("weapon_id"),
+                  "tiers": [{"tier_id": tier_id,
+                             "thresholds": scenario["thresholds"]}]}
+                 for tier_id, tier_key in zip([2, 3, 4], TIER_KEYS)
+                 for scenario in config[tier_key]]
+    return {"categories": config["categories"], "ranks": ranks,
+            "scenarios": scenarios}
@@ -0,0 +1,205 @@
+import random
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+
+import aiosqlite
+
+# Fixed namespace so the same population size always yields the same ids
+POPULATION_NAMESPACE = uuid.UUID("6f1c3c8e-2f59-4a57-9d39-6b0f4f5d2e11")
+
+REGIONS = ["na", "eu", "ap", "kr"]
+MATCH_MODES = ["deathmatch", "teamdeathmatch", "competitive", "unrated"]
+MAPS = ["Ascent", "Bind", "Haven", "Split", "Lotus", "Sunset", "Icebox"]
+
+VALORANT_TIERS = {
+    0: "Unrated", 3: "Iron 1", 4: "Iron 2", 5: "Iron 3", 6: "Bronze 1",
+    7: "Bronze 2", 8: "Bronze 3", 9: "Silver 1", 10: "Silver 2",
+    11: "Silver 3", 12: "Gold 1", 13: "Gold 2", 14: "Gold 3",
+    15: "Platinum 1", 16: "Platinum 2", 17: "Platinum 3", 18: "Diamond 1",
+    19: "Diamond 2", 20: "Diamond 3", 21: "Ascendant 1", 22: "Ascendant 2",
+    23: "Ascendant 3", 24: "Immortal 1", 25: "Immortal 2", 26: "Immortal 3",
+    27: "Radiant"
+}
+
+
+@dataclass(frozen=True)
+class SyntheticUser:
+    index: int
+    discord_id: int
+    discord_username: str
+    valorant_username: str
+    valorant_tag: str
+    puuid: str
+    region: str
+    base_tier: int
+    kovaaks_username: str
+    kovaaks_id: int
+    steam_id: str
+    steam_username: str
+    aimlabs_username: str
+    aimlabs_id: str
+    skill: float
+    # Seconds between two consecutive matches/plays. Dormant users get a
+    # period of weeks, grinders a few minutes.
+    match_period: int
+    play_period: int
+
+
+class SyntheticPopulation:
+    """Deterministic set of fake users shared by every stand-in upstream.
+
+    Matches and plays are derived from wall-clock time, so a user that is
+    active keeps producing new matches between refresh cycles while dormant
+    users stay unchanged for long stretches.
+    """
+    def __init__(self, size: int, seed: int = 0, dormant_ratio: float = 0.7,
+                 epoch: datetime | None = None):
+        self.size = size
+        self.seed = seed
+        self.epoch = epoch or (datetime.now(timezone.utc) - timedelta(days=30))
+        self.users = [self._make_user(i, dormant_ratio) for i in range(size)]
+        self.by_puuid = {user.puuid: user for user in self.users}
+        self.by_riot_id = {(user.valorant_username.lower(),
+                            user.valorant_tag.lower()): user
+                           for user in self.users}
+        self.by_steam_id = {user.steam_id: user for user in self.users}
+        self.by_kovaaks_username = {user.kovaaks_username: user
+                                    for user in self.users}
+        self.by_aimlabs_id = {user.aimlabs_id: user for user in self.users}
+        self.by_aimlabs_username = {user.aimlabs_username: user
+                                    for user in self.users}
+
+    def _make_user(self, i: int, dormant_ratio: float) -> SyntheticUser:
+        rng = random.Random(f"{self.seed}-{i}")
+        dormant = rng.random() < dormant_ratio
+        if dormant:
+            match_period = rng.randint(7 * 86400, 60 * 86400)
+            play_period = rng.randint(7 * 86400, 60 * 86400)
+        else:
+            match_period = rng.randint(8 * 60, 6 * 3600)
+            play_period = rng.randint(2 * 60, 3 * 3600)
+        return SyntheticUser(
+            index=i,
+            discord_id=100000000000000000 + i,
+            discord_username=f"synthetic_{i}",
+            valorant_username=f"Synth{i}",
+            valorant_tag=f"{i % 10000:04d}",
+            puuid=str(uuid.uuid5(POPULATION_NAMESPACE, f"val-{self.seed}-{i}")),
+            region=rng.choice(REGIONS),
+            base_tier=rng.randint(3, 24),
+            kovaaks_username=f"synth_kvk_{i}",
+            kovaaks_id=5000000 + i,
+            steam_id=str(76561198000000000 + i),
+            steam_username=f"SynthSteam{i}",
+            aimlabs_username=f"SynthAim{i}",
+            aimlabs_id=uuid.uuid5(POPULATION_NAMESPACE,
+                                  f"aim-{self.seed}-{i}").hex.upper()[:16],
+            skill=rng.random(),
+            match_period=match_period,
+            play_period=play_period,
+        )
+
+    def match_slots(self, user: SyntheticUser, now: datetime | None = None):
+        """Returns the number of matches the user has played since epoch."""
+        now = now or datetime.now(timezone.utc)
+        elapsed = (now - self.epoch).total_seconds()
+        return max(0, int(elapsed // user.match_period))
+
+    def match_at(self, user: SyntheticUser, slot: int) -> dict:
+        """Returns a compact description of the user's slot-th match."""
+        rng = random.Random(f"{user.puuid}-{slot}")
+        started_at = self.epoch + timedelta(
+            seconds=slot * user.match_period + rng.randint(0, 60))
+        return {
+            "match_id": str(uuid.uuid5(POPULATION_NAMESPACE,
+                                       f"{user.puuid}-{slot}")),
+            "mode": self.match_mode(user, slot),
+            "map": rng.choice(MAPS),
+            "started_at": started_at,
+            "slot": slot,
+        }
+
+    @staticmethod
+    def match_mode(user: SyntheticUser, slot: int) -> str:
+        checksum = zlib.crc32(f"{user.puuid}-{slot}".encode())
+        return MATCH_MODES[checksum % len(MATCH_MODES)]
+
+    def competitive_count(self, user: SyntheticUser, slots: int) -> int:
+        return sum(1 for slot in range(slots)
+                   if self.match_mode(user, slot) == "competitive")
+
+    def rank(self, user: SyntheticUser, now: datetime | None = None) -> tuple:
+        """Returns (tier_id, rr, peak_tier_id, last_change) for the user"""
+        return self.rank_after(user, self.match_slots(user, now))
+
+    def rank_after(self, user: SyntheticUser, slots: int) -> tuple:
+        """Same as rank() once the user has played `slots` matches"""
+        games = self.competitive_count(user, slots)
+        tier = min(27, user.base_tier + games // 25)
+        rr = (games * 13) % 100
+        peak = min(27, max(tier, user.base_tier + 1))
+        last_change = 0 if games == 0 else (17 if games % 3 else -14)
+        return tier, rr, peak, last_change
+
+    def play_slots(self, user: SyntheticUser, now: datetime | None = None):
+        now = now or datetime.now(timezone.utc)
+        elapsed = (now - self.epoch).total_seconds()
+        return max(0, int(elapsed // user.play_period))
+
+    def play_score(self, user: SyntheticUser, task_id: str, slot: int,
+                   base: float) -> float:
+        rng = random.Random(f"{user.aimlabs_id}-{task_id}-{slot}")
+        improvement = 1 + 0.25 * min(1.0, slot / 400)
+        return round(base * (0.5 + user.skill) * improvement *
+                     rng.uniform(0.85, 1.05), 2)
+
+    def play_time(self, user: SyntheticUser, slot: int) -> datetime:
+        return self.epoch + timedelta(seconds=slot * user.play_period)
+
+
+async def seed_database(db_path: str, population: SyntheticPopulation):
+    """Inserts every synthetic user as an active linked profile so a local
+    bot instance refreshes them against the stand-in servers."""
+    now = datetime.now(timezone.utc).isoformat()
+    async with aiosqlite.connect(db_path) as db:
+        await db.executemany("""
+            INSERT INTO discord_profiles (discord_id, discord_username,
+                                          date_updated)
+            VALUES (?, ?, ?)
+            ON CONFLICT(discord_id) DO NOTHING
+        """, [(u.discord_id, u.discord_username, now)
+              for u in population.users])
+        await db.executemany("""
+            INSERT INTO valorant_profiles (discord_id, discord_username,
+                                           valorant_id, valorant_username,
+                                           valorant_tag, region, date_updated,
+                                           is_active, last_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(discord_id) DO NOTHING
+        """, [(u.discord_id, u.discord_username, u.puuid,
+               u.valorant_username, u.valorant_tag, u.region, now, now)
+              for u in population.users])
+        await db.executemany("""
+            INSERT INTO kovaaks_profiles (discord_id, discord_username,
+                                          kovaaks_id, kovaaks_username,
+                                          steam_id, steam_username,
+                                          date_updated, is_active,
+                                          last_active)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(discord_id) DO NOTHING
+        """, [(u.discord_id, u.discord_username, u.kovaaks_id,
+               u.kovaaks_username, u.steam_id, u.steam_username, now, now)
+              for u in population.users])
+        await db.executemany("""
+            INSERT INTO aimlabs_profiles (discord_id, discord_username,
+                                          aimlabs_username, aimlabs_id,
+                                          date_updated, is_active,
+                                          last_active)
+            VALUES (?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(discord_id) DO NOTHING
+        """, [(u.discord_id, u.discord_username, u.aimlabs_username,
+               u.aimlabs_id, now, now)
+              for u in population.users])
+        await db.commit()
@@ -0,0 +1,222 @@
+"""Local stand-ins for the Henrik, KovaaK's, Aimlabs and Voltaic APIs.
+
+Serves every upstream from one aiohttp app so the refresh cycle can be load
+tested without touching the real APIs. Point the bot at it with e.g.
+
+    HENRIK_API_BASE_URL=http://127.0.0.1:8321
+    KOVAAKS_API_BASE_URL=http://127.0.0.1:8321
+    AIMLABS_API_BASE_URL=http://127.0.0.1:8321
+    VOLTAIC_API_BASE_URL=http://127.0.0.1:8321
+
+and start it with `python -m services.stand_in.server --users 2000`.
+"""
+import argparse
+import asyncio
+import hashlib
+
+from aiohttp import web
+
+from services.stand_in import payloads
+from services.stand_in.faults import FaultInjector, FaultProfile
+from services.stand_in.population import SyntheticPopulation, seed_database
+from settings import API_HEADER_FIELDS
+
+POPULATION_KEY = web.AppKey("population", SyntheticPopulation)
+INJECTOR_KEY = web.AppKey("injector", FaultInjector)
+# Automatic persisted queries of the aimlabs endpoint: sha256 -> document
+PERSISTED_QUERIES_KEY = web.AppKey("persisted_queries", dict)
+
+
+async def valorant_account(request: web.Request):
+    population = request.app[POPULATION_KEY]
+    user = population.by_riot_id.get((request.match_info["name"].lower(),
+                                      request.match_info["tag"].lower()))
+    if user is None:
+        return web.json_response(
+            payloads.henrik_error(404, "Account not found"), status=404)
+    return web.json_response(payloads.valorant_account(user))
+
+
+async def valorant_mmr(request: web.Request):
+    population = request.app[POPULATION_KEY]
+    user = population.by_puuid.get(request.match_info["puuid"])
+    if user is None:
+        return web.json_response(
+            payloads.henrik_error(404, "Account not found"), status=404)
+    return web.json_response(payloads.valorant_mmr(population, user))
+
+
+async def valorant_matches(request: web.Request):
+    population = request.app[POPULATION_KEY]
+    user = population.by_puuid.get(request.match_info["puuid"])
+    if user is None:
+        return web.json_response(
+            payloads.henrik_error(404, "Account not found"), status=404)
+    mode = request.query.get("mode")
+    start = int(request.query.get("start", 0))
+    size = min(int(request.query.get("size", 10)), 10)
+    return web.json_response(
+        payloads.valorant_matches(population, user, mode, start, size))
+
+
+async def kovaaks_benchmark(request: web.Request):
+    population = request.app[POPULATION_KEY]
+    benchmark_id = int(request.query.get("benchmarkId", 0))
+    user = population.by_steam_id.get(request.query.get("steamId", ""))
+    if user is None or benchmark_id not in payloads.KOVAAKS_BENCHMARK_TIERS:
+        return web.json_response({"message": "Not found"}, status=404)
+    return web.json_response(
+        payloads.kovaaks_benchmark(population, user, benchmark_id))
+
+
+async def kovaaks_profile(request: web.Request):
+    population = request.app[POPULATION_KEY]
+    user = population.by_kovaaks_username.get(
+        request.query.get("username", ""))
+    if user is None:
+        # The real endpoint answers 409 for unknown usernames
+        return web.json_response({"message": "User not found"}, status=409)
+    return web.json_response(payloads.kovaaks_profile(user))
+
+
+async def kovaaks_scenarios(request: web.Request):
+    return web.json_response(payloads.kovaaks_scenarios(
+        int(request.query.get("page", 0)),
+        int(request.query.get("max", 20)),
+        request.query.get("scenarioNameSearch", "")))
+
+
+async def aimlabs_graphql(request: web.Request):
+    population = request.app[POPULATION_KEY]
+    body = await request.json()
+    query = body.get("query") or ""
+    variables = body.get("variables") or {}
+    persisted = (body.get("extensions") or {}).get("persistedQuery")
+    if persisted:
+        persisted_queries = request.app[PERSISTED_QUERIES_KEY]
+        sha256 = persisted.get("sha256Hash")
+        if query:
+            if hashlib.sha256(query.encode()).hexdigest() != sha256:
+                return web.json_response({"errors": [{
+                    "message": "provided sha does not match query"}]},
+                    status=400)
+            persisted_queries[sha256] = query
+        elif sha256 in persisted_queries:
+            query = persisted_queries[sha256]
+        else:
+            return web.json_response({"errors": [{
+                "message": "PersistedQueryNotFound",
+                "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]})
+    if "plays_agg" in query:
+        return web.json_response(
+            payloads.aimlabs_plays_agg(population, variables.get("where", {})))
+    if "leaderboard(" in query:
+        return web.json_response(payloads.aimlabs_leaderboard(
+            variables.get("leaderboardInput", {})))
+    if "aimlabProfile" in query and "username" not in variables:
+        # Aliased batch lookup: $u0 -> p0, $u1 -> p1, ...
+        return web.json_response({"data": {
+            f"p{name[1:]}": payloads.aimlabs_profile(
+                population.by_aimlabs_username.get(username)
+            )["data"]["aimlabProfile"]
+            for name, username in variables.items()}})
+    if "aimlabProfile" in query:
+        user = population.by_aimlabs_username.get(variables.get("username"))
+        return web.json_response(payloads.aimlabs_profile(user))
+    return web.json_response(
+        {"errors": [{"message": "Unsupported operation"}]}, status=400)
+
+
+async def voltaic_kovaaks_benchmark(request: web.Request):
+    return web.json_response(payloads.voltaic_benchmark(payloads.S5_CONFIG))
+
+
+async def voltaic_aimlabs_benchmark(request: web.Request):
+    return web.json_response(payloads.voltaic_benchmark(payloads.S1_CONFIG))
+
+
+async def stats(request: web.Request):
+    """Per-upstream counters of served requests, 429s and 5xx"""
+    injector = request.app[INJECTOR_KEY]
+    return web.json_response({api_type: dict(counters) for api_type, counters
+                              in injector.stats.items()})
+
+
+def default_fault_profiles(latency_ms: tuple[int, int], error_rate: float,
+                           throttle_rate: float) -> dict[str, FaultProfile]:
+    return {
+        "/valorant": FaultProfile(
+            "val", latency_ms=latency_ms,
+            rate_limit=API_HEADER_FIELDS["val"]["rate_limit"],
+            window=API_HEADER_FIELDS["val"]["reset_time"],
+            throttle_rate=throttle_rate, error_rate=error_rate),
+        "/graphql": FaultProfile(
+            "aimlabs", latency_ms=latency_ms,
+            rate_limit=API_HEADER_FIELDS["aimlabs"]["rate_limit"],
+            window=API_HEADER_FIELDS["aimlabs"]["reset_time"],
+            throttle_rate=throttle_rate, error_rate=error_rate),
+        "/webapp-backend": FaultProfile(
+            "kovaaks", latency_ms=latency_ms,
+            throttle_rate=throttle_rate, error_rate=error_rate),
+        "/api/v1": FaultProfile("voltaic", latency_ms=latency_ms),
+    }
+
+
+def create_app(population: SyntheticPopulation,
+               profiles: dict[str, FaultProfile], seed: int = 0):
+    injector = FaultInjector(profiles, seed=seed)
+    app = web.Application(middlewares=[injector.middleware])
+    app[POPULATION_KEY] = population
+    app[INJECTOR_KEY] = injector
+    app[PERSISTED_QUERIES_KEY] = {}
+    app.add_routes([
+        web.get("/valorant/v1/account/{name}/{tag}", valorant_account),
+        web.get("/valorant/v3/by-puuid/mmr/{region}/{platform}/{puuid}",
+                valorant_mmr),
+        web.get("/valorant/v4/by-puuid/matches/{region}/{platform}/{puuid}",
+                valorant_matches),
+        web.get("/webapp-backend/benchmarks/player-progress-rank-benchmark",
+                kovaaks_benchmark),
+        web.get("/webapp-backend/user/profile/by-username", kovaaks_profile),
+        web.get("/webapp-backend/scenario/popular", kovaaks_scenarios),
+        web.post("/graphql", aimlabs_graphql),
+        web.get("/api/v1/kovaaks/benchmarks/kovaaks_s5",
+                voltaic_kovaaks_benchmark),
+        web.get("/api/v1/aimlabs/benchmarks/valorant_s1",
+                voltaic_aimlabs_benchmark),
+        web.get("/_stand_in/stats", stats),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8321)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dormant-ratio", type=float, default=0.7)
+    parser.add_argument("--latency", type=int, nargs=2, default=(20, 120),
+                        metavar=("MIN_MS", "MAX_MS"))
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed-db", default=None,
+                        help="Insert the synthetic users as linked profiles "
+                             "into this sqlite database before serving")
+    args = parser.parse_args()
+
+    population = SyntheticPopulation(args.users, seed=args.seed,
+                                     dormant_ratio=args.dormant_ratio)
+    if args.seed_db:
+        asyncio.run(seed_database(args.seed_db, population))
+        print(f"Seeded {args.users} synthetic users into {args.seed_db}")
+    profiles = default_fault_profiles(tuple(args.latency), args.error_rate,
+                                      args.throttle_rate)
+    app = create_app(population, profiles, seed=args.seed)
+    print(f"Stand-in APIs serving {args.users} users on "
+          f"http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
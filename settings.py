@@ -8,8 +8,28 @@ load_dotenv()
 
 DISCORD_API_SECRET = os.getenv("DISCORD_TOKEN")
 VALO_API_KEY = os.getenv("VALO_API_KEY")
+# Comma separated pool of Henrik keys, each with its own rate limit budget.
+# Falls back to the single VALO_API_KEY.
+VALO_API_KEYS = [key.strip() for key in
+                 os.getenv("VALO_API_KEYS", VALO_API_KEY or "").split(",")
+                 if key.strip()]
 LEADERBOARD_CHANNEL_ID = int(os.getenv("LEADERBOARD_CHANNEL_ID"))
 
+# Upstream base URLs. Override these (e.g. in .env) to point the API modules
+# at the local stand-in servers in services/stand_in.
+HENRIK_API_BASE_URL = os.getenv("HENRIK_API_BASE_URL",
+                                "https://api.henrikdev.xyz")
+KOVAAKS_API_BASE_URL = os.getenv("KOVAAKS_API_BASE_URL",
+                                 "https://kovaaks.com")
+AIMLABS_API_BASE_URL = os.getenv("AIMLABS_API_BASE_URL",
+                                 "https://api.aimlab.gg")
+VOLTAIC_API_BASE_URL = os.getenv("VOLTAIC_API_BASE_URL",
+                                 "https://beta.voltaic.gg")
+
+# When set, the first few raw API responses per endpoint are saved here for
+# benchmarks/json_codec.py
+API_PAYLOAD_RECORD_DIR = os.getenv("API_PAYLOAD_RECORD_DIR")
+
 GUILD_ID = 1333243573440741458
 BASE_DIR = pathlib.Path(__file__).parent
 
@@ -45,7 +65,9 @@ LEADERBOARD_TYPES = {
     "dojo_aimlabs_playlist_balanced": ["Balanced Dojo Aimlabs Playlist",
                                        "Balanced Dojo Aimlabs Playlist"],
     "dojo_aimlabs_playlist_advanced": ["Advanced Dojo Aimlabs Playlist",
-                                       "Advanced Dojo Aimlabs Playlist"]
+                                       "Advanced Dojo Aimlabs Playlist"],
+    "valorant_dm_performance_leaderboard": ["Valorant DM Performance",
+                                            "Average DM score leaderboard"]
 }
 
 VERIFIED_USERS = [123229985791016961, 363658627950706698, 1266397087701139539]
@@ -71,6 +93,111 @@ API_HEADER_FIELDS = {
     },
 }
 
+# Concurrent per-profile requests allowed against each upstream while a
+# leaderboard refreshes, and how many rows are written per commit
+WORKER_CONCURRENCY = {
+    "val": 10,
+    "kovaaks": 8,
+    "aimlabs": 4,
+}
+LEADERBOARD_WRITE_BATCH_SIZE = 50
+
+# Seconds the shared aimlabs score snapshot is reused by the task-based
+# leaderboards (S1 and the dojo playlists). Shorter than the refresh loop so
+# each cycle, and each session-end refresh, fetches once.
+AIMLABS_SCORES_MAX_AGE = 60
+
+# Aimlabs users per plays_agg query (run WORKER_CONCURRENCY["aimlabs"] at a
+# time) and how often a failed chunk is retried before its users are skipped
+AIMLABS_PLAYS_CHUNK_SIZE = 100
+AIMLABS_PLAYS_CHUNK_RETRIES = 2
+# Aimlabs plays are ingested incrementally from each user's last successful
+# ingestion, reaching this far back for plays the upstream records late
+AIMLABS_INGEST_OVERLAP_MINUTES = 10
+# Stored aimlabs usernames are revalidated this often, this many per request
+AIMLABS_PROFILE_REVALIDATE_HOURS = 24
+AIMLABS_PROFILE_BATCH_SIZE = 50
+# Send aimlabs GraphQL operations as automatic persisted queries (hash
+# first, full document only when the server doesn't know it yet). Off by
+# default since the aimlabs endpoint isn't known to support them, and turned
+# off for the session automatically if the server rejects them.
+AIMLABS_PERSISTED_QUERIES = os.getenv("AIMLABS_PERSISTED_QUERIES",
+                                      "0") == "1"
+# Global aimlabs leaderboards of the tracked tasks are resampled this often
+# to place members' scores globally, probing at most this deep
+AIMLABS_GLOBAL_REFRESH_HOURS = 24 * 7
+AIMLABS_GLOBAL_MAX_RANK = 2 ** 22
+
+# Keepalive connections opened per upstream host when the API modules load,
+# and how long idle connections are kept in the pool (seconds)
+PREWARM_CONNECTIONS = 4
+CONNECTION_KEEPALIVE = 300
+
+# Hours after which a valorant MMR is refetched even if the match pass saw no
+# new competitive match (catches decay and season resets)
+MMR_FORCED_REFRESH_HOURS = 24
+
+# Bounds of the per-profile polling interval (minutes). Profiles with no
+# change double their interval each poll, any change resets it to the
+# minimum. Polls due within the slack are run a cycle early.
+POLL_INTERVAL_MINUTES = (10, 320)
+POLL_DUE_SLACK_MINUTES = 2
+
+# Queue ids counted on the DM leaderboard. Team deathmatch is reported as
+# "hurm" by Riot and as "teamdeathmatch" by some Henrik versions.
+VALORANT_DM_QUEUES = {"deathmatch", "teamdeathmatch", "hurm"}
+# Queue id of the matches that move a player's rank
+VALORANT_COMPETITIVE_QUEUE = "competitive"
+# Most match pages read per profile and DM update, caps the cost of a
+# profile whose cursor was lost
+VALORANT_MATCH_MAX_PAGES = 5
+# Queue ranked on the DM performance leaderboard. Team deathmatch scores
+# are on another scale, so only free-for-all deathmatches count.
+VALORANT_DM_PERFORMANCE_QUEUE = "deathmatch"
+# DMs needed in a week to appear on the DM performance leaderboard
+VALORANT_DM_PERFORMANCE_MIN_MATCHES = 5
+
+# Leaderboards refreshed for a linked member shortly after they stop playing
+# a game, keyed by a lowercase substring of the game's activity name. The
+# delay lets the upstream APIs ingest the last match first (seconds). The
+# dojo playlists are normalised against every player and are left to the
+# regular cycle.
+PRESENCE_REFRESH_GAMES = {
+    "valorant": ["valorant_rank_leaderboard", "valorant_dm_leaderboard",
+                 "valorant_dm_performance_leaderboard"],
+    "aim lab": ["voltaic_S1_valorant_benchmarks_leaderboard"],
+    "kovaak": ["voltaic_S5_benchmarks_leaderboard"],
+}
+PRESENCE_REFRESH_DELAY = 180
+
+# Seconds a username lookup is answered from memory. Resolved accounts are
+# kept for a day (renames are rare), unknown usernames only briefly so a
+# freshly created account can be linked soon after.
+RESOLUTION_CACHE_TTL = 24 * 60 * 60
+RESOLUTION_CACHE_NEGATIVE_TTL = 10 * 60
+RESOLUTION_CACHE_MAX_ENTRIES = 10000
+
+# Dojo playlist scores are normalized between these quantiles of the
+# members' scores on each task instead of the raw min and max. Quantiles come
+# from KLL sketches of this size, exact below QUANTILE_SKETCH_K scores.
+# The sketches are rebuilt each cycle from the members' bests, which stay in
+# memory (members x tasks), so they only bound what normalization reads, not
+# the memory of the aimlabs refresh.
+DOJO_NORMALIZATION_QUANTILES = (0.02, 0.98)
+QUANTILE_SKETCH_K = 200
+
+# Hours between downloads of the Voltaic benchmark configs, and minutes
+# before retrying a failed or invalid download
+BENCHMARK_CONFIG_REFRESH_HOURS = 24
+BENCHMARK_CONFIG_RETRY_MINUTES = 15
+
+# The KovaaK's scenario catalogue behind scenario name autocomplete is
+# downloaded every this many hours, the most popular scenarios first, in
+# pages of this size up to this many pages
+SCENARIO_CATALOGUE_REFRESH_HOURS = 24
+SCENARIO_CATALOGUE_PAGE_SIZE = 100
+SCENARIO_CATALOGUE_MAX_PAGES = 200
+
 DOJO_AIMLABS_PLAYLIST_BALANCED = [
     "CsLevel.VT Lowgravity56.VT Refle.SXBIE3",
     "CsLevel.VT Lowgravity56.VT Peeks.SXBIMN",
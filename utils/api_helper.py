@@ -1,16 +1,17 @@
-from datetime import datetime, timezone
 import asyncio, aiofiles
 import time, os
 from functools import wraps
 
 import aiohttp
 
-from settings import API_HEADER_FIELDS
+from settings import (API_HEADER_FIELDS, API_PAYLOAD_RECORD_DIR,
+                      PREWARM_CONNECTIONS)
 from utils.log import api_logger, logger
 from utils.errors import ErrorFetchingData, UnableToDecodeJson
-import json
-from collections import deque
-FILE_LOCK = asyncio.Lock()
+from utils import json_codec
+from collections import deque, Counter
+RECORDED_PAYLOADS_PER_ENDPOINT = 5
+recorded_payloads = Counter()
 
 
 class AsyncRateLimiter:
@@ -104,6 +105,11 @@ class UpdatedAsyncRateLimiter:
         self.consecutive_429s = 0
         self.last_429_time = 0
 
+        # Calls waiting for clearance and the budget last reported upstream
+        self.pending = 0
+        self.server_remaining = None
+        self.server_reset_at = 0
+
         # API-specific settings
         self.has_rate_limit = api_type != "kovaaks"
         if self.has_rate_limit:
@@ -113,34 +119,53 @@ class UpdatedAsyncRateLimiter:
     def __call__(self, func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if not self.has_rate_limit:
-                # No rate limiting for APIs like kovaaks
-                return await self._execute_call(func, *args, **kwargs)
+            return await self.call(func, *args, **kwargs)
+
+        return wrapper
 
-            # Wait for rate limit clearance
+    async def call(self, func, *args, **kwargs):
+        if not self.has_rate_limit:
+            # No rate limiting for APIs like kovaaks
+            return await self._execute_call(func, *args, **kwargs)
+
+        # Wait for rate limit clearance
+        self.pending += 1
+        try:
             await self._wait_for_rate_limit()
+        finally:
+            self.pending -= 1
+
+        # Execute with retry logic
+        max_retries = 3
+        base_delay = 1.0
 
-            # Execute with retry logic
-            max_retries = 3
-            base_delay = 1.0
-
-            for attempt in range(max_retries + 1):
-                try:
-                    return await self._execute_call(func, *args, **kwargs)
-                except Exception as e:
-                    if self._is_rate_limit_error(e):
-                        if attempt == max_retries:
-                            raise
-
-                        # Handle 429 with exponential backoff
-                        await self._handle_429_error()
-                        delay = base_delay * (2 ** attempt)
-                        await asyncio.sleep(delay)
-                        continue
-                    else:
+        for attempt in range(max_retries + 1):
+            try:
+                return await self._execute_call(func, *args, **kwargs)
+            except Exception as e:
+                if self._is_rate_limit_error(e):
+                    if attempt == max_retries:
                         raise
 
-        return wrapper
+                    # Handle 429 with exponential backoff
+                    await self._handle_429_error()
+                    delay = base_delay * (2 ** attempt)
+                    await asyncio.sleep(delay)
+                    continue
+                else:
+                    raise
+
+    def remaining_budget(self) -> int:
+        """Calls this limiter can still make in the current window, counting
+        calls already queued on it. Uses the upstream's own count when it
+        reported a lower one for the current window."""
+        current_time = time.time()
+        self._clean_call_history(current_time)
+        budget = self.max_calls - len(self.call_history) - self.pending
+        if (self.server_remaining is not None and
+                current_time < self.server_reset_at):
+            budget = min(budget, self.server_remaining - self.pending)
+        return budget
 
     async def _wait_for_rate_limit(self):
         async with self.lock:
@@ -224,6 +249,8 @@ class UpdatedAsyncRateLimiter:
 
             if remaining is not None and reset_time is not None:
                 reset_seconds = float(reset_time)
+                self.server_remaining = remaining
+                self.server_reset_at = time.time() + reset_seconds
                 api_logger.info(f"Called {self.api_type}.{func.__name__} ({runtime:.2f}s): "
                                 f"{remaining} calls remaining, reset time is {reset_seconds}")
 
@@ -273,19 +300,51 @@ class UpdatedAsyncRateLimiter:
             }
 
 
-async def update_benchmark_scenario_list(url: str, path: str, session):
-    """Gets S5 benchmark scenario list """
-    now = datetime.now(timezone.utc).timestamp()
-    if os.path.exists(path):
-        if now - os.path.getmtime(path) < 86400:
-            return None, None
+class ApiKeyPool:
+    """Spreads calls over several API keys, each with its own
+    UpdatedAsyncRateLimiter. Every call goes to the key with the most
+    remaining budget and the decorated function receives it as `api_key`,
+    so throughput grows linearly with the number of keys. Without keys,
+    every call raises ErrorFetchingData."""
+    def __init__(self, api_type, keys: list[str]):
+        if not keys:
+            logger.error(f"No API keys configured for {api_type}")
+        self.api_type = api_type
+        self.limiters = {key: UpdatedAsyncRateLimiter(api_type)
+                         for key in keys}
+
+    def __call__(self, func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self.limiters:
+                raise ErrorFetchingData(f"No API keys configured for "
+                                        f"{self.api_type}")
+            key = self.select_key()
+            return await self.limiters[key].call(func, *args, api_key=key,
+                                                 **kwargs)
+
+        return wrapper
+
+    def select_key(self) -> str:
+        return max(self.limiters,
+                   key=lambda key: self.limiters[key].remaining_budget())
+
+    async def get_rate_limit_status(self):
+        """Get current rate limit status of every key for monitoring"""
+        return [await limiter.get_rate_limit_status()
+                for limiter in self.limiters.values()]
+
+
+async def fetch_benchmark_config(url: str, session):
+    """Gets a Voltaic benchmark's scenario list and returns it in the stored
+    config layout, along with the response headers"""
     try:
         async with session.get(
                 url=url
         ) as response:
             response.raise_for_status()
             headers = response.headers
-            config = await response.json()
+            config = await get_json(response, "benchmark_config")
             categories = [
                 {
                     "id": category["id"],
@@ -317,27 +376,133 @@ async def update_benchmark_scenario_list(url: str, path: str, session):
                 "intermediate_scenarios": intermediate_scenarios,
                 "advanced_scenarios": advanced_scenarios
             }
-            async with FILE_LOCK:
-                async with aiofiles.open(
-                        path, "w",
-                        encoding="utf-8"
-                ) as f:
-                    await f.write(json.dumps(final_json,
-                                             ensure_ascii=False, indent=4))
-            return config, headers
+            return final_json, headers
     except Exception as e:
         raise ErrorFetchingData(f"Error while fetching scenario "
                                 f"list for S5 benchmarks "
                                 f"\n\nStatus code: {response.status}. {str(e)}")
 
 
-async def get_json(response: aiohttp.ClientResponse):
+def create_trace_config() -> aiohttp.TraceConfig:
+    """Trace hooks that fill in DNS, connect (TCP + TLS) and total timings
+    for requests made with a dict as trace_request_ctx"""
+    trace_config = aiohttp.TraceConfig()
+
+    def timings(ctx):
+        return ctx.trace_request_ctx \
+            if isinstance(ctx.trace_request_ctx, dict) else None
+
+    async def on_request_start(session, ctx, params):
+        ctx.start = asyncio.get_running_loop().time()
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.dns_start = asyncio.get_running_loop().time()
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        if timings(ctx) is not None:
+            timings(ctx)["dns"] = \
+                asyncio.get_running_loop().time() - ctx.dns_start
+
+    async def on_dns_cache_hit(session, ctx, params):
+        if timings(ctx) is not None:
+            timings(ctx)["dns"] = 0.0
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.connect_start = asyncio.get_running_loop().time()
+
+    async def on_connection_create_end(session, ctx, params):
+        if timings(ctx) is not None:
+            timings(ctx)["connect"] = \
+                asyncio.get_running_loop().time() - ctx.connect_start
+
+    async def on_request_end(session, ctx, params):
+        if timings(ctx) is not None:
+            timings(ctx)["total"] = \
+                asyncio.get_running_loop().time() - ctx.start
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+
+async def prewarm_connections(session: aiohttp.ClientSession,
+                              base_urls: list[str], api_type: str,
+                              count: int = PREWARM_CONNECTIONS) -> dict:
+    """Resolves DNS and opens `count` keepalive connections to every base
+    URL so the first refresh cycle doesn't pay for handshakes. Any response
+    status is fine, only the pooled connection matters. Logs and returns
+    the handshake timings per URL.
+
+    :param session: Session whose connection pool gets warmed, created with
+        create_trace_config() for timings to be reported
+    :param list[str] base_urls: Upstream base URLs
+    :param str api_type: Name used in the log lines
+    :param int count: Connections to open per URL
+    """
+    async def open_connection(url):
+        timings = {}
+        try:
+            async with session.head(
+                    url, allow_redirects=False, trace_request_ctx=timings,
+                    timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                await response.read()
+        except Exception as e:
+            api_logger.warning(f"Failed to prewarm {api_type} connection to "
+                               f"{url}: {e.__class__.__name__}: {e}")
+            return None
+        return timings
+
+    report = {}
+    for url in base_urls:
+        results = await asyncio.gather(*[open_connection(url)
+                                         for _ in range(count)])
+        results = [timings for timings in results if timings]
+        if not results:
+            continue
+        report[url] = results
+        summary = ", ".join(
+            f"{field} {max(timings.get(field, 0) for timings in results) * 1000:.0f} ms"
+            for field in ("dns", "connect", "total"))
+        api_logger.info(f"Prewarmed {len(results)} {api_type} connections to "
+                        f"{url} (slowest {summary})")
+    return report
+
+
+async def get_json(response: aiohttp.ClientResponse, record_as: str = None):
+    """Reads and decodes a JSON response body with the configured codec.
+
+    :param response: aiohttp response
+    :param str record_as: Payload name used when API_PAYLOAD_RECORD_DIR is
+        set, e.g. "plays_agg"
+    """
     try:
-        data = await response.json()
+        body = await response.read()
+        if API_PAYLOAD_RECORD_DIR and record_as:
+            await record_payload(record_as, body)
+        data = json_codec.loads(body)
         return data
     except Exception as e:
         raise UnableToDecodeJson(" ")
 
 
+async def record_payload(name: str, body: bytes):
+    """Saves the first few raw response bodies of each payload type under
+    API_PAYLOAD_RECORD_DIR for benchmarks/json_codec.py"""
+    if recorded_payloads[name] >= RECORDED_PAYLOADS_PER_ENDPOINT:
+        return
+    recorded_payloads[name] += 1
+    os.makedirs(API_PAYLOAD_RECORD_DIR, exist_ok=True)
+    path = os.path.join(API_PAYLOAD_RECORD_DIR,
+                        f"{name}-{recorded_payloads[name]}.json")
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(body)
+
+
 async def setup(bot): pass
 async def teardown(bot): pass
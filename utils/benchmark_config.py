@@ -0,0 +1,209 @@
+import aiohttp, aiofiles, asyncio
+import hashlib, json, os, time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Mapping
+
+from settings import (S5_VOLTAIC_BENCHMARKS_CONFIG,
+                      S1_VOLTAIC_VAL_BENCHMARKS_CONFIG, VOLTAIC_API_BASE_URL,
+                      CONNECTION_KEEPALIVE, BENCHMARK_CONFIG_REFRESH_HOURS,
+                      BENCHMARK_CONFIG_RETRY_MINUTES)
+from utils.api_helper import fetch_benchmark_config, create_trace_config
+from utils.energy_calculation import BenchmarkModel
+from utils.errors import ErrorFetchingData, InvalidBenchmarkConfig
+from utils.log import logger, api_logger
+from utils import json_codec
+
+TIER_KEYS = ("novice_scenarios", "intermediate_scenarios",
+             "advanced_scenarios")
+
+benchmark_config_session: aiohttp.ClientSession | None = None
+refresh_tasks: list[asyncio.Task] = []
+
+
+def freeze(value):
+    """Read-only copy of decoded JSON, dicts become mappingproxies and lists
+    tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item)
+                                 for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def validate_benchmark_config(config: dict) -> None:
+    """Raises InvalidBenchmarkConfig unless the config can be scored with:
+    ascending tier energies, and every scenario of a tier has one ascending
+    threshold per rank and belongs to a known subcategory"""
+    try:
+        subcategory_ids = {subcategory["id"]
+                           for category in config["categories"]
+                           for subcategory in category["subcategories"]}
+        tiers = config["tier_energies"]
+        if len(tiers) != len(TIER_KEYS) or not all(tiers):
+            raise InvalidBenchmarkConfig(f"Expected {len(TIER_KEYS)} "
+                                         f"non-empty tiers")
+        energies = [energy for tier in tiers for energy in tier]
+        if energies != sorted(set(energies)):
+            raise InvalidBenchmarkConfig("Tier energies aren't ascending")
+        for tier, tier_key in zip(tiers, TIER_KEYS):
+            if not config[tier_key]:
+                raise InvalidBenchmarkConfig(f"No {tier_key}")
+            for scenario in config[tier_key]:
+                thresholds = scenario["thresholds"]
+                if len(thresholds) != len(tier) or \
+                        list(thresholds) != sorted(thresholds):
+                    raise InvalidBenchmarkConfig(
+                        f"Invalid thresholds {thresholds} in {tier_key}")
+                if scenario["subcategoryId"] not in subcategory_ids:
+                    raise InvalidBenchmarkConfig(
+                        f"Unknown subcategory {scenario['subcategoryId']} "
+                        f"in {tier_key}")
+    except (KeyError, TypeError) as e:
+        raise InvalidBenchmarkConfig(f"Malformed config: "
+                                     f"{e.__class__.__name__} {str(e)}")
+
+
+@dataclass(frozen=True)
+class BenchmarkConfig:
+    """Immutable snapshot of a benchmark config. Index it like the stored
+    JSON, e.g. config['tier_energies'], or score with its compiled model."""
+    name: str
+    # Incremented whenever the content changes
+    version: int
+    digest: str
+    data: Mapping
+    model: BenchmarkModel
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+
+class BenchmarkConfigService:
+    """Keeps the current config of one Voltaic benchmark in memory.
+
+    The stored file is loaded once, then refreshed from the Voltaic API every
+    BENCHMARK_CONFIG_REFRESH_HOURS in the background. A download is validated
+    before it replaces the current snapshot, which happens in a single
+    assignment, so readers see either the old or the new config and never
+    wait on the network or the filesystem. Subscribers are called with the
+    new snapshot whenever its content changes.
+    """
+    def __init__(self, name: str, url: str, path):
+        self.name = name
+        self.url = url
+        self.path = path
+        self.config: BenchmarkConfig | None = None
+        # Wall time of the last successful download (file mtime on load)
+        self.refreshed_at = 0.0
+        self.subscribers: list[Callable[[BenchmarkConfig], None]] = []
+
+    def current(self) -> BenchmarkConfig:
+        if self.config is None:
+            raise ErrorFetchingData(f"The {self.name} benchmark config "
+                                    f"isn't loaded yet")
+        return self.config
+
+    def subscribe(self, callback: Callable[[BenchmarkConfig], None]) -> None:
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def swap(self, data: dict) -> bool:
+        """Validates a config and makes it current. Returns whether its
+        content changed."""
+        validate_benchmark_config(data)
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True)
+                              .encode()).hexdigest()
+        if self.config is not None and self.config.digest == digest:
+            return False
+        version = self.config.version + 1 if self.config else 1
+        data = freeze(data)
+        model = BenchmarkModel(data["tier_energies"],
+                               [data[tier_key] for tier_key in TIER_KEYS],
+                               data["categories"])
+        self.config = BenchmarkConfig(self.name, version, digest, data, model)
+        logger.info(f"{self.name} benchmark config is now version {version} "
+                    f"({digest[:8]})")
+        for callback in self.subscribers:
+            try:
+                callback(self.config)
+            except Exception as e:
+                logger.error(f"{self.name} benchmark config subscriber "
+                             f"{callback} failed: {str(e)}")
+        return True
+
+    async def load(self) -> None:
+        """Loads the stored config, if there is a valid one"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            async with aiofiles.open(self.path, encoding="utf-8") as f:
+                self.swap(json_codec.loads(await f.read()))
+            self.refreshed_at = os.path.getmtime(self.path)
+        except Exception as e:
+            logger.warning(f"Ignoring stored {self.name} benchmark config: "
+                           f"{str(e)}")
+
+    async def refresh(self, session: aiohttp.ClientSession) -> None:
+        """Downloads, validates and stores the config"""
+        data, _ = await fetch_benchmark_config(self.url, session)
+        self.swap(data)
+        # Written next to the config and renamed over it, so a crash mid
+        # write can't leave a truncated file
+        temp_path = f"{self.path}.tmp"
+        async with aiofiles.open(temp_path, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(data, ensure_ascii=False, indent=4))
+        os.replace(temp_path, self.path)
+        self.refreshed_at = time.time()
+
+    async def run(self, session: aiohttp.ClientSession) -> None:
+        while True:
+            due_in = self.refreshed_at + \
+                BENCHMARK_CONFIG_REFRESH_HOURS * 3600 - time.time()
+            await asyncio.sleep(max(0.0, due_in))
+            try:
+                await self.refresh(session)
+            except Exception as e:
+                logger.error(f"Failed to refresh {self.name} benchmark "
+                             f"config: {str(e)}")
+                await asyncio.sleep(BENCHMARK_CONFIG_RETRY_MINUTES * 60)
+
+
+s5_config = BenchmarkConfigService(
+    "S5", f"{VOLTAIC_API_BASE_URL}/api/v1/kovaaks/benchmarks/kovaaks_s5",
+    S5_VOLTAIC_BENCHMARKS_CONFIG)
+s1_config = BenchmarkConfigService(
+    "S1", f"{VOLTAIC_API_BASE_URL}/api/v1/aimlabs/benchmarks/valorant_s1",
+    S1_VOLTAIC_VAL_BENCHMARKS_CONFIG)
+benchmark_configs = [s5_config, s1_config]
+
+
+async def setup(bot):
+    global benchmark_config_session
+    benchmark_config_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=10, keepalive_timeout=CONNECTION_KEEPALIVE),
+        trace_configs=[create_trace_config()]
+    )
+    api_logger.info("Connection established to voltaic API")
+    for service in benchmark_configs:
+        await service.load()
+        # Without a stored config, wait for the first download
+        if service.config is None:
+            try:
+                await service.refresh(benchmark_config_session)
+            except Exception as e:
+                logger.error(f"Failed to fetch {service.name} benchmark "
+                             f"config: {str(e)}")
+        refresh_tasks.append(asyncio.create_task(
+            service.run(benchmark_config_session)))
+
+
+async def teardown(bot):
+    for task in refresh_tasks:
+        task.cancel()
+    refresh_tasks.clear()
+    if benchmark_config_session and not benchmark_config_session.closed:
+        api_logger.info("Connection closed to voltaic API")
+        await benchmark_config_session.close()
@@ -2,18 +2,19 @@ from asyncio import timeout
 
 from settings import DB_PATH
 import aiosqlite
-import uuid, aiofiles, json
+import uuid, aiofiles
 from utils.log import log_transaction
+from utils import json_codec
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
 
-from settings import (S5_VOLTAIC_BENCHMARKS_CONFIG,
-                      S5_VOLTAIC_RANKS,
+from settings import (S5_VOLTAIC_RANKS,
                       S5_VOLTAIC_RANKS_COMPLETE,
-                      S1_VOLTAIC_VAL_BENCHMARKS_CONFIG,
                       S1_VAL_VOLTAIC_RANKS,
                       S1_VAL_VOLTAIC_RANKS_COMPLETE)
-from utils.energy_calculation import tier_energy
+from utils.benchmark_config import s1_config, s5_config
+from utils import energy_batch
+from utils.weekly_window import week_window
 
 
 def get_datetime(datetime_str: str):
@@ -130,13 +131,17 @@ async def get_date_updated(discord_id: int, table_name: str):
     return get_datetime(data[0][0]) if data else None
 
 
-async def get_valorant_profiles():
+async def get_valorant_profiles(discord_ids: list[int] | None = None):
     sql_statement = """
         SELECT discord_id, discord_username, valorant_id, valorant_username, 
         valorant_tag, region FROM valorant_profiles WHERE is_active = 1
         """
-
-    data = await execute_fetch(sql_statement, tuple(),
+    values = tuple()
+    if discord_ids is not None:
+        sql_statement += (f"AND discord_id IN "
+                          f"({', '.join('?' for _ in discord_ids)})")
+        values = tuple(discord_ids)
+    data = await execute_fetch(sql_statement, values,
                                "valorant_profiles")
     return data
 
@@ -172,73 +177,60 @@ async def update_leaderboard_message_state(message_id: int):
                          table_name="leaderboard_message", operation="UPSERT")
 
 
-async def get_kovaaks_profiles():
+async def get_kovaaks_profiles(discord_ids: list[int] | None = None):
     sql_statement = """
         SELECT discord_id, discord_username, kovaaks_id, kovaaks_username, 
         steam_id, steam_username FROM kovaaks_profiles WHERE is_active = 1
         """
-    data = await execute_fetch(sql_statement, tuple(),
+    values = tuple()
+    if discord_ids is not None:
+        sql_statement += (f"AND discord_id IN "
+                          f"({', '.join('?' for _ in discord_ids)})")
+        values = tuple(discord_ids)
+    data = await execute_fetch(sql_statement, values,
                                "kovaaks_profiles")
     return data
 
 
-async def get_aimlabs_profiles():
+async def get_aimlabs_profiles(discord_ids: list[int] | None = None):
     sql_statement = """
         SELECT discord_id, discord_username, aimlabs_id, aimlabs_username
         FROM aimlabs_profiles WHERE is_active = 1
         """
-    data = await execute_fetch(sql_statement, tuple(),
+    values = tuple()
+    if discord_ids is not None:
+        sql_statement += (f"AND discord_id IN "
+                          f"({', '.join('?' for _ in discord_ids)})")
+        values = tuple(discord_ids)
+    data = await execute_fetch(sql_statement, values,
                                "aimlabs_profiles")
     return data
 
 
-async def add_scores_to_config(config, scores):
-    for scenario, score in zip(config, scores):
-        scenario["score"] = score
-    return config
+def get_benchmark(bench_type: str) -> tuple:
+    """Returns (current config, ranks, ranks when complete) of a benchmark"""
+    if bench_type == "val":
+        return (s1_config.current(), S1_VAL_VOLTAIC_RANKS,
+                S1_VAL_VOLTAIC_RANKS_COMPLETE)
+    return s5_config.current(), S5_VOLTAIC_RANKS, S5_VOLTAIC_RANKS_COMPLETE
 
 
 async def calculate_energy(novice, intermediate, advanced, bench_type: str):
-    if bench_type == "val":
-        path = S1_VOLTAIC_VAL_BENCHMARKS_CONFIG
-        ranks_complete = S1_VAL_VOLTAIC_RANKS_COMPLETE
-        ranks = S1_VAL_VOLTAIC_RANKS
-    else:
-        path = S5_VOLTAIC_BENCHMARKS_CONFIG
-        ranks_complete = S5_VOLTAIC_RANKS_COMPLETE
-        ranks = S5_VOLTAIC_RANKS
-    async with aiofiles.open(
-            path, "r", encoding="utf-8"
-    ) as f:
-        content = await f.read()
-        config = json.loads(content)
-    novice_scores = await add_scores_to_config(
-        config['novice_scenarios'],novice
-    )
-    intermediate_scores = await add_scores_to_config(
-        config['intermediate_scenarios'], intermediate
-    )
-    advanced_scores = await add_scores_to_config(
-        config['advanced_scenarios'], advanced
-    )
-    tiers = config['tier_energies']
-    categories = config['categories']
-    novice_energy, novice_energy_list = tier_energy(tiers,
-                                                    0,
-                                                    novice_scores,
-                                                    categories)
-    intermediate_energy, intermediate_energy_list = tier_energy(tiers,
-                                                                1,
-                                                                intermediate_scores,
-                                                                categories)
-    advanced_energy, advanced_energy_list = tier_energy(tiers,
-                                                        2,
-                                                        advanced_scores,
-                                                        categories)
-    energies = [novice_energy, intermediate_energy, advanced_energy]
-    energy_list = [novice_energy_list, intermediate_energy_list,
-                   advanced_energy_list]
-    energy = max(energies)
+    """Returns (rank name, rank id, energy) of the tier with the highest
+    energy. Tiers whose scores are None weren't fetched and are left out,
+    see tier_energy_ceiling() for when that can't change the result."""
+    config, ranks, ranks_complete = get_benchmark(bench_type)
+    energies = []
+    energy_list = []
+    for tier_index, scores in enumerate((novice, intermediate, advanced)):
+        if scores is None:
+            energies.append(None)
+            energy_list.append(None)
+            continue
+        tier_total, tier_list = config.model.tier_energy(tier_index, scores)
+        energies.append(tier_total)
+        energy_list.append(tier_list)
+    energy = max(e for e in energies if e is not None)
     max_index = energies.index(energy)
     rounded_energy = min(((energy // 100) * 100), 1200)
     complete = True if all(score >= rounded_energy
@@ -250,13 +242,30 @@ async def calculate_energy(novice, intermediate, advanced, bench_type: str):
             ranks[rounded_energy]['id'], energy)
 
 
+async def calculate_energies(novice: list, intermediate: list,
+                             advanced: list, bench_type: str) -> list[tuple]:
+    """calculate_energy() of many users at once, evaluated by the batch
+    engine. Each tier's scores are a matrix with a full row per user.
+
+    :param list novice: Novice score rows
+    :param list intermediate: Intermediate score rows
+    :param list advanced: Advanced score rows
+    :param str bench_type: "val" or "voltaic"
+    :return: list[tuple] of (rank name, rank id, energy) per user
+    """
+    config, ranks, ranks_complete = get_benchmark(bench_type)
+    results = []
+    for energy, complete in energy_batch.evaluate(
+            config.model, [novice, intermediate, advanced]):
+        rounded_energy = min(((energy // 100) * 100), 1200)
+        rank = (ranks_complete if complete else ranks)[rounded_energy]
+        results.append((rank['name'], rank['id'], energy))
+    return results
+
+
 def get_last_monday_12am_est() -> datetime:
-    now_utc = datetime.now(timezone.utc)
-    now_est = now_utc.astimezone(ZoneInfo("America/New_York"))
-    days_since_monday = now_est.weekday()  # Monday is 0
-    last_monday = now_est - timedelta(days=days_since_monday)
-    last_monday = last_monday.replace(hour=0, minute=0, second=0, microsecond=0)
-    return last_monday.astimezone(timezone.utc)
+    _, week_start, _ = week_window.current()
+    return week_start
 
 
 def calculate_dojo_playlist_score(scores, all_task_ids, max_min_scores):
@@ -0,0 +1,151 @@
+import sys
+from functools import lru_cache
+
+from utils.energy_calculation import BenchmarkModel, CompiledTier
+from utils.log import logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Engine in use, numpy when it is installed and the compiled model otherwise
+BACKEND = "numpy" if np else "python"
+
+
+def float_sum(columns: list):
+    """Adds arrays elementwise in the order and with the rounding of the
+    builtin sum() over floats, which compensates (Neumaier) from Python 3.12
+    on, so results match the scalar functions bit for bit"""
+    total = np.zeros_like(columns[0])
+    if sys.version_info < (3, 12):
+        for column in columns:
+            total = total + column
+        return total
+    compensation = np.zeros_like(total)
+    for column in columns:
+        partial = total + column
+        compensation = compensation + np.where(
+            np.abs(total) >= np.abs(column),
+            (total - partial) + column,
+            (column - partial) + total)
+        total = partial
+    return np.where((compensation != 0) & np.isfinite(compensation),
+                    total + compensation, total)
+
+
+def harmonic_mean(columns: list):
+    """harmonic_mean() of each row of the columns, NaN unless every value
+    of the row is positive"""
+    positive = np.logical_and.reduce([column > 0 for column in columns])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total = float_sum([1 / column for column in columns])
+        return np.where(positive, len(columns) / total, np.nan)
+
+
+class BatchTier:
+    """A CompiledTier as arrays, evaluating a users x scenarios score matrix
+    at once"""
+    def __init__(self, tier: CompiledTier):
+        self.tier = tier
+        self.thresholds = np.array(tier.thresholds, dtype=np.float64)
+        self.threshold_differences = np.array(tier.threshold_differences,
+                                              dtype=np.float64)
+        self.rank_energies = np.array(tier.rank_energies, dtype=np.float64)
+        self.rank_energy_differences = np.array(tier.rank_energy_differences,
+                                                dtype=np.float64)
+        # Scenarios counted by tier_energy(), i.e. in some subcategory
+        self.counted = sorted({position for positions in tier.subcategories
+                               for position in positions})
+
+    def scenario_energies(self, scores):
+        """uncapped_scenario_energy() of every user and scenario"""
+        reached = scores[:, :, None] >= self.thresholds[None, :, :]
+        # Last reached threshold. Like find_last_index() + list indexing,
+        # a score below every threshold gets the last one.
+        count = self.thresholds.shape[1]
+        index = count - 1 - np.argmax(reached[:, :, ::-1], axis=2)
+        scenarios = np.arange(scores.shape[1])[None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (
+                    self.rank_energies[index] +
+                    (scores - self.thresholds[scenarios, index]) /
+                    self.threshold_differences[scenarios, index] *
+                    self.rank_energy_differences[index]
+            )
+
+    def energies(self, scores) -> tuple:
+        """Returns (tier_energy() of every user, lowest counted scenario
+        energy of every user)"""
+        energies = self.scenario_energies(scores)
+        capped_values = []
+        uncapped_values = []
+        for positions in self.tier.subcategories:
+            if positions:
+                best = energies[:, list(positions)].max(axis=1)
+                capped_values.append(
+                    np.floor(np.minimum(self.tier.max_energy, best)))
+                uncapped_values.append(np.floor(best))
+            else:
+                capped_values.append(np.zeros(len(scores)))
+                uncapped_values.append(np.zeros(len(scores)))
+        capped = harmonic_mean(capped_values)
+        uncapped = harmonic_mean(uncapped_values)
+        tier_energies = np.where(
+            capped >= self.tier.top_energy,
+            np.where(np.isnan(uncapped), 0, np.floor(uncapped)),
+            np.where(np.isnan(capped), 0, np.floor(capped)))
+        if self.counted:
+            lowest = energies[:, self.counted].min(axis=1)
+        else:
+            lowest = np.full(len(scores), np.inf)
+        return tier_energies, lowest
+
+
+@lru_cache(maxsize=4)
+def batch_tiers(model: BenchmarkModel) -> tuple:
+    return tuple(BatchTier(tier) for tier in model.tiers)
+
+
+def evaluate(model: BenchmarkModel, tier_scores: list) -> list[tuple]:
+    """Returns (energy, complete) of every user, as calculate_energy()
+    derives them: the highest tier energy, and whether every counted
+    scenario of that tier reached the energy rounded down to its rank.
+
+    :param BenchmarkModel model: Compiled benchmark
+    :param list tier_scores: Per tier, a users x scenarios score matrix
+        (list of rows) in config order
+    :return: list[tuple]
+    """
+    if np is None:
+        results = []
+        for user_scores in zip(*tier_scores):
+            evaluated = [model.tier_energy(tier_index, scores)
+                         for tier_index, scores in enumerate(user_scores)]
+            energies = [energy for energy, _ in evaluated]
+            energy = max(energies)
+            rounded_energy = min(((energy // 100) * 100), 1200)
+            results.append((energy, all(
+                score >= rounded_energy
+                for score in evaluated[energies.index(energy)][1])))
+        return results
+    if not tier_scores or not len(tier_scores[0]):
+        return []
+    evaluated = [tier.energies(np.asarray(scores, dtype=np.float64))
+                 for tier, scores in zip(batch_tiers(model), tier_scores)]
+    energies = np.stack([energy for energy, _ in evaluated])
+    lowest = np.stack([lowest for _, lowest in evaluated])
+    # First tier with the highest energy, as energies.index(max(energies))
+    best_tiers = np.argmax(energies, axis=0)
+    users = np.arange(energies.shape[1])
+    best = energies[best_tiers, users].astype(np.int64)
+    rounded = np.minimum((best // 100) * 100, 1200)
+    complete = lowest[best_tiers, users] >= rounded
+    return list(zip(best.tolist(), complete.tolist()))
+
+
+async def setup(bot):
+    if np is None:
+        logger.warning("numpy isn't installed, benchmark energies are "
+                       "computed one profile at a time")
+async def teardown(bot): pass
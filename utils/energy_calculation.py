@@ -152,6 +152,20 @@ def subcategory_energy(
     }
 
 
+def tier_energy_ceiling(
+        tiers: List[TierEnergies],
+        current_tier_index: int
+) -> float:
+    """
+    Highest energy tier_energy() can return for a tier.
+    Subcategories of every tier but the last are capped just below the next
+    tier's first rank, and so is their harmonic mean. The last tier is uncapped.
+    """
+    if current_tier_index == len(tiers) - 1:
+        return math.inf
+    return tiers[current_tier_index + 1][0] - 1
+
+
 def harmonic_mean_of_subcategory_energies(
         subcategory_energies: List[SubcategoryEnergy],
         tiers: List[TierEnergies]
@@ -213,3 +227,105 @@ def tier_energy(
     # Calculate harmonics mean across all subcategories
     return (harmonic_mean_of_subcategory_energies(subcategory_energies, tiers),
             all_energies)
+
+
+def differences(values: List[float]) -> tuple:
+    """Gap from each value to the next, the last value repeats the previous
+    gap (as in uncapped_scenario_energy)"""
+    return tuple(
+        values[i] - values[i - 1] if i == len(values) - 1
+        else values[i + 1] - values[i]
+        for i in range(len(values))
+    )
+
+
+class CompiledTier:
+    """
+    One tier of a benchmark with everything tier_energy() derives from the
+    config precomputed: extended thresholds and rank energies as tuples, and
+    the scenario positions of each subcategory. Evaluating a score vector
+    gives the same results as tier_energy() on the scored config.
+    """
+    __slots__ = ("tier_index", "max_energy", "top_energy", "rank_energies",
+                 "rank_energy_differences", "thresholds",
+                 "threshold_differences", "subcategories")
+
+    def __init__(self, tiers: List[TierEnergies], tier_index: int,
+                 scenarios: List[Scenario], categories: List[Category]):
+        self.tier_index = tier_index
+        if tier_index == len(tiers) - 1:
+            self.max_energy = max(tiers[tier_index])
+        else:
+            self.max_energy = tiers[tier_index + 1][0] - 1
+        self.top_energy = max(tiers[len(tiers) - 1])
+        rank_energies = generate_extended_rank_energies(tiers, tier_index)
+        self.rank_energies = tuple(rank_energies)
+        self.rank_energy_differences = differences(rank_energies)
+        thresholds = [generate_scenario_extended_thresholds(scenario,
+                                                            tier_index)
+                      for scenario in scenarios]
+        self.thresholds = tuple(tuple(t) for t in thresholds)
+        self.threshold_differences = tuple(differences(t) for t in thresholds)
+        self.subcategories = tuple(
+            tuple(position for position, scenario in enumerate(scenarios)
+                  if scenario["subcategoryId"] == subcategory["id"])
+            for category in categories
+            for subcategory in category["subcategories"]
+        )
+
+    def scenario_energy(self, position: int, score: float) -> float:
+        """uncapped_scenario_energy() of the scenario at a position"""
+        thresholds = self.thresholds[position]
+        index = find_last_index(thresholds,
+                                lambda threshold: score >= threshold)
+        return (
+                self.rank_energies[index] +
+                (score - thresholds[index]) /
+                self.threshold_differences[position][index] *
+                self.rank_energy_differences[index]
+        )
+
+    def energy(self, scores: List[float]) -> tuple[float, List[float]]:
+        """tier_energy() of a score vector in config order. Scenarios past
+        the end of a shorter vector are left out."""
+        capped_values = []
+        uncapped_values = []
+        all_energies = []
+        for positions in self.subcategories:
+            energies = [self.scenario_energy(position, scores[position])
+                        for position in positions if position < len(scores)]
+            capped_values.append(math.floor(min(self.max_energy, max(energies))
+                                            if energies else 0))
+            uncapped_values.append(math.floor(max(energies)
+                                              if energies else 0))
+            all_energies.extend(energies)
+        return (self.harmonic_mean(capped_values, uncapped_values),
+                all_energies)
+
+    def harmonic_mean(self, capped_values: List[int],
+                      uncapped_values: List[int]) -> float:
+        """harmonic_mean_of_subcategory_energies() of the subcategory
+        energies"""
+        capped = harmonic_mean(capped_values)
+        uncapped = harmonic_mean(uncapped_values)
+        if capped >= self.top_energy:
+            return 0 if math.isnan(uncapped) else math.floor(uncapped)
+        return 0 if math.isnan(capped) else math.floor(capped)
+
+
+class BenchmarkModel:
+    """
+    A benchmark config compiled for scoring, one CompiledTier per tier.
+    Built once per config version, it never changes afterwards.
+    """
+    def __init__(self, tiers: List[TierEnergies],
+                 tier_scenarios: List[List[Scenario]],
+                 categories: List[Category]):
+        self.tiers = tuple(
+            CompiledTier(tiers, tier_index, scenarios, categories)
+            for tier_index, scenarios in enumerate(tier_scenarios)
+        )
+
+    def tier_energy(self, tier_index: int,
+                    scores: List[float]) -> tuple[float, List[float]]:
+        return self.tiers[tier_index].energy(scores)
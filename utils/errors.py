@@ -31,6 +31,7 @@ class ProfileDoesntExist(WeakError): pass
 class UsernameAlreadyExists(WeakError): pass
 class UsernameDoesNotExist(WeakError): pass
 class ScenarioDoesNotExist(WeakError): pass
+class InvalidBenchmarkConfig(WeakError): pass
 class UnexpectedError(Exception): pass
 class WrongChannel(CheckError): pass
 class UnverifiedUser(CheckError): pass
@@ -243,7 +243,7 @@ class LeaderboardRenderer:
         self.draw_headers(draw)
         self.draw_alternating_rows(draw, data)
         image = image.convert('RGB')
-        image.save(rf"C:\Users\partt\PycharmProjects\aimlabs_api_data\assets\leaderboard_templates\{self.leaderboard_type}.png")
+        image.save(LEADERBOARD_TEMPLATE_DIR / f"{self.leaderboard_type}.png")
 
 
 async def delete_files_indir(directory: str):
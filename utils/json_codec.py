@@ -0,0 +1,28 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the parser in use, logged at startup and shown by the benchmark
+BACKEND = "orjson" if orjson else "json"
+
+
+def loads(data: str | bytes):
+    """Parses JSON with orjson when it is installed, stdlib otherwise"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    """Serializes obj to a compact JSON string. Output is equivalent between
+    backends, so blobs written by one can be read by the other."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+async def setup(bot): pass
+async def teardown(bot): pass
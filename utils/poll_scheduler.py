@@ -0,0 +1,109 @@
+from datetime import datetime, timezone, timedelta
+
+from settings import POLL_INTERVAL_MINUTES, POLL_DUE_SLACK_MINUTES
+from utils.database_helper import (execute_commit, executemany_commit,
+                                   execute_fetch, get_datetime)
+
+
+async def create_poll_schedule_table() -> None:
+    sql_statement = """
+    CREATE TABLE IF NOT EXISTS poll_schedule (
+        source TEXT NOT NULL,
+        discord_id INTEGER NOT NULL,
+        interval_minutes INTEGER NOT NULL,
+        last_polled TEXT NOT NULL,
+        next_poll TEXT NOT NULL,
+        PRIMARY KEY (source, discord_id)
+    )
+    """
+    await execute_commit(sql_statement, (), "poll_schedule", "CREATE")
+
+
+class PollScheduler:
+    """Per-profile polling intervals for one leaderboard source.
+
+    A profile starts at the minimum interval. Every poll that sees no change
+    doubles its interval up to the maximum, and any change resets it to the
+    minimum, so active players are refreshed every cycle while dormant ones
+    are only polled every few hours. Profiles without a schedule are due.
+
+    Usage: load() at the start of an update, filter profiles with is_due(),
+    record() the outcome of each poll and save() once done.
+    """
+    def __init__(self, source: str,
+                 min_interval: int = POLL_INTERVAL_MINUTES[0],
+                 max_interval: int = POLL_INTERVAL_MINUTES[1]):
+        self.source = source
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # discord_id -> (interval_minutes, last_polled, next_poll)
+        self.schedule: dict[int, tuple[int, datetime, datetime]] = {}
+        self.pending: dict[int, tuple] = {}
+
+    async def load(self) -> None:
+        sql_statement = """
+        SELECT discord_id, interval_minutes, last_polled, next_poll
+        FROM poll_schedule WHERE source = ?
+        """
+        data = await execute_fetch(sql_statement, (self.source,),
+                                   "poll_schedule")
+        self.schedule = {row[0]: (row[1], get_datetime(row[2]),
+                                  get_datetime(row[3]))
+                         for row in data}
+        self.pending = {}
+
+    def is_due(self, discord_id: int,
+               stale_before: datetime | None = None) -> bool:
+        """Returns True if the profile should be polled this cycle.
+
+        :param int discord_id: Discord ID
+        :param datetime stale_before: Also due if the last poll happened
+            before this, e.g. a weekly reset the stored row must catch up with
+        """
+        entry = self.schedule.get(discord_id)
+        if entry is None:
+            return True
+        _, last_polled, next_poll = entry
+        if stale_before and last_polled < stale_before:
+            return True
+        # The update loop doesn't fire at exact multiples of the interval
+        slack = timedelta(minutes=POLL_DUE_SLACK_MINUTES)
+        return next_poll <= datetime.now(timezone.utc) + slack
+
+    def record(self, discord_id: int, changed: bool) -> None:
+        """Schedules the next poll of a profile after polling it.
+
+        :param int discord_id: Discord ID
+        :param bool changed: Whether the poll found new data
+        """
+        entry = self.schedule.get(discord_id)
+        if changed or entry is None:
+            interval = self.min_interval
+        else:
+            interval = min(entry[0] * 2, self.max_interval)
+        now = datetime.now(timezone.utc)
+        next_poll = now + timedelta(minutes=interval)
+        self.schedule[discord_id] = (interval, now, next_poll)
+        self.pending[discord_id] = (self.source, discord_id, interval,
+                                    now.isoformat(), next_poll.isoformat())
+
+    async def save(self) -> None:
+        if not self.pending:
+            return
+        sql_statement = """
+        INSERT INTO poll_schedule (source, discord_id, interval_minutes,
+                                   last_polled, next_poll)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (source, discord_id) DO UPDATE SET
+            interval_minutes = excluded.interval_minutes,
+            last_polled = excluded.last_polled,
+            next_poll = excluded.next_poll
+        """
+        await executemany_commit(sql_statement, list(self.pending.values()),
+                                 "poll_schedule", "UPSERT")
+        self.pending = {}
+
+
+async def setup(bot):
+    await create_poll_schedule_table()
+async def teardown(bot): pass
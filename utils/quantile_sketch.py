@@ -0,0 +1,76 @@
+import math
+
+
+class KLLSketch:
+    """Streaming quantile sketch (KLL) in bounded memory.
+
+    Values enter the level 0 compactor. A full compactor sorts its values
+    and promotes every other one to the next level, where each value stands
+    for twice as many. Capacities shrink geometrically for lower levels, so
+    the sketch holds O(k log(n / k)) values and a quantile's rank error is
+    about 1.7 / k. Below k values nothing is compacted and quantiles are
+    exact. Compaction alternates between keeping even and odd positions,
+    which keeps the sketch deterministic.
+    """
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.compactors: list[list[float]] = [[]]
+        # Next promotion offset (0 or 1) of each level
+        self.offsets: list[int] = [0]
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.compactors[0]) >= self.capacity(0):
+            self.compress()
+
+    def compress(self) -> None:
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) >= self.capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                    self.offsets.append(0)
+                items.sort()
+                # An odd value out stays, so no weight is lost
+                kept = [items.pop()] if len(items) % 2 else []
+                offset = self.offsets[level]
+                self.offsets[level] = 1 - offset
+                self.compactors[level + 1].extend(items[offset::2])
+                self.compactors[level] = kept
+            level += 1
+
+    def quantile(self, q: float) -> float:
+        """Returns the value at quantile q (0 is the minimum, 1 the
+        maximum)"""
+        if self.count == 0:
+            raise ValueError("Quantile of an empty sketch")
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        weighted = sorted((value, 2 ** level)
+                          for level, items in enumerate(self.compactors)
+                          for value in items)
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return self.max
+
+
+async def setup(bot): pass
+async def teardown(bot): pass
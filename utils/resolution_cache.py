@@ -0,0 +1,98 @@
+import time
+from functools import wraps
+
+from settings import (RESOLUTION_CACHE_TTL, RESOLUTION_CACHE_NEGATIVE_TTL,
+                      RESOLUTION_CACHE_MAX_ENTRIES)
+from utils.database_helper import (get_valorant_profiles, get_kovaaks_profiles,
+                                   get_aimlabs_profiles)
+from utils.errors import ProfileDoesntExist
+from utils.log import logger
+
+
+class ResolutionCache:
+    """Remembers username -> account lookups of one source.
+
+    Decorating a check_*_username function with the cache answers repeated
+    lookups from memory: resolved accounts for the positive TTL and
+    usernames the upstream reported as nonexistent (ProfileDoesntExist) for
+    the negative TTL. Other errors aren't cached, they may be transient.
+    Decorate outside the rate limiter so hits don't use any quota.
+    """
+    def __init__(self, source: str,
+                 ttl: int = RESOLUTION_CACHE_TTL,
+                 negative_ttl: int = RESOLUTION_CACHE_NEGATIVE_TTL,
+                 max_entries: int = RESOLUTION_CACHE_MAX_ENTRIES):
+        self.source = source
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # lookup args -> (expires_at, account, ProfileDoesntExist message)
+        self.entries: dict[tuple, tuple[float, object, str | None]] = {}
+
+    def __call__(self, func):
+        @wraps(func)
+        async def wrapper(*args):
+            entry = self.entries.get(args)
+            if entry is not None and entry[0] > time.monotonic():
+                _, account, missing = entry
+                if missing is not None:
+                    raise ProfileDoesntExist(missing, source=self.source)
+                return account
+            try:
+                account = await func(*args)
+            except ProfileDoesntExist as e:
+                self.put(args, None, e.message)
+                raise
+            self.put(args, account)
+            return account
+
+        return wrapper
+
+    def put(self, key: tuple, account, missing: str | None = None) -> None:
+        """Caches a lookup result.
+
+        :param tuple key: Arguments of the lookup, e.g. (username, tag)
+        :param account: What the lookup returns for the key
+        :param str missing: Error message if the username doesn't exist
+        """
+        ttl = self.ttl if missing is None else self.negative_ttl
+        # Reinserting keeps the dict ordered by insertion time for eviction
+        self.entries.pop(key, None)
+        self.entries[key] = (time.monotonic() + ttl, account, missing)
+        if len(self.entries) > self.max_entries:
+            self.evict()
+
+    def evict(self) -> None:
+        now = time.monotonic()
+        self.entries = {key: entry for key, entry in self.entries.items()
+                        if entry[0] > now}
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+
+valorant_accounts = ResolutionCache("valorant")
+kovaaks_accounts = ResolutionCache("kovaaks")
+aimlabs_accounts = ResolutionCache("aimlabs")
+
+
+async def seed_from_profiles() -> None:
+    """Caches the accounts already linked to members, so re-adding or
+    updating to a known username doesn't go upstream"""
+    for row in await get_valorant_profiles():
+        valorant_accounts.put((row[3], row[4]), (row[2], row[5]))
+    for row in await get_kovaaks_profiles():
+        kovaaks_accounts.put((row[3],), (row[2], row[4], row[5]))
+    for row in await get_aimlabs_profiles():
+        aimlabs_accounts.put((row[3],), row[2])
+    logger.info(f"Seeded resolution cache with "
+                f"{len(valorant_accounts.entries)} valorant, "
+                f"{len(kovaaks_accounts.entries)} kovaaks and "
+                f"{len(aimlabs_accounts.entries)} aimlabs accounts")
+
+
+async def setup(bot):
+    try:
+        await seed_from_profiles()
+    except Exception as e:
+        logger.warning(f"Unable to seed resolution cache: {str(e)}")
+async def teardown(bot): pass
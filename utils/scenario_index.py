@@ -0,0 +1,88 @@
+import bisect
+import heapq
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ScenarioIndex:
+    """Immutable in-memory search index over scenario names.
+
+    Scenarios are numbered in popularity order, so every posting list is
+    sorted by popularity and a scan can stop after `limit` hits. Queries
+    shorter than a trigram are answered from the sorted names by bisection,
+    longer ones by scanning the shortest posting list of their trigrams and
+    checking each candidate for the whole query. Prefix matches rank before
+    other matches.
+    """
+    def __init__(self, scenarios: list[tuple[int, str]]):
+        """
+        :param list[tuple[int, str]] scenarios: (leaderboard_id, name) pairs,
+            most popular first
+        """
+        self.scenarios = scenarios
+        self.names = [normalize(name) for _, name in scenarios]
+        # (name, popularity) sorted by name, for prefix ranges
+        self.sorted_names = sorted((name, i)
+                                   for i, name in enumerate(self.names))
+        self.postings: dict[str, list[int]] = {}
+        for i, name in enumerate(self.names):
+            for trigram in trigrams(name):
+                self.postings.setdefault(trigram, []).append(i)
+        self.ids = {}
+        for i, name in reversed(list(enumerate(self.names))):
+            self.ids[name] = scenarios[i][0]
+        self.names_by_id = {leaderboard_id: name
+                            for leaderboard_id, name in scenarios}
+
+    def __len__(self) -> int:
+        return len(self.scenarios)
+
+    def get(self, name: str) -> int | None:
+        """Returns the leaderboard id of the most popular scenario named
+        exactly name (case-insensitive)"""
+        return self.ids.get(normalize(name))
+
+    def resolve(self, value: str) -> tuple[int, str] | None:
+        """Returns the (leaderboard_id, name) pair of an autocomplete value,
+        i.e. a leaderboard id, or of a scenario name typed out in full"""
+        value = value.strip()
+        if value.isdigit() and int(value) in self.names_by_id:
+            return int(value), self.names_by_id[int(value)]
+        leaderboard_id = self.get(value)
+        if leaderboard_id is None:
+            return None
+        return leaderboard_id, self.names_by_id[leaderboard_id]
+
+    def prefix_matches(self, prefix: str, limit: int) -> list[int]:
+        start = bisect.bisect_left(self.sorted_names, (prefix,))
+        end = bisect.bisect_left(self.sorted_names, (prefix + "\uffff",))
+        return heapq.nsmallest(limit, (self.sorted_names[j][1]
+                                       for j in range(start, end)))
+
+    def search(self, query: str, limit: int = 25) -> list[tuple[int, str]]:
+        """Returns up to limit (leaderboard_id, name) pairs of the scenarios
+        whose name contains query, prefix matches first, then by popularity"""
+        query = normalize(query)
+        if not query:
+            return self.scenarios[:limit]
+        hits = self.prefix_matches(query, limit)
+        if len(query) >= 3 and len(hits) < limit:
+            postings = [self.postings.get(trigram, [])
+                        for trigram in trigrams(query)]
+            prefixed = set(hits)
+            for i in min(postings, key=len):
+                if i not in prefixed and query in self.names[i]:
+                    hits.append(i)
+                    if len(hits) >= limit:
+                        break
+        return [self.scenarios[i] for i in hits]
+
+
+async def setup(bot): pass
+async def teardown(bot): pass
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone, timedelta, date
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Weekly leaderboards run Monday 12am to Sunday 11:59pm Eastern
+WEEK_TIMEZONE = ZoneInfo("America/New_York")
+
+
+def week_id_of_date(day: date) -> int:
+    """Returns the id of the week holding a local calendar day: the date of
+    that week's Monday as YYYYMMDD, e.g. 20250106"""
+    monday = day - timedelta(days=day.weekday())
+    return monday.year * 10000 + monday.month * 100 + monday.day
+
+
+@lru_cache(maxsize=128)
+def week_bounds(week_id: int) -> tuple[datetime, datetime]:
+    """Returns the UTC [start, end) of a week. The length differs from 7
+    days across DST changes, which is why bounds are derived per week."""
+    monday = datetime(week_id // 10000, week_id // 100 % 100, week_id % 100,
+                      tzinfo=WEEK_TIMEZONE)
+    next_monday = monday + timedelta(days=7)
+    return (monday.astimezone(timezone.utc),
+            next_monday.astimezone(timezone.utc))
+
+
+class WeekWindow:
+    """Caches the bounds of the current week so assigning a timestamp to its
+    week is two comparisons, rolling over once the week has ended."""
+    def __init__(self):
+        self.week_id = None
+        self.start = None
+        self.end = None
+
+    def current(self) -> tuple[int, datetime, datetime]:
+        """Returns (week_id, start, end) of the current week"""
+        now = datetime.now(timezone.utc)
+        if self.end is None or not self.start <= now < self.end:
+            self.week_id = week_id_of_date(now.astimezone(WEEK_TIMEZONE).date())
+            self.start, self.end = week_bounds(self.week_id)
+        return self.week_id, self.start, self.end
+
+    def week_of(self, dt: datetime) -> int:
+        """Returns the id of the week an aware datetime falls in"""
+        week_id, start, end = self.current()
+        if start <= dt < end:
+            return week_id
+        return week_id_of_date(dt.astimezone(WEEK_TIMEZONE).date())
+
+
+week_window = WeekWindow()
+
+
+async def setup(bot): pass
+async def teardown(bot): pass
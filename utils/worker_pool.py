@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+
+_DONE = object()
+
+
+async def bounded_map(func: Callable[[Any], Awaitable[Any]],
+                      items: Iterable, concurrency: int) -> AsyncIterator:
+    """Runs func over items with at most `concurrency` calls in flight and
+    yields results as they complete (not in input order).
+
+    Only `concurrency` worker tasks exist at any time, so large profile
+    lists don't create one coroutine per item. An exception raised by func
+    is re-raised to the consumer after the remaining workers are cancelled.
+
+    :param func: Coroutine function called with each item
+    :param items: Items to process, consumed lazily
+    :param int concurrency: Maximum number of concurrent calls
+    """
+    iterator = iter(items)
+    results = asyncio.Queue()
+
+    async def worker():
+        try:
+            for item in iterator:
+                try:
+                    results.put_nowait((await func(item), None))
+                except Exception as e:
+                    results.put_nowait((None, e))
+        finally:
+            results.put_nowait(_DONE)
+
+    workers = [asyncio.create_task(worker())
+               for _ in range(max(1, concurrency))]
+    running = len(workers)
+    try:
+        while running:
+            entry = await results.get()
+            if entry is _DONE:
+                running -= 1
+                continue
+            result, error = entry
+            if error is not None:
+                raise error
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def setup(bot): pass
+async def teardown(bot): pass